@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (delarosatrevin@scilifelab.se) [1]
+# *
+# * [1] SciLifeLab, Stockholm University
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+Single scheduler process for all the scheduled runs of a project.
+
+Instead of one polling process per scheduled run, this scheduler keeps
+the scheduled runs (and the protocols they are waiting for) in memory and
+checks, in a single loop, the modification time of the project.sqlite
+and of the run.db files. A protocol db is only re-read when its file has
+changed, and a run is launched as soon as its inputs are available and
+its prerequisites are done.
+"""
+
+import os
+import sys
+import time
+import errno
+import argparse
+from sqlite3 import dbapi2 as sqlite
+
+import pyworkflow.utils as pwutils
+
+from pyworkflow.em import *
+from pyworkflow.config import *
+from pyworkflow.protocol import (getProtocolFromDb, STATUS_SCHEDULED,
+                                 STATUS_FINISHED, STATUS_ABORTED, STATUS_FAILED)
+from pyworkflow.protocol.launch import getSchedulerPidFile, getSchedulerPid
+
+
+# Add callback for remote debugging if available.
+try:
+    from rpdb2 import start_embedded_debugger
+    from signal import signal, SIGUSR2
+    signal(SIGUSR2, lambda sig, frame: start_embedded_debugger('a'))
+except ImportError:
+    pass
+
+
+def getScheduledRuns(dbPath):
+    """ Return a dict {protId: workingDir} with the protocols that are
+    in 'scheduled' status in the given project (or run) database.
+    The query is done directly with sqlite to avoid loading the protocols.
+    """
+    if not os.path.exists(dbPath):
+        return {}
+
+    conn = sqlite.Connection(dbPath, timeout=30)
+    try:
+        rows = conn.execute("SELECT s.parent_id, w.value FROM Objects s "
+                            "JOIN Objects w "
+                            "ON w.name = s.parent_id || '.workingDir' "
+                            "WHERE s.name = s.parent_id || '.status' "
+                            "AND s.value = ?", (STATUS_SCHEDULED,))
+        return dict((int(protId), workingDir) for protId, workingDir in rows)
+    finally:
+        conn.close()
+
+
+def isRunScheduled(dbPath, protId):
+    """ Check in the run.db if the protocol is still waiting to be launched.
+    """
+    if not os.path.exists(dbPath):
+        return False
+
+    conn = sqlite.Connection(dbPath, timeout=30)
+    try:
+        row = conn.execute("SELECT value FROM Objects WHERE name = ?",
+                           ('%d.status' % protId,)).fetchone()
+        return row is not None and row[0] == STATUS_SCHEDULED
+    finally:
+        conn.close()
+
+
+class ScheduledRun():
+    """ Keep the protocol loaded from its run.db and the modification
+    times of the protocols that it depends on.
+    """
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.project = protocol.getProject()
+        self.prerequisites = map(int, protocol.getPrerequisites())
+        self.lastModified = {}
+        self.log = open(protocol._getLogsPath('schedule.log'), 'a')
+
+    def _log(self, msg):
+        print >> self.log, "%s: %s" % (pwutils.prettyTimestamp(), msg)
+        self.log.flush()
+
+    def _updateProtocol(self, prot, mtimes):
+        """ Update the protocol from its run.db only if it was modified
+        since the last check. Params:
+            prot: the protocol to update.
+            mtimes: dict with the run.db modification times already
+                read in this loop (shared among all scheduled runs).
+        """
+        protDb = prot.getDbPath()
+        if protDb not in mtimes:
+            mtimes[protDb] = (os.path.getmtime(protDb)
+                              if os.path.exists(protDb) else None)
+        lastModified = mtimes[protDb]
+        protId = prot.getObjId()
+
+        if (lastModified is not None and
+                lastModified != self.lastModified.get(protId)):
+            self.project._updateProtocol(prot, skipUpdatedProtocols=False)
+            self.lastModified[protId] = lastModified
+            self._log("Updated protocol %s" % protId)
+
+    def isReady(self, mtimes):
+        """ Return True if all inputs are available and all the
+        prerequisites are not running anymore.
+        """
+        stopStatuses = [STATUS_FINISHED, STATUS_ABORTED, STATUS_FAILED]
+        ready = True
+
+        for key, attr in self.protocol.iterInputAttributes():
+            if attr.hasValue() and attr.get() is None:
+                ready = False
+                self._updateProtocol(attr.getObjValue(), mtimes)
+
+        for protId in self.prerequisites:
+            prot = self.project.getProtocol(protId)
+            if prot is not None:
+                self._updateProtocol(prot, mtimes)
+                if prot.getStatus() not in stopStatuses:
+                    ready = False
+
+        return ready
+
+    def launch(self):
+        self._log("Launching the protocol >>>>")
+        try:
+            self.project.launchProtocol(self.protocol, scheduled=True)
+        except Exception as ex:
+            # Store the failure, otherwise the run will keep scheduled
+            self._log("ERROR launching the protocol: %s" % ex)
+            self.protocol.setFailed("Error launching the scheduled run: %s"
+                                    % ex)
+            self.project.mapper.store(self.protocol)
+            self.project.mapper.commit()
+            raise
+
+    def close(self):
+        self.project.closeMapper()
+        self.log.close()
+
+
+class ProjectScheduler():
+    """ Launch the scheduled runs of a project when their dependencies
+    are met. Only one scheduler should run for each project, the pid
+    file in the project Logs folder is used to ensure that.
+    """
+    def _parseArgs(self):
+        parser = argparse.ArgumentParser()
+        _addArg = parser.add_argument  # short notation
+
+        _addArg("projPath", metavar='PROJECT_PATH',
+                help="Project path.")
+
+        _addArg("--sleep_time", type=float, default=5,
+                dest='sleepTime', metavar='SECONDS',
+                help="Sleeping time (in seconds) between checks.")
+
+        _addArg("--exit_time", type=float, default=60,
+                dest='exitTime', metavar='SECONDS',
+                help="Time (in seconds) without scheduled runs after "
+                     "which the scheduler will exit.")
+
+        self._args = parser.parse_args()
+
+    def _log(self, msg):
+        print "%s: %s" % (pwutils.prettyTimestamp(), msg)
+        sys.stdout.flush()
+
+    def _acquirePidFile(self):
+        """ Create the pid file, return False if there is another
+        scheduler running for this project.
+        """
+        pidFile = getSchedulerPidFile(self.projPath)
+        pwutils.makeFilePath(pidFile)
+
+        while True:
+            try:
+                fd = os.open(pidFile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()))
+                os.close(fd)
+                return True
+            except OSError as ex:
+                if ex.errno != errno.EEXIST:
+                    raise
+            # The file exists, check if the process is still alive
+            pid = getSchedulerPid(self.projPath)
+            if pid is not None and pid != os.getpid():
+                return False
+            pwutils.cleanPath(pidFile)
+
+    def _releasePidFile(self):
+        pidFile = getSchedulerPidFile(self.projPath)
+        if getSchedulerPid(self.projPath) == os.getpid():
+            pwutils.cleanPath(pidFile)
+
+    def _loadRun(self, protId, workingDir):
+        dbPath = os.path.join(workingDir, 'logs', 'run.db')
+        if not isRunScheduled(dbPath, protId):
+            return None
+        protocol = getProtocolFromDb(self.projPath, dbPath, protId)
+        run = ScheduledRun(protocol)
+        run._log("Scheduling protocol %s, scheduler pid: %s, "
+                 "prerequisites: %s"
+                 % (protId, os.getpid(), run.prerequisites))
+        return run
+
+    def _updateRuns(self):
+        """ Read the scheduled runs from the project db if it has changed.
+        """
+        mtime = os.path.getmtime(self.dbPath)
+        if mtime == self.dbMTime:
+            return
+        self.dbMTime = mtime
+
+        scheduled = getScheduledRuns(self.dbPath)
+
+        for protId in self.runs.keys():
+            if protId not in scheduled:
+                self.runs.pop(protId).close()
+
+        for protId, workingDir in scheduled.iteritems():
+            # Runs already launched might still appear as scheduled in the
+            # project db, but not in their run.db, where the launched
+            # status is stored
+            if protId not in self.runs:
+                try:
+                    run = self._loadRun(protId, workingDir)
+                except Exception as ex:
+                    self._log("ERROR loading scheduled run %s: %s"
+                              % (protId, ex))
+                    run = None
+                if run is not None:
+                    self.runs[protId] = run
+                    self._log("Scheduled run %s" % protId)
+
+    def _checkRuns(self):
+        """ Launch the runs that are ready. """
+        mtimes = {}  # run.db modification times read in this loop
+
+        for protId, run in self.runs.items():
+            try:
+                ready = run.isReady(mtimes)
+            except Exception as ex:
+                self._log("ERROR checking scheduled run %s: %s"
+                          % (protId, ex))
+                continue
+
+            if ready:
+                # The run is not checked anymore even if the launch fails,
+                # it will be loaded again if it is scheduled again
+                try:
+                    run.launch()
+                    self._log("Launched run %s" % protId)
+                except Exception as ex:
+                    self._log("ERROR launching scheduled run %s: %s"
+                              % (protId, ex))
+                self.runs.pop(protId).close()
+
+    def main(self):
+        self._parseArgs()
+        self.projPath = os.path.abspath(self._args.projPath)
+        os.chdir(self.projPath)
+        self.dbPath = os.path.join(self.projPath, 'project.sqlite')
+
+        if not self._acquirePidFile():
+            self._log("There is another scheduler running for project %s"
+                      % self.projPath)
+            return
+
+        self._log("Starting scheduler for project %s, pid: %s"
+                  % (self.projPath, os.getpid()))
+
+        self.runs = {}
+        self.dbMTime = None
+        idleTime = 0
+
+        try:
+            while True:
+                self._updateRuns()
+                self._checkRuns()
+
+                if self.runs:
+                    idleTime = 0
+                elif idleTime >= self._args.exitTime:
+                    # Release the pid file before the last check, so a new
+                    # scheduler will be started for runs scheduled later
+                    self._releasePidFile()
+                    self.dbMTime = None
+                    self._updateRuns()
+                    if self.runs and self._acquirePidFile():
+                        idleTime = 0
+                    else:
+                        break
+                else:
+                    idleTime += self._args.sleepTime
+
+                time.sleep(self._args.sleepTime)
+        finally:
+            for run in self.runs.values():
+                run.close()
+            self._releasePidFile()
+
+        self._log("No more scheduled runs, exiting.")
+
+
+if __name__ == '__main__':
+    scheduler = ProjectScheduler()
+    scheduler.main()
@@ -0,0 +1,208 @@
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+This module contains the benchmarks of the object and mapper layers.
+Each benchmark measures a single operation (the run method) over the
+synthetic sets of a given size, the input is prepared in setup and
+it is not included in the measures.
+"""
+
+import os
+
+from pyworkflow.object import Float
+from pyworkflow.mapper import SqliteMapper
+import pyworkflow.em.data as emdata
+from pyworkflow.em.data import SetOfParticles, SetOfClasses2D
+
+
+class Benchmark(object):
+    """ Base class for all benchmarks. """
+    NAME = None  # Name used in the results, the class name if None
+
+    def __init__(self, data, workDir):
+        """
+        Params:
+            data: SyntheticData object to get the input sets.
+            workDir: folder where output files can be written.
+        """
+        self.data = data
+        self.size = data.size
+        self.workDir = workDir
+
+    @classmethod
+    def getName(cls):
+        return cls.NAME or cls.__name__
+
+    def _getOutputFile(self, name):
+        """ Return a filename in the working dir, removing it if exists. """
+        fn = os.path.join(self.workDir, '%s_%s.sqlite'
+                          % (self.getName(), name))
+        if os.path.exists(fn):
+            os.remove(fn)
+        return fn
+
+    def setup(self):
+        """ Prepare the input of run, this is not measured. """
+        pass
+
+    def run(self):
+        """ The operation to be measured. """
+        raise Exception("Benchmark.run should be implemented in subclasses.")
+
+    def teardown(self):
+        """ Close files or release anything created in setup or run. """
+        pass
+
+
+class BenchmarkParticles(Benchmark):
+    """ Base class for benchmarks using the synthetic particles. """
+    def setup(self):
+        self.partSet = self.data.getParticles()
+        self.part = self.partSet.getFirstItem().clone()
+
+    def teardown(self):
+        self.partSet.close()
+
+
+class SetAppend(BenchmarkParticles):
+    """ Append particles to a new set and write it. """
+    NAME = 'Set.append'
+
+    def setup(self):
+        BenchmarkParticles.setup(self)
+        self.outSet = SetOfParticles(filename=self._getOutputFile('output'))
+        self.outSet.copyInfo(self.partSet)
+
+    def run(self):
+        part = self.part
+        for i in xrange(1, self.size + 1):
+            part.setObjId(i)
+            part.setIndex(i)
+            self.outSet.append(part)
+        self.outSet.write()
+
+    def teardown(self):
+        BenchmarkParticles.teardown(self)
+        self.outSet.close()
+
+
+class FlatSelectAll(BenchmarkParticles):
+    """ Read all particles through the SqliteFlatMapper. """
+    NAME = 'SqliteFlatMapper.selectAll'
+
+    def run(self):
+        for _ in self.partSet._getMapper().selectAll():
+            pass
+
+
+class ObjectClone(BenchmarkParticles):
+    """ Clone a particle as many times as particles in the set. """
+    NAME = 'Object.clone'
+
+    def run(self):
+        part = self.part
+        for _ in xrange(self.size):
+            part.clone()
+
+
+class ObjectCopy(BenchmarkParticles):
+    """ Copy a particle as many times as particles in the set. """
+    NAME = 'Object.copy'
+
+    def run(self):
+        part = self.part
+        other = part.clone()
+        for _ in xrange(self.size):
+            other.copy(part)
+
+
+class ObjectGetObjDict(BenchmarkParticles):
+    """ Get the dict of attributes of a particle as many times as
+    particles in the set. """
+    NAME = 'Object.getObjDict'
+
+    def run(self):
+        part = self.part
+        for _ in xrange(self.size):
+            part.getObjDict(includeBasic=True)
+
+
+class SetCopyItems(BenchmarkParticles):
+    """ Copy all particles to a new set, updating an attribute. """
+    NAME = 'EMSet.copyItems'
+
+    def setup(self):
+        BenchmarkParticles.setup(self)
+        self.outSet = SetOfParticles(filename=self._getOutputFile('output'))
+        self.outSet.copyInfo(self.partSet)
+
+    def _updateItem(self, item, row):
+        item._score = Float(item.getObjId() * 0.5)
+
+    def run(self):
+        self.outSet.copyItems(self.partSet,
+                              updateItemCallback=self._updateItem)
+        self.outSet.write()
+
+    def teardown(self):
+        BenchmarkParticles.teardown(self)
+        self.outSet.close()
+
+
+class ClassifyItems(BenchmarkParticles):
+    """ Create 2D classes from the particles. """
+    NAME = 'SetOfClasses.classifyItems'
+
+    def setup(self):
+        BenchmarkParticles.setup(self)
+        self.classes = SetOfClasses2D(filename=self._getOutputFile('classes'))
+        self.classes.setImages(self.partSet)
+
+    def run(self):
+        self.classes.classifyItems()
+        self.classes.write()
+
+    def teardown(self):
+        BenchmarkParticles.teardown(self)
+        self.classes.close()
+
+
+class SelectAllBatch(Benchmark):
+    """ Load all objects of a database, as done to load the protocols
+    of a project. """
+    NAME = 'SqliteMapper.selectAllBatch'
+
+    def setup(self):
+        self.dbFile = self.data.getObjectsDb()
+
+    def run(self):
+        mapper = SqliteMapper(self.dbFile, vars(emdata))
+        mapper.selectAllBatch()
+        mapper.close()
+
+
+BENCHMARKS = [SetAppend, FlatSelectAll, ObjectClone, ObjectCopy,
+              ObjectGetObjDict, SetCopyItems, ClassifyItems, SelectAllBatch]
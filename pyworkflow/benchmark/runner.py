@@ -0,0 +1,185 @@
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+Functions to run the benchmarks, store the results in JSON files
+and compare the results of different runs (e.g. between commits).
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import socket
+import resource
+import datetime as dt
+from multiprocessing import Process, Queue
+
+import pyworkflow as pw
+
+from synthetic import SEED, SyntheticData
+
+
+def getPeakMemory():
+    """ Return the peak resident memory of this process (in Kb). """
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes in MacOS and in Kb in Linux
+    return maxRss // 1024 if sys.platform == 'darwin' else maxRss
+
+
+def measure(BenchClass, data, workDir, repeat):
+    """ Run the benchmark several times and return a dict with the
+    times of each run and the peak memory increase during the runs.
+    """
+    times = []
+    peakMemory = 0
+
+    for _ in range(repeat):
+        bench = BenchClass(data, workDir)
+        bench.setup()
+        gc.collect()
+        mem = getPeakMemory()
+        t = time.time()
+        bench.run()
+        times.append(time.time() - t)
+        peakMemory = max(peakMemory, getPeakMemory() - mem)
+        bench.teardown()
+
+    return {'benchmark': BenchClass.getName(),
+            'size': data.size,
+            'time': min(times),
+            'mean': sum(times) / len(times),
+            'times': times,
+            'peakMemory': peakMemory}
+
+
+def _processTarget(queue, func, args):
+    try:
+        queue.put(func(*args))
+    except Exception as e:
+        queue.put({'error': str(e)})
+
+
+def runInProcess(func, *args):
+    """ Call func(*args) in a new process and return its result.
+    The benchmarks are measured in their own process, so the peak
+    memory is not affected by the previous benchmarks or by the
+    creation of the synthetic sets.
+    """
+    queue = Queue()
+    p = Process(target=_processTarget, args=(queue, func, args))
+    p.start()
+    result = queue.get()
+    p.join()
+
+    if isinstance(result, dict) and 'error' in result:
+        raise Exception("Error running %s: %s"
+                        % (func.__name__, result['error']))
+    return result
+
+
+def createInputs(data):
+    """ Create all the input sets of the given SyntheticData. """
+    data.getClasses2D().close()
+    data.getCoordinates().close()
+    data.getObjectsDb()
+
+
+def getCommit():
+    """ Return the current git commit of the Scipion sources,
+    or None if it can not be retrieved.
+    """
+    import subprocess
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=os.path.dirname(pw.HOME)).strip()
+    except Exception:
+        return None
+
+
+def runBenchmarks(benchmarks, sizes, workDir, repeat=3, seed=SEED,
+                  verbose=True):
+    """ Run the benchmarks for each of the sizes and return a dict
+    with the results and information about the run.
+    Params:
+        benchmarks: list of Benchmark subclasses.
+        sizes: list with the number of items of the synthetic sets.
+        workDir: folder to store the synthetic sets and output files.
+        repeat: how many times each benchmark is run.
+    """
+    results = []
+
+    for size in sizes:
+        data = SyntheticData(workDir, size, seed)
+        # Create the input sets once, before measuring anything
+        runInProcess(createInputs, data)
+
+        for BenchClass in benchmarks:
+            result = runInProcess(measure, BenchClass, data, workDir, repeat)
+            if verbose:
+                print("%-30s %10d %10.3f s %10d Kb"
+                      % (result['benchmark'], size, result['time'],
+                         result['peakMemory']))
+                sys.stdout.flush()
+            results.append(result)
+
+    return {'date': dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'commit': getCommit(),
+            'host': socket.gethostname(),
+            'python': sys.version.split()[0],
+            'seed': seed,
+            'repeat': repeat,
+            'results': results}
+
+
+def writeResults(results, filename):
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def readResults(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def compareResults(oldResults, newResults):
+    """ Compare two results dicts and return a list of tuples:
+    (benchmark, size, oldTime, newTime, ratio) for the benchmarks
+    present in both. A ratio > 1 means that the new run is slower.
+    """
+    def _key(r):
+        return r['benchmark'], r['size']
+
+    oldDict = dict((_key(r), r) for r in oldResults['results'])
+    comparison = []
+
+    for r in newResults['results']:
+        old = oldDict.get(_key(r))
+        if old is not None:
+            ratio = r['time'] / old['time'] if old['time'] else float('inf')
+            comparison.append(_key(r) + (old['time'], r['time'], ratio))
+
+    return comparison
@@ -0,0 +1,215 @@
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+This module generates synthetic sets (particles, coordinates, classes...)
+to be used in the benchmarks. The sets are created from a random generator
+with a fixed seed, so the same content is obtained in every run. No images
+are written, items only point to non-existing stack files.
+"""
+
+import os
+import random
+
+import numpy as np
+
+from pyworkflow.mapper import SqliteMapper
+import pyworkflow.em.data as emdata
+from pyworkflow.em.data import (Acquisition, CTFModel, Transform, Micrograph,
+                                Coordinate, Particle, SetOfMicrographs,
+                                SetOfCoordinates, SetOfParticles,
+                                SetOfClasses2D)
+
+
+SEED = 13
+SAMPLING = 1.35
+MIC_DIM = 4096
+BOX_SIZE = 128
+PARTICLES_PER_MIC = 100
+PARTICLES_PER_STACK = 1000
+
+
+def createAcquisition():
+    return Acquisition(magnification=50000, voltage=300.,
+                       sphericalAberration=2.7, amplitudeContrast=0.1)
+
+
+def createMicrographs(filename, size, seed=SEED):
+    """ Create a SetOfMicrographs with the given number of items. """
+    micSet = SetOfMicrographs(filename=filename)
+    micSet.setAcquisition(createAcquisition())
+    micSet.setSamplingRate(SAMPLING)
+    mic = Micrograph()
+
+    for i in range(1, size + 1):
+        mic.setObjId(i)
+        mic.setLocation('Micrographs/mic_%06d.mrc' % i)
+        mic.setMicName('mic_%06d.mrc' % i)
+        micSet.append(mic)
+
+    micSet.write()
+    return micSet
+
+
+def createCoordinates(filename, size, micSet, seed=SEED):
+    """ Create a SetOfCoordinates with the given number of items,
+    distributed along the micrographs of micSet.
+    """
+    r = random.Random(seed)
+    coordSet = SetOfCoordinates(filename=filename)
+    coordSet.setMicrographs(micSet)
+    coordSet.setBoxSize(BOX_SIZE)
+    micIds = [mic.getObjId() for mic in micSet]
+    coord = Coordinate()
+
+    for i in range(1, size + 1):
+        coord.setObjId(i)
+        coord.setMicId(micIds[(i - 1) % len(micIds)])
+        coord.setPosition(r.randint(BOX_SIZE, MIC_DIM - BOX_SIZE),
+                          r.randint(BOX_SIZE, MIC_DIM - BOX_SIZE))
+        coordSet.append(coord)
+
+    coordSet.write()
+    return coordSet
+
+
+def randomMatrix(r):
+    """ Return a 4x4 transformation matrix with a random in-plane
+    rotation and shifts, using the random generator r.
+    """
+    psi = np.radians(r.uniform(0, 360))
+    c, s = np.cos(psi), np.sin(psi)
+    m = np.eye(4)
+    m[:2, :2] = [[c, -s], [s, c]]
+    m[0, 3] = r.uniform(-5, 5)
+    m[1, 3] = r.uniform(-5, 5)
+    return m
+
+
+def createParticles(filename, size, numberOfClasses=10, seed=SEED):
+    """ Create a SetOfParticles with the given number of items.
+    Each particle has a CTF, a 2D alignment, a micrograph id (one
+    micrograph every PARTICLES_PER_MIC particles) and a class id
+    between 1 and numberOfClasses.
+    """
+    r = random.Random(seed)
+    partSet = SetOfParticles(filename=filename)
+    partSet.setAcquisition(createAcquisition())
+    partSet.setSamplingRate(SAMPLING)
+    partSet.setHasCTF(True)
+    partSet.setAlignment2D()
+
+    part = Particle()
+    part.setAcquisition(createAcquisition())
+    part.setCTF(CTFModel())
+    part.setTransform(Transform())
+
+    for i in range(1, size + 1):
+        micId = (i - 1) // PARTICLES_PER_MIC + 1
+        part.setObjId(i)
+        part.setLocation((i - 1) % PARTICLES_PER_STACK + 1,
+                         'Particles/stack_%06d.mrcs'
+                         % ((i - 1) // PARTICLES_PER_STACK + 1))
+        part.setMicId(micId)
+        part.setClassId(r.randint(1, numberOfClasses))
+        defocusU = r.uniform(10000, 30000)
+        part.getCTF().setStandardDefocus(defocusU,
+                                         defocusU + r.uniform(0, 500),
+                                         r.uniform(0, 180))
+        part.getTransform().setMatrix(randomMatrix(r))
+        partSet.append(part)
+
+    partSet.write()
+    return partSet
+
+
+def createClasses2D(filename, partSet):
+    """ Create a SetOfClasses2D classifying the particles in
+    partSet by their class id.
+    """
+    classes = SetOfClasses2D(filename=filename)
+    classes.setImages(partSet)
+    classes.classifyItems()
+    classes.write()
+    return classes
+
+
+class SyntheticData(object):
+    """ Keep the synthetic sets of a given size in a folder.
+    The sets are only created the first time they are requested
+    and reused later from the same files.
+    """
+    def __init__(self, path, size, seed=SEED):
+        self.path = path
+        self.size = size
+        self.seed = seed
+
+    def getFile(self, name):
+        """ Return the filename for the set with this name. """
+        return os.path.join(self.path, '%s_%d_%d.sqlite'
+                            % (name, self.size, self.seed))
+
+    def _getSet(self, name, SetClass, createFunc, *args):
+        fn = self.getFile(name)
+        if os.path.exists(fn):
+            return SetClass(filename=fn)
+        return createFunc(fn, *args)
+
+    def getMicrographs(self):
+        return self._getSet('micrographs', SetOfMicrographs,
+                            createMicrographs,
+                            max(1, self.size // PARTICLES_PER_MIC), self.seed)
+
+    def getCoordinates(self):
+        return self._getSet('coordinates', SetOfCoordinates,
+                            createCoordinates, self.size,
+                            self.getMicrographs(), self.seed)
+
+    def getParticles(self):
+        return self._getSet('particles', SetOfParticles, createParticles,
+                            self.size, 10, self.seed)
+
+    def getClasses2D(self):
+        classes = self._getSet('classes2D', SetOfClasses2D, createClasses2D,
+                               self.getParticles())
+        classes.setImages(self.getParticles())
+        return classes
+
+    def getObjectsDb(self):
+        """ Return the filename of a database with the particles stored
+        as independent objects (as protocols in a project database),
+        one every 10 particles.
+        """
+        fn = self.getFile('objects')
+        if not os.path.exists(fn):
+            mapper = SqliteMapper(fn, vars(emdata))
+            partSet = self.getParticles()
+            for part in partSet.iterItems(where='id % 10 = 0'):
+                part.cleanObjId()
+                mapper.insert(part)
+            mapper.commit()
+            mapper.close()
+            partSet.close()
+        return fn
@@ -33,6 +33,7 @@ import xmipp
 import pyworkflow.utils as pwutils
 
 from constants import *
+from image_numpy import NumpyImageBackend
 
 
 
@@ -56,6 +57,24 @@ class ImageHandler(object):
     DT_COMPLEXDOUBLE = xmipp.DT_COMPLEXDOUBLE
     DT_BOOL = xmipp.DT_BOOL
     DT_LASTENTRY = xmipp.DT_LASTENTRY
+
+    # Backends tried (in order) before using Xmipp for reading headers,
+    # accessing image data and converting stacks. They can be disabled
+    # setting SCIPION_NUMPY_IMAGES=0
+    BACKENDS = [NumpyImageBackend]
+
+    # Numpy data types that correspond to the DT_* values
+    _NUMPY_TYPES = {DT_UCHAR: 'uint8',
+                    DT_SCHAR: 'int8',
+                    DT_USHORT: 'uint16',
+                    DT_SHORT: 'int16',
+                    DT_UINT: 'uint32',
+                    DT_INT: 'int32',
+                    DT_FLOAT: 'float32',
+                    DT_DOUBLE: 'float64',
+                    DT_COMPLEXFLOAT: 'complex64',
+                    DT_COMPLEXDOUBLE: 'complex128',
+                    DT_BOOL: 'bool'}
     
     def __init__(self):
         # Now it will use Xmipp image library
@@ -148,6 +167,27 @@ class ImageHandler(object):
         
         return os.path.exists(fn)
     
+    @classmethod
+    def _getBackend(cls, location):
+        """ Return the first backend that supports the format of the
+        given (index, filename) location, or None to use Xmipp.
+        """
+        if os.environ.get('SCIPION_NUMPY_IMAGES', '1') != '0':
+            for backend in cls.BACKENDS:
+                if backend.isSupported(location[1]):
+                    return backend
+        return None
+
+    @classmethod
+    def dataTypeFromNumpy(cls, dtype):
+        """ Return the DT_* value that corresponds to a numpy data type. """
+        import numpy as np
+        dtype = np.dtype(dtype).newbyteorder('=')
+        for dt, npType in cls._NUMPY_TYPES.iteritems():
+            if np.dtype(npType) == dtype:
+                return dt
+        return cls.DT_UNKNOWN
+
     @classmethod
     def getSupportedDataType(cls, inDataType, outputFilename):
         """ Returns the most simmilar data type supported by the output format"""
@@ -197,7 +237,18 @@ class ImageHandler(object):
         """
         inputLower = inputFn.lower()
         outputLower = outputFn.lower()
-        if outputLower.endswith('.img'):
+        inputBackend = self._getBackend((NO_INDEX, inputFn))
+        outputBackend = self._getBackend((NO_INDEX, outputFn))
+
+        if (inputBackend is not None and inputBackend is outputBackend and
+            outFormat is None and
+            outputBackend.canStore(outputFn,
+                                   inputBackend.getDataType((NO_INDEX,
+                                                             inputFn)))):
+            # Copy directly the (memory-mapped) data if the output
+            # format can store the input data type
+            inputBackend.convertStack(inputFn, outputFn, firstImg, lastImg)
+        elif outputLower.endswith('.img'):
             if (firstImg and lastImg) is None:
                 # FIXME Since now we can not read dm4 format in Scipion natively
                 # or writing recent .img format
@@ -247,6 +298,7 @@ class ImageHandler(object):
             location = self._convertToLocation(locationObj)
             fn = location[1]
             ext = pwutils.getExt(fn).lower()
+            backend = self._getBackend(location)
             
             if ext == '.png' or ext == '.jpg':
                 im = PIL.Image.open(fn)
@@ -258,6 +310,9 @@ class ImageHandler(object):
                 # we are opening an Eman2 process to read the .img files
                 from pyworkflow.em.packages.eman2.convert import getImageDimensions
                 return getImageDimensions(fn) # we are ignoring index here
+            elif backend is not None:
+                # Only the header is read
+                return backend.getDimensions(location)
             else:
                 self._img.read(location, xmipp.HEADER)
                 return self._img.getDimensions()
@@ -267,10 +322,26 @@ class ImageHandler(object):
     def getDataType(self, locationObj):
         if self.existsLocation(locationObj):
             location = self._convertToLocation(locationObj)
+            backend = self._getBackend(location)
+            if backend is not None:
+                return self.dataTypeFromNumpy(backend.getDataType(location))
             self._img.read(location, xmipp.HEADER)
             return self._img.getDataType()
         else:
             return None
+
+    def getData(self, locationObj):
+        """ Return a numpy array with the data of the given location.
+        For supported formats (e.g. MRC and SPIDER) the array is
+        memory-mapped to the file, so only the selected image of
+        the stack is read when the data is accessed.
+        """
+        location = self._convertToLocation(locationObj)
+        backend = self._getBackend(location)
+        if backend is not None:
+            return backend.getData(location)
+        self._img.read(location)
+        return self._img.getData()
     
     def read(self, inputObj):
         """ Create a new Image class from inputObj 
@@ -426,8 +497,18 @@ class ImageHandler(object):
         """ Compute a thumbnail of inputFn, save to ouptutFn.
         Optionally choose a scale factor eg scaleFactor=6 will make
         a thumbnail 6 times smaller.
+        For 2D images in a format supported by the numpy backend, the
+        thumbnail is computed in-process, otherwise e2proc2d.py is used.
         """
         outputFn = outputFn or self.getThumbnailFn(inputFn)
+        backend = self._getBackend((NO_INDEX, inputFn))
+
+        if (backend is not None and outputFn.lower().endswith('.png') and
+                backend.getDimensions((1, inputFn))[2] == 1):
+            backend.computeThumbnail(inputFn, outputFn, scaleFactor,
+                                     flipOnY=flipOnY, flipOnX=flipOnX)
+            return outputFn
+
         args = '"%s" "%s" ' % (inputFn, outputFn)
 
         process = "--process normalize"
@@ -31,6 +31,7 @@ for EM data objects like: Image, SetOfImage and others
 
 import os
 import json
+import pyworkflow.utils as pwutils
 from pyworkflow.object import *
 from constants import *
 from convert import ImageHandler
@@ -771,6 +772,12 @@ class EMSet(Set, EMObject):
         This is useful to set new attributes or update values
         for each item.
         """
+        self.appendMany(self._iterCopyItems(otherSet, updateItemCallback,
+                                            itemDataIterator, copyDisabled))
+
+    def _iterCopyItems(self, otherSet, updateItemCallback,
+                       itemDataIterator, copyDisabled):
+        """ Yield the new items to be appended in copyItems. """
         for item in otherSet:
             # copy items if enabled or copyDisabled=True
             if copyDisabled or item.isEnabled():
@@ -782,7 +789,7 @@ class EMSet(Set, EMObject):
                 # If updateCallBack function returns attribute
                 # _appendItem to False do not append the item
                 if getattr(newItem, "_appendItem", True):
-                    self.append(newItem)
+                    yield newItem
             else:
                 if itemDataIterator is not None:
                     next(itemDataIterator)  # just skip disabled data row
@@ -1061,6 +1068,7 @@ class SetOfParticles(SetOfImages):
     """
     ITEM_TYPE = Particle
     REP_TYPE = Particle
+    INDEXES = ['_micId', '_classId']
 
     def __init__(self, **kwargs):
         SetOfImages.__init__(self, **kwargs)
@@ -1249,6 +1257,7 @@ class SetOfCoordinates(EMSet):
     The SetOfCoordinates can also have information about TiltPairs.
     """
     ITEM_TYPE = Coordinate
+    INDEXES = ['_micId']
 
     def __init__(self, **kwargs):
         EMSet.__init__(self, **kwargs)
@@ -1330,18 +1339,24 @@ class SetOfCoordinates(EMSet):
 
 
 class Matrix(Scalar):
+    # Format used to store the matrix values. JSON text is used by default
+    # since it is read by other tools (e.g. the java viewer), but binary
+    # values (float64 or float32) are smaller and faster to store and read
+    # for big sets. It can be set with the SCIPION_MATRIX_STORAGE variable.
+    STORAGE = os.environ.get('SCIPION_MATRIX_STORAGE', pwutils.MATRIX_JSON)
+
     def __init__(self, **kwargs):
         Scalar.__init__(self, **kwargs)
         self._matrix = np.eye(4)
 
     def _convertValue(self, value):
-        """Value should be a str with comman separated values
-        or a list.
+        """Value should be a JSON text list or a buffer with the
+        binary values (see pyworkflow.utils.matrixFromValue).
         """
-        self._matrix = np.array(json.loads(value))
+        self._matrix = pwutils.matrixFromValue(value)
 
     def getObjValue(self):
-        self._objValue = json.dumps(self._matrix.tolist())
+        self._objValue = pwutils.matrixToValue(self._matrix, self.STORAGE)
         return self._objValue
 
     def setValue(self, i, j, value):
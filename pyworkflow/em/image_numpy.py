@@ -0,0 +1,433 @@
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+This module contains a pure NumPy reader/writer for MRC and SPIDER files.
+Image data is accessed through numpy.memmap, so reading the dimensions only
+reads the file header and the images of a stack are accessed one by one
+without loading the whole file in memory.
+It does not depend on Xmipp and it is used as a backend by the ImageHandler.
+"""
+
+import os
+
+import numpy as np
+
+
+NO_INDEX = 0  # Same as pyworkflow.em.constants.NO_INDEX
+
+MRC_HEADER_SIZE = 1024
+
+# MRC mode -> numpy data type
+MRC_MODES = {0: np.int8,
+             1: np.int16,
+             2: np.float32,
+             4: np.complex64,
+             6: np.uint16}
+
+MRC_EXTENSIONS = ['.mrc', '.mrcs', '.map', '.st', '.ali']
+SPIDER_EXTENSIONS = ['.spi', '.stk', '.vol', '.xmp']
+
+
+def _splitFormat(filename):
+    """ Split the filename and the optional format suffix
+    (e.g. 'volume.mrc:mrc' -> ('volume.mrc', 'mrc')).
+    """
+    if ':' in filename:
+        fn, fmt = filename.rsplit(':', 1)
+        return fn, fmt.lower()
+    return filename, None
+
+
+class ImageHeader(object):
+    """ Information read from the header of an image file needed
+    to map its data with numpy.
+    """
+    def __init__(self, x, y, z, n, dtype, offset, imageGap=0):
+        self.x, self.y, self.z, self.n = x, y, z, n
+        self.dtype = np.dtype(dtype)
+        self.offset = offset  # bytes before the data of the first image
+        self.imageGap = imageGap  # bytes between images (SPIDER headers)
+
+    def getDimensions(self):
+        return self.x, self.y, self.z, self.n
+
+    def getImageSize(self):
+        """ Number of bytes of the data of one image or volume. """
+        return self.x * self.y * self.z * self.dtype.itemsize
+
+
+class MrcFormat(object):
+    """ Read and write MRC files (images, volumes and stacks). """
+    @classmethod
+    def readHeader(cls, fn, fmt=None):
+        raw = np.fromfile(fn, dtype=np.uint8, count=MRC_HEADER_SIZE)
+        hdr = raw.view('<i4')
+        # Check the machine stamp and fall back to a sanity check of the mode
+        stamp = raw[212]
+        if stamp == 0x11 or (stamp != 0x44 and hdr[3] not in MRC_MODES):
+            hdr = hdr.byteswap()
+            byteOrder = '>'
+        else:
+            byteOrder = '<'
+
+        mode = int(hdr[3])
+        if mode not in MRC_MODES:
+            raise Exception("Unsupported MRC mode %d in file %s" % (mode, fn))
+
+        x, y, nz = int(hdr[0]), int(hdr[1]), int(hdr[2])
+        ispg, nsymbt = int(hdr[22]), int(hdr[23])
+        dtype = np.dtype(MRC_MODES[mode]).newbyteorder(byteOrder)
+        offset = MRC_HEADER_SIZE + nsymbt
+
+        # ':mrc' forces a volume and '.mrcs' or ':mrcs' a stack of images,
+        # otherwise use the space group as defined in MRC2014
+        if fmt == 'mrc':
+            isStack = False
+        elif fmt == 'mrcs' or fn.lower().endswith('.mrcs'):
+            isStack = True
+        else:
+            isStack = ispg == 0 and nz > 1
+
+        if isStack:
+            return ImageHeader(x, y, 1, nz, dtype, offset)
+        return ImageHeader(x, y, nz, 1, dtype, offset)
+
+    @classmethod
+    def writeHeader(cls, fn, x, y, z, n, dtype):
+        """ Write the header of a new MRC file (stack if n > 1). """
+        dtype = np.dtype(dtype)
+        modes = dict((np.dtype(v), k) for k, v in MRC_MODES.iteritems())
+        if dtype.newbyteorder('=') not in modes:
+            raise Exception("Data type %s not supported by MRC" % dtype)
+
+        nz = z * n
+        hdr = np.zeros(256, dtype='<i4')
+        hdr[0:3] = x, y, nz
+        hdr[3] = modes[dtype.newbyteorder('=')]
+        hdr[7:10] = x, y, nz
+        hdrFloat = hdr.view('<f4')
+        hdrFloat[10:13] = x, y, nz  # cell dimensions (pixel size = 1)
+        hdrFloat[13:16] = 90.
+        hdr[16:19] = 1, 2, 3
+        hdrFloat[19:21] = 0., -1.  # dmax < dmin: statistics not computed
+        hdr[22] = 0 if n > 1 else 1  # space group: 0 for stacks
+        hdr[52] = np.frombuffer('MAP ', dtype='<i4')[0]
+        hdr[53] = np.frombuffer('\x44\x44\x00\x00', dtype='<i4')[0]
+
+        with open(fn, 'wb') as f:
+            hdr.tofile(f)
+
+        return ImageHeader(x, y, 1 if n > 1 else z, n, dtype.newbyteorder('<'),
+                           MRC_HEADER_SIZE)
+
+
+class SpiderFormat(object):
+    """ Read and write SPIDER files (images, volumes and stacks).
+    In SPIDER stacks there is an overall header followed by each image,
+    preceded by its own header of the same size.
+    """
+    # 0-based position of the used header values
+    NZ, NY, IFORM, NX, LABREC, LABBYT, LENBYT, ISTACK, MAXIM, IMGNUM = \
+        0, 1, 4, 11, 12, 21, 22, 23, 25, 26
+
+    @classmethod
+    def readHeader(cls, fn, fmt=None):
+        hdr = np.fromfile(fn, dtype='<f4', count=27)
+        # The IFORM value is used to detect the endianness
+        if int(hdr[cls.IFORM]) not in (1, 3, -11, -12, -21, -22):
+            hdr = hdr.byteswap()
+            byteOrder = '>'
+        else:
+            byteOrder = '<'
+
+        if int(hdr[cls.IFORM]) < 0:
+            raise Exception("Fourier SPIDER files are not supported: %s" % fn)
+
+        x, y, z = int(hdr[cls.NX]), int(hdr[cls.NY]), int(hdr[cls.NZ])
+        labbyt = int(hdr[cls.LABBYT])
+        dtype = np.dtype(np.float32).newbyteorder(byteOrder)
+
+        if int(hdr[cls.ISTACK]) > 0:
+            n = int(hdr[cls.MAXIM])
+            return ImageHeader(x, y, z, n, dtype, 2 * labbyt, labbyt)
+        return ImageHeader(x, y, z, 1, dtype, labbyt)
+
+    @classmethod
+    def _createHeader(cls, x, y, z, n, isStack):
+        lenbyt = x * 4
+        labrec = int(np.ceil(256. / x))
+        hdr = np.zeros(labrec * x, dtype='<f4')
+        hdr[cls.NZ], hdr[cls.NY], hdr[cls.NX] = z, y, x
+        hdr[2] = y  # IREC: total number of records
+        hdr[cls.IFORM] = 3 if z > 1 else 1
+        hdr[cls.LABREC] = labrec
+        hdr[cls.LABBYT] = labrec * lenbyt
+        hdr[cls.LENBYT] = lenbyt
+        if isStack:
+            hdr[cls.ISTACK] = 2
+            hdr[cls.MAXIM] = n
+        return hdr
+
+    @classmethod
+    def writeHeader(cls, fn, x, y, z, n, dtype):
+        """ Write the headers of a new SPIDER file (stack if n > 1).
+        Only float32 data is supported in this format.
+        """
+        if np.dtype(dtype).newbyteorder('=') != np.dtype(np.float32):
+            raise Exception("Data type %s not supported by SPIDER" % dtype)
+
+        isStack = n > 1 or os.path.splitext(fn)[1].lower() == '.stk'
+        hdr = cls._createHeader(x, y, z, n, isStack)
+        labbyt = hdr.nbytes
+        imageSize = x * y * z * 4
+
+        with open(fn, 'wb') as f:
+            hdr.tofile(f)
+            if isStack:
+                imgHdr = cls._createHeader(x, y, z, n, isStack)
+                imgHdr[cls.ISTACK] = 0
+                imgHdr[cls.MAXIM] = 0
+                for i in range(1, n + 1):
+                    imgHdr[cls.IMGNUM] = i
+                    f.seek(labbyt + (i - 1) * (labbyt + imageSize))
+                    imgHdr.tofile(f)
+            # Reserve the space of the images data
+            f.seek(labbyt + (n * (labbyt + imageSize) if isStack
+                             else imageSize) - 1)
+            f.write('\0')
+
+        if isStack:
+            return ImageHeader(x, y, z, n, '<f4', 2 * labbyt, labbyt)
+        return ImageHeader(x, y, z, 1, '<f4', labbyt)
+
+
+class NumpyImageBackend(object):
+    """ ImageHandler backend to read and write MRC and SPIDER files
+    using numpy.memmap.
+    Locations are tuples (index, filename) where index starts at 1,
+    or NO_INDEX to use the whole file.
+    """
+    @classmethod
+    def getFormat(cls, filename):
+        """ Return the format class to handle this file or None. """
+        fn, fmt = _splitFormat(filename)
+        if fmt in ('mrc', 'mrcs'):
+            return MrcFormat
+        if fmt is None:
+            ext = os.path.splitext(fn)[1].lower()
+            if ext in MRC_EXTENSIONS:
+                return MrcFormat
+            if ext in SPIDER_EXTENSIONS:
+                return SpiderFormat
+        return None
+
+    @classmethod
+    def isSupported(cls, filename):
+        return cls.getFormat(filename) is not None
+
+    @classmethod
+    def readHeader(cls, filename):
+        fn, fmt = _splitFormat(filename)
+        return cls.getFormat(filename).readHeader(fn, fmt)
+
+    @classmethod
+    def getDimensions(cls, location):
+        """ Return (x, y, z, n) only reading the file header. """
+        index, filename = location
+        x, y, z, n = cls.readHeader(filename).getDimensions()
+        return (x, y, z, n) if index == NO_INDEX else (x, y, z, 1)
+
+    @classmethod
+    def getDataType(cls, location):
+        """ Return the numpy data type (in native byte order). """
+        return cls.readHeader(location[1]).dtype.newbyteorder('=')
+
+    @classmethod
+    def _memmap(cls, filename, header, mode):
+        """ Map the data of all images in the file as an array
+        with shape (n, z, y, x).
+        """
+        fn, _ = _splitFormat(filename)
+        h = header
+        imageItems = h.x * h.y * h.z
+
+        if h.imageGap:
+            from numpy.lib.stride_tricks import as_strided
+            stepItems = imageItems + h.imageGap / h.dtype.itemsize
+            flat = np.memmap(fn, dtype=h.dtype, mode=mode, offset=h.offset,
+                             shape=((h.n - 1) * stepItems + imageItems,))
+            # Skip the header of each image, this is still a view
+            data = as_strided(flat, shape=(h.n, imageItems),
+                              strides=(stepItems * h.dtype.itemsize,
+                                       h.dtype.itemsize))
+        else:
+            data = np.memmap(fn, dtype=h.dtype, mode=mode, offset=h.offset,
+                             shape=(h.n, imageItems))
+
+        return data.reshape((h.n, h.z, h.y, h.x))
+
+    @classmethod
+    def _flush(cls, data):
+        """ Flush to disk the memmap where the data array is mapped. """
+        while data is not None and not isinstance(data, np.memmap):
+            data = getattr(data, 'base', None)
+        if data is not None:
+            data.flush()
+
+    @classmethod
+    def getData(cls, location, mode='r'):
+        """ Return a memory-mapped array with the data of the location.
+        If the location has an index, a view to that image of the stack
+        is returned (shape (z, y, x) for volumes and (y, x) for images).
+        With NO_INDEX the array contains the whole stack (n, z, y, x).
+        """
+        index, filename = location
+        header = cls.readHeader(filename)
+        data = cls._memmap(filename, header, mode)
+
+        if index == NO_INDEX:
+            return data
+
+        if index < 1 or index > header.n:
+            raise Exception("Index %d out of range [1, %d] in file %s"
+                            % (index, header.n, filename))
+        img = data[index - 1]
+        return img[0] if header.z == 1 else img
+
+    @classmethod
+    def createEmptyFile(cls, filename, x, y, z=1, n=1, dtype=np.float32):
+        """ Create a new file with the given dimensions and data type
+        and return its memory-mapped data (n, z, y, x) for writing.
+        """
+        fn, _ = _splitFormat(filename)
+        header = cls.getFormat(filename).writeHeader(fn, x, y, z, n, dtype)
+        return cls._memmap(filename, header, 'r+')
+
+    @classmethod
+    def write(cls, data, filename, dtype=None):
+        """ Write a numpy array as a new file. The array can be an image
+        (y, x), a volume (z, y, x) or a stack (n, z, y, x).
+        """
+        data = np.asarray(data)
+        if data.ndim == 2:
+            data = data[np.newaxis, np.newaxis]
+        elif data.ndim == 3:
+            data = data[np.newaxis]
+        n, z, y, x = data.shape
+        out = cls.createEmptyFile(filename, x, y, z, n, dtype or data.dtype)
+        out[:] = data
+        cls._flush(out)
+
+    @classmethod
+    def canStore(cls, filename, dtype):
+        """ Return True if the data type can be stored in this file. """
+        dtype = np.dtype(dtype).newbyteorder('=')
+        fmt = cls.getFormat(filename)
+        if fmt is SpiderFormat:
+            return dtype == np.dtype(np.float32)
+        return dtype in [np.dtype(t) for t in MRC_MODES.values()]
+
+    @classmethod
+    def convertStack(cls, inputFn, outputFn, firstImg=None, lastImg=None):
+        """ Copy the images between firstImg and lastImg (1-based) from the
+        input to the output file. Volumes are treated as stacks of slices.
+        Data is copied directly between the memory-mapped files, without
+        reading the images one by one.
+        """
+        header = cls.readHeader(inputFn)
+        data = cls._memmap(inputFn, header, 'r')
+
+        if header.n == 1 and header.z > 1:
+            data = data.reshape((header.z, 1, header.y, header.x))
+
+        if firstImg is None or lastImg is None:
+            firstImg, lastImg = 1, data.shape[0]
+
+        n = lastImg - firstImg + 1
+        out = cls.createEmptyFile(outputFn, header.x, header.y, 1, n,
+                                  header.dtype.newbyteorder('='))
+        out[:] = data[firstImg - 1:lastImg]
+        cls._flush(out)
+
+    @classmethod
+    def computeThumbnail(cls, inputFn, outputFn, scaleFactor=6,
+                         flipOnY=False, flipOnX=False):
+        """ Write a reduced PNG image of the first image in inputFn.
+        Only 2D images are supported, the size is reduced by cropping
+        the Fourier transform (as e2proc2d.py --fouriershrink).
+        """
+        data = cls.getData((1, inputFn))
+        if data.ndim != 2:
+            raise Exception("Thumbnails can only be computed for 2D images: "
+                            "%s" % inputFn)
+        writePNG(fourierShrink(data, scaleFactor), outputFn,
+                 flipOnY=flipOnY, flipOnX=flipOnX)
+
+
+def fourierShrink(data, scaleFactor):
+    """ Reduce the size of a 2D image by the given factor, keeping only
+    the low frequencies of its Fourier transform.
+    """
+    if scaleFactor <= 1:
+        return np.asarray(data, dtype=np.float32)
+
+    y, x = data.shape
+    newY, newX = max(int(y / scaleFactor), 1), max(int(x / scaleFactor), 1)
+    ft = np.fft.rfft2(data)
+    # Positive frequencies are at the beginning and negative ones
+    # at the end of the rows
+    negY = newY // 2
+    cropped = np.concatenate((ft[:newY - negY, :newX // 2 + 1],
+                              ft[y - negY:, :newX // 2 + 1]))
+    shrunk = np.fft.irfft2(cropped, s=(newY, newX))
+    return (shrunk * (float(newY * newX) / (y * x))).astype(np.float32)
+
+
+def writePNG(data, outputFn, flipOnY=False, flipOnX=False):
+    """ Write a 2D array as an 8 bits PNG image. Values are scaled to the
+    range mean +/- 4 std to avoid that a few outliers darken the image.
+    Like EMAN2, the y axis points up in the image unless flipOnY is True.
+    The file is written with a temporary name and then renamed, so
+    other processes will never find it partially written.
+    """
+    from PIL import Image
+
+    data = np.asarray(data, dtype=np.float32)
+    if not flipOnY:
+        data = data[::-1]
+    if flipOnX:
+        data = data[:, ::-1]
+
+    avg, std = data.mean(), data.std()
+    low = max(data.min(), avg - 4 * std)
+    high = min(data.max(), avg + 4 * std)
+    scale = 255. / (high - low) if high > low else 0.
+    img = np.clip((data - low) * scale, 0, 255).astype(np.uint8)
+
+    folder, name = os.path.split(outputFn)
+    tmpFn = os.path.join(folder, '.%s.tmp' % name)
+    Image.fromarray(img).save(tmpFn, 'PNG')
+    os.rename(tmpFn, outputFn)
@@ -32,6 +32,7 @@ from constants import *
 from functions import *
 from classes import MetaData, Row, RowMetaData, MetaDataInfo
 from utils import *
+from star import StarReader, StarWriter, getStarBlocks
 
 
 
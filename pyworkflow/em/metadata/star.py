@@ -0,0 +1,283 @@
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+This module contains a native reader and writer of STAR files that does
+not depend on xmipp.MetaData. Data blocks are read and written row by row,
+so big files can be processed without loading them in memory.
+"""
+
+import shlex
+
+
+def splitBlockName(filename):
+    """ Split 'blockName@filename' into (blockName, filename).
+    The blockName will be None if not present.
+    """
+    if '@' in filename:
+        blockName, filename = filename.split('@', 1)
+        return blockName, filename
+    return None, filename
+
+
+def getStarBlocks(filename):
+    """ Return the names of all data blocks in the STAR file. """
+    blocks = []
+    with open(filename) as f:
+        for line in f:
+            if line.startswith('data_'):
+                blocks.append(line.strip()[5:])
+    return blocks
+
+
+def _toBool(value):
+    return value not in ('0', 'false', 'False', '-1')
+
+
+def _toInt(value):
+    try:
+        return int(value)
+    except ValueError:  # some programs write integers as 1.000000
+        return int(float(value))
+
+
+# Functions used to convert the STAR string values to a given python type
+CONVERTERS = {bool: _toBool, int: _toInt, long: _toInt}
+
+
+def _splitLine(line):
+    """ Split a data line in values, taking care of quoted strings. """
+    if '"' in line or "'" in line:
+        return shlex.split(line)
+    return line.split()
+
+
+class StarReader(object):
+    """ Read the rows of a data block of a STAR file.
+    The file is only read while iterating, one row at a time, e.g.:
+
+        with StarReader('particles.star', 'Particles') as reader:
+            print reader.getColumns()
+            for values in reader:
+                ...
+    """
+    def __init__(self, filename, blockName=None, types=None):
+        """
+        Params:
+            filename: the STAR file, it can also be 'blockName@filename'.
+            blockName: name of the data block (without 'data_'), if None
+                the first block in the file will be read.
+            types: optional dict with the python type for each column,
+                values of other columns will be returned as strings.
+        """
+        fileBlock, filename = splitBlockName(filename)
+        self._filename = filename
+        self._blockName = blockName if blockName is not None else fileBlock
+        self._file = open(filename)
+        self._columns = []
+        self._isLoop = False
+        self._singleValues = []
+        self._line = None  # first data line already read
+        self._readHeader()
+        self.setTypes(types or {})
+
+    def _readHeader(self):
+        dataStr = 'data_%s' % (self._blockName or '')
+        line = self._file.readline()
+
+        while line:
+            line = line.strip()
+            if line.startswith('data_') and (self._blockName is None or
+                                             line == dataStr):
+                break
+            line = self._file.readline()
+        else:
+            raise Exception("Block '%s' not found in file %s"
+                            % (dataStr, self._filename))
+
+        self._blockName = line[5:]
+        line = self._file.readline()
+
+        while line:
+            line = line.strip()
+            if line.startswith('loop_'):
+                self._isLoop = True
+            elif line.startswith('_'):
+                parts = line.split(None, 1)
+                self._columns.append(parts[0][1:])
+                if not self._isLoop:
+                    value = parts[1] if len(parts) > 1 else ''
+                    self._singleValues.append(_splitLine(value)[0]
+                                              if value else value)
+            elif line.startswith('data_'):
+                break
+            elif line and not line.startswith('#') and self._columns:
+                self._line = line
+                break
+            line = self._file.readline()
+
+    def setTypes(self, types):
+        """ Set the python type to convert the values of each column. """
+        self._converters = [CONVERTERS.get(types.get(c, str), types.get(c))
+                            for c in self._columns]
+        self._allStr = all(conv is None or conv is str
+                           for conv in self._converters)
+
+    def getBlockName(self):
+        return self._blockName
+
+    def getColumns(self):
+        """ Return the list with the columns names (without '_'). """
+        return list(self._columns)
+
+    def _convert(self, values):
+        if self._allStr:
+            return tuple(values)
+        return tuple(v if conv is None or conv is str else conv(v)
+                     for v, conv in zip(values, self._converters))
+
+    def __iter__(self):
+        """ Iterate over the rows of the block, yielding a tuple
+        with the values of each row (in the same order of the columns).
+        """
+        if not self._isLoop:
+            if self._columns:
+                yield self._convert(self._singleValues)
+            return
+
+        line = self._line
+        readline = self._file.readline
+
+        while line is not None:
+            if line:
+                if line.startswith('data_') or line.startswith('loop_'):
+                    break
+                if not line.startswith('#'):
+                    yield self._convert(_splitLine(line))
+            line = readline()
+            line = line.strip() if line else None
+
+        self._line = None
+
+    def iterDicts(self):
+        """ Iterate over the rows as dicts: {column: value}. """
+        columns = self._columns
+        for values in self:
+            yield dict(zip(columns, values))
+
+    def readColumns(self, *columns):
+        """ Read the values of the given columns (or all if none is passed)
+        and return a dict with a numpy array for each column.
+        """
+        import numpy as np
+
+        columns = columns or self._columns
+        indexes = [self._columns.index(c) for c in columns]
+        values = [[] for _ in columns]
+
+        for row in self:
+            for l, i in zip(values, indexes):
+                l.append(row[i])
+
+        result = {}
+        for c, l in zip(columns, values):
+            conv = self._converters[self._columns.index(c)]
+            dtype = object if conv is None or conv is str else None
+            result[c] = np.array(l, dtype=dtype)
+        return result
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def formatValue(value):
+    """ Format a python value to be written in a STAR file. """
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        if value != 0 and abs(value) < 0.001:
+            return '%0.6e' % value
+        return '%0.6f' % value
+    value = str(value)
+    if not value:
+        return '""'
+    if ' ' in value or '\t' in value:
+        return '"%s"' % value
+    return value
+
+
+class StarWriter(object):
+    """ Write data blocks to a STAR file. Rows are formatted and written
+    through a buffered file, so the rows don't need to be kept in memory:
+
+        with StarWriter('particles.star') as writer:
+            writer.writeBlock('Particles', columns)
+            for values in rows:
+                writer.writeRow(values)
+    """
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, filename, mode='w', bufferSize=None):
+        self._file = open(filename, mode, bufferSize or self.BUFFER_SIZE)
+        self._columns = None
+
+    def writeBlock(self, blockName, columns):
+        """ Start a new data block with a loop of the given columns. """
+        self._columns = list(columns)
+        self._file.write('\ndata_%s\n\nloop_\n' % (blockName or ''))
+        for i, c in enumerate(self._columns):
+            self._file.write('_%s #%d\n' % (c, i + 1))
+
+    def writeRow(self, values):
+        """ Write the values of a row in the current block. """
+        self._file.write(' '.join(formatValue(v) for v in values))
+        self._file.write('\n')
+
+    def writeRows(self, rows):
+        for values in rows:
+            self.writeRow(values)
+
+    def writeSingleRow(self, blockName, columnValues):
+        """ Write a block without loop, with (column, value) pairs. """
+        self._columns = None
+        self._file.write('\ndata_%s\n\n' % (blockName or ''))
+        for c, v in columnValues:
+            self._file.write('_%s %s\n' % (c, formatValue(v)))
+
+    def close(self):
+        self._file.write('\n')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -29,7 +29,9 @@
 """
 from classes import MetaData, Row
 from constants import LABEL_TYPES, MDL_ITEM_ID, MDL_ENABLED, MDL_IMAGE
-from functions import labelType, str2Label, getBlocksInMetaDataFile
+from functions import (labelType, str2Label, label2Str,
+                       getBlocksInMetaDataFile)
+from star import StarReader, StarWriter
 
 
 def label2Python(label):
@@ -139,6 +141,88 @@ def joinBlocks(inputMd, blockPrefix=None):
     return mdAll
 
 
+def iterStarRows(filename, blockName=None, removeDisabled=False):
+    """ Iterate over the rows of a STAR file without loading the whole
+    file into a MetaData. The same Row object is updated and returned
+    in each iteration (as in iterRows).
+    Params:
+        filename: the STAR file, it can also be 'blockName@filename'.
+        removeDisabled: skip rows with MDL_ENABLED <= 0.
+    """
+    with StarReader(filename, blockName) as reader:
+        # Map the columns to labels, ignoring the ones not known by Xmipp
+        labels = [str2Label(c) for c in reader.getColumns()]
+        types = {}
+        for c, label in zip(reader.getColumns(), labels):
+            if label >= 0:
+                types[c] = label2Python(label)
+        reader.setTypes(types)
+        validIndexes = [i for i, label in enumerate(labels) if label >= 0]
+        validLabels = [labels[i] for i in validIndexes]
+        enabledIndex = (labels.index(MDL_ENABLED)
+                        if removeDisabled and MDL_ENABLED in labels else None)
+
+        row = Row()
+        labelDict = row._labelDict
+
+        for objId, values in enumerate(reader):
+            if enabledIndex is not None and values[enabledIndex] <= 0:
+                continue
+            labelDict.clear()
+            row._objId = objId + 1
+            for label, i in zip(validLabels, validIndexes):
+                labelDict[label] = values[i]
+            yield row
+
+
+def writeStarRows(filename, rows, blockName=None):
+    """ Write rows (Row objects) into a STAR file.
+    The columns are the union of the labels of all rows, in the order
+    they first appear. As in MetaData, a default value is written if
+    a row does not contain some of the labels. Since the columns are
+    only known after the last row, the rows are first spooled to a
+    temporary file, so they are not kept in memory.
+    Params:
+        filename: the STAR file, it can also be 'blockName@filename'.
+        rows: iterable with the Row objects.
+        blockName: name of the data block.
+    """
+    import tempfile
+    import cPickle
+
+    if '@' in filename:
+        blockName, filename = filename.split('@', 1)
+
+    labels = []
+    labelsSet = set()
+    count = 0
+
+    with tempfile.TemporaryFile() as spool:
+        for row in rows:
+            values = list(row)
+            for label, _ in values:
+                if label not in labelsSet:
+                    labelsSet.add(label)
+                    labels.append(label)
+            cPickle.dump(values, spool, cPickle.HIGHEST_PROTOCOL)
+            count += 1
+
+        spool.seek(0)
+
+        with StarWriter(filename) as writer:
+            if count:
+                defaults = [label2Python(label)() for label in labels]
+                writer.writeBlock(blockName,
+                                  [label2Str(label) for label in labels])
+                for _ in xrange(count):
+                    rowDict = dict(cPickle.load(spool))
+                    writer.writeRow([rowDict.get(label, default)
+                                     for label, default in zip(labels,
+                                                               defaults)])
+            else:  # write an empty block
+                writer.writeSingleRow(blockName, [])
+
+
 class SetMdIterator():
     """ Class to iterate over an input set and skip
     elements not present in metadata.
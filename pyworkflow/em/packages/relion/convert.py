@@ -365,23 +365,27 @@ def alignmentToRow(alignment, alignmentRow, alignType):
     invTransform == True  -> for xmipp implies projection
                           -> for xmipp implies alignment
     """
-    is2D = alignType == em.ALIGN_2D
-    is3D = alignType == em.ALIGN_3D
     inverseTransform = alignType == em.ALIGN_PROJ
     matrix = alignment.getMatrix()
     shifts, angles = geometryFromMatrix(matrix, inverseTransform)
+    flip = numpy.linalg.det(matrix[0:2,0:2]) < 0
+    geometryToRow(shifts, angles, flip, alignmentRow, alignType)
+
 
+def geometryToRow(shifts, angles, flip, alignmentRow, alignType):
+    """ Write the shifts and angles computed from an alignment
+    matrix (see alignmentToRow) into the row.
+    """
     alignmentRow.setValue(md.RLN_ORIENT_ORIGIN_X, shifts[0])
     alignmentRow.setValue(md.RLN_ORIENT_ORIGIN_Y, shifts[1])
     
-    if is2D:
+    if alignType == em.ALIGN_2D:
         angle = angles[0] + angles[2]
         alignmentRow.setValue(md.RLN_ORIENT_PSI, -angle)
 
-        flip = bool(numpy.linalg.det(matrix[0:2,0:2]) < 0)
         if flip:
             print "FLIP in 2D not implemented"
-    elif is3D:
+    elif alignType == em.ALIGN_3D:
         raise Exception("3D alignment conversion for Relion not implemented. "
                         "It seems the particles were generated with an "
                         "incorrect alignment type. You may either re-launch "
@@ -427,6 +431,56 @@ def rowToAlignment(alignmentRow, alignType):
     return alignment
 
 
+def alignmentMatricesFromRows(rows, alignType):
+    """ Compute the transformation matrices of a list of rows at once.
+    The result is the same as calling rowToAlignment for every row,
+    with None for the rows without alignment labels.
+    """
+    from pyworkflow.em.transformations import matrices_from_geometry
+
+    if alignType == em.ALIGN_3D:
+        raise Exception("3D alignment conversion for Relion not implemented.")
+
+    is2D = alignType == em.ALIGN_2D
+    valid = [row.containsAny(ALIGNMENT_DICT) for row in rows]
+    n = len(rows)
+    angles = numpy.zeros((n, 3))
+    shifts = numpy.zeros((n, 3))
+
+    for i, row in enumerate(rows):
+        if valid[i]:
+            shifts[i, 0] = row.getValue(md.RLN_ORIENT_ORIGIN_X, 0.)
+            shifts[i, 1] = row.getValue(md.RLN_ORIENT_ORIGIN_Y, 0.)
+            if not is2D:
+                angles[i, 0] = row.getValue(md.RLN_ORIENT_ROT, 0.)
+                angles[i, 1] = row.getValue(md.RLN_ORIENT_TILT, 0.)
+                angles[i, 2] = row.getValue(md.RLN_ORIENT_PSI, 0.)
+                shifts[i, 2] = row.getValue(md.RLN_ORIENT_ORIGIN_Z, 0.)
+            else:
+                angles[i, 2] = - row.getValue(md.RLN_ORIENT_PSI, 0.)
+
+    matrices = matrices_from_geometry(shifts, angles,
+                                      inverse=alignType == em.ALIGN_PROJ)
+    return [M if v else None for M, v in izip(matrices, valid)]
+
+
+def geometryFromAlignmentMatrices(matrices, alignType):
+    """ Batch counterpart of the conversion done in alignmentToRow.
+    Params:
+        matrices: (N, 4, 4) array of alignment matrices.
+    Returns:
+        a tuple (shifts, angles, flip) of arrays with one row per matrix,
+        to be written with geometryToRow.
+    """
+    from pyworkflow.em.transformations import geometry_from_matrices
+
+    matrices = numpy.array(matrices, dtype=numpy.float64, copy=False)
+    shifts, angles = geometry_from_matrices(matrices,
+                                            inverse=alignType == em.ALIGN_PROJ)
+    flip = numpy.linalg.det(matrices[:, 0:2, 0:2]) < 0
+    return shifts, angles, flip
+
+
 def coordinateToRow(coord, coordRow, copyId=True):
     """ Set labels values from Coordinate coord to md row. """
     if copyId:
@@ -489,7 +543,15 @@ def imageToRow(img, imgRow, imgLabel=md.RLN_IMAGE_NAME, **kwargs):
     alignType = kwargs.get('alignType') 
     
     if alignType != em.ALIGN_NONE and img.hasTransform():
-        alignmentToRow(img.getTransform(), imgRow, alignType)
+        # The geometry could be precomputed for the whole set
+        # (see iterImagesRows), use it if the transform was not changed
+        geometry = kwargs.get('alignmentGeometry', None)
+        matrix = img.getTransform().getMatrix()
+        if geometry is not None and numpy.array_equal(matrix, geometry[0]):
+            geometryToRow(geometry[1], geometry[2], geometry[3],
+                          imgRow, alignType)
+        else:
+            alignmentToRow(img.getTransform(), imgRow, alignType)
                 
     if kwargs.get('writeAcquisition', True) and img.hasAcquisition():
         acquisitionToRow(img.getAcquisition(), imgRow)
@@ -555,7 +617,13 @@ def rowToParticle(partRow, particleClass=em.Particle, **kwargs):
     alignType = kwargs.get('alignType') 
     
     if alignType != em.ALIGN_NONE:
-        img.setTransform(rowToAlignment(partRow, alignType))
+        # The matrix could be precomputed for many rows at once
+        # (see readSetOfParticles)
+        matrix = kwargs.get('alignmentMatrix', None)
+        if matrix is None:
+            img.setTransform(rowToAlignment(partRow, alignType))
+        else:
+            img.setTransform(em.Transform(matrix))
         
     if kwargs.get('readAcquisition', True):
         img.setAcquisition(rowToAcquisition(partRow))
@@ -586,21 +654,81 @@ def rowToParticle(partRow, particleClass=em.Particle, **kwargs):
     return img
 
 
+# Number of rows read before converting their alignment in a batch
+ROWS_CHUNK = 1000
+
+
+def _iterRowChunks(rows, size):
+    """ Group the rows in lists of the given size. Rows are cloned
+    since the row iterators reuse the same Row object.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row.clone())
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iterAlignmentGeometry(imgSet, alignType):
+    """ Compute the geometry of all the alignment matrices of the set
+    in a single batch and yield (id, matrix, shifts, angles, flip) in the
+    same order used to iterate the set. Nothing is yielded if the
+    matrices can not be read from the set.
+    """
+    if (alignType in [em.ALIGN_NONE, em.ALIGN_3D] or
+            not hasattr(imgSet, 'getColumns')):
+        return
+
+    try:
+        columns = imgSet.getColumns(['id', '_transform._matrix'])
+    except Exception:
+        # the items do not have a transform or the mapper does
+        # not allow to read the columns directly
+        return
+
+    if len(columns):
+        matrices = columns['_transform._matrix']
+        shifts, angles, flip = geometryFromAlignmentMatrices(matrices,
+                                                             alignType)
+        for i, objId in enumerate(columns['id']):
+            yield objId, matrices[i], shifts[i], angles[i], flip[i]
+
+
 def readSetOfParticles(filename, partSet, **kwargs):
     """read from Relion image meta
         filename: The metadata filename where the image are.
         imgSet: the SetOfParticles that will be populated.
         rowToParticle: this function will be used to convert the row to Object
     """    
-    imgMd = md.MetaData(filename)
     # By default remove disabled items from metadata
     # be careful if you need to preserve the original number of items
-    if kwargs.get('removeDisabled', True):
-        imgMd.removeDisabled()
-    
-    for imgRow in md.iterRows(imgMd):
-        img = rowToParticle(imgRow, **kwargs)
-        partSet.append(img)
+    removeDisabled = kwargs.get('removeDisabled', True)
+
+    if filename.endswith('.star'):
+        # Stream the rows from the star file instead of loading it
+        imgRows = md.iterStarRows(filename, removeDisabled=removeDisabled)
+    else:
+        imgMd = md.MetaData(filename)
+        if removeDisabled:
+            imgMd.removeDisabled()
+        imgRows = md.iterRows(imgMd)
+
+    alignType = kwargs.get('alignType', em.ALIGN_NONE)
+    batchAlignment = alignType not in [em.ALIGN_NONE, em.ALIGN_3D]
+
+    # Read the rows in chunks to compute the alignment matrices
+    # of each chunk at once
+    for rows in _iterRowChunks(imgRows, ROWS_CHUNK):
+        if batchAlignment:
+            matrices = alignmentMatricesFromRows(rows, alignType)
+        for i, imgRow in enumerate(rows):
+            if batchAlignment:
+                kwargs['alignmentMatrix'] = matrices[i]
+            img = rowToParticle(imgRow, **kwargs)
+            partSet.append(img)
         
     partSet.setHasCTF(img.hasCTF())
     partSet.setAlignment(kwargs['alignType'])
@@ -618,15 +746,31 @@ def setOfImagesToMd(imgSet, imgMd, imgToFunc, **kwargs):
         rowFunc: this function can be used to setup the row before 
             adding to meta
     """
-    
+    for imgRow in iterImagesRows(imgSet, imgToFunc, **kwargs):
+        imgRow.writeToMd(imgMd, imgMd.addObject())
+
+
+def iterImagesRows(imgSet, imgToFunc, **kwargs):
+    """ Iterate over the images of the set, yielding the row
+    filled for each image with the imgToFunc function.
+    """
     if 'alignType' not in kwargs:
         kwargs['alignType'] = imgSet.getAlignment()
 
+    # Convert all the alignment matrices at once, they are matched
+    # with the images by id while iterating
+    geometryIter = _iterAlignmentGeometry(imgSet, kwargs['alignType'])
+    geometry = next(geometryIter, None)
+
     for img in imgSet:
-        objId = imgMd.addObject()
+        if geometry is not None and geometry[0] == img.getObjId():
+            kwargs['alignmentGeometry'] = geometry[1:]
+            geometry = next(geometryIter, None)
+        else:
+            kwargs.pop('alignmentGeometry', None)
         imgRow = md.Row()
         imgToFunc(img, imgRow, **kwargs)
-        imgRow.writeToMd(imgMd, objId)
+        yield imgRow
 
 
 def writeSetOfParticles(imgSet, starFile,
@@ -641,24 +785,31 @@ def writeSetOfParticles(imgSet, starFile,
         filesDict = convertBinaryFiles(imgSet, outputDir)
         kwargs['filesDict'] = filesDict
 
-    partMd = md.MetaData()
-    setOfImagesToMd(imgSet, partMd, particleToRow, **kwargs)
-    
-    if kwargs.get('fillMagnification', False):
+    fillMagnification = kwargs.get('fillMagnification', False)
+
+    if fillMagnification:
         pixelSize = imgSet.getSamplingRate()
         mag = imgSet.getAcquisition().getMagnification()
         detectorPxSize = mag * pixelSize / 10000
-        
-        partMd.fillConstant(md.RLN_CTF_MAGNIFICATION, mag)
-        partMd.fillConstant(md.RLN_CTF_DETECTOR_PIXEL_SIZE, detectorPxSize)
-    else:
-        # Remove Magnification from metadata to avoid wrong values of pixel size.
-        # In Relion if Magnification and DetectorPixelSize are in metadata,
-        # pixel size is ignored in the command line.
-        partMd.removeLabel(md.RLN_CTF_MAGNIFICATION)
 
+    def iterParticleRows():
+        for partRow in iterImagesRows(imgSet, particleToRow, **kwargs):
+            if fillMagnification:
+                partRow.setValue(md.RLN_CTF_MAGNIFICATION, float(mag))
+                partRow.setValue(md.RLN_CTF_DETECTOR_PIXEL_SIZE,
+                                 float(detectorPxSize))
+            else:
+                # Remove Magnification from metadata to avoid wrong values
+                # of pixel size. In Relion if Magnification and
+                # DetectorPixelSize are in metadata, pixel size is ignored
+                # in the command line.
+                partRow.removeLabel(md.RLN_CTF_MAGNIFICATION)
+            yield partRow
+
+    # Rows are written one by one to the star file, without
+    # creating the whole metadata in memory
     blockName = kwargs.get('blockName', 'Particles')
-    partMd.write('%s@%s' % (blockName, starFile))
+    md.writeStarRows('%s@%s' % (blockName, starFile), iterParticleRows())
 
     
 def writeReferences(inputSet, outputRoot, useBasename=False, **kwargs):
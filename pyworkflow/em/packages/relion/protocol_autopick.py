@@ -51,15 +51,19 @@ class ProtRelionAutopickBase(ProtParticlePicking, ProtRelionBase):
     #--------------------------- INSERT steps functions ------------------------
     def _insertAllSteps(self): 
         # Convert the input micrographs and references to 
-        # the required Relion star files
-        convertId = self._insertFunctionStep('convertInputStep', 
-                                 self.getInputMicrographs().strId(),
-                                 self.getInputReferences().strId())
+        # the required Relion star files, both can be done in parallel
+        convertDeps = [
+            self._insertFunctionStep('convertMicrographsStep',
+                                     self.getInputMicrographs().strId(),
+                                     processStep=True),
+            self._insertFunctionStep('convertReferencesStep',
+                                     self.getInputReferences().strId(),
+                                     processStep=True)]
         # Insert the picking steps for each micrograph separately 
         # (Relion requires in that way if micrographs have different dimensions)
         allMicSteps = []
         for mic in self.getInputMicrographs():
-            autopickId = self._insertAutopickStep(mic, convertId)
+            autopickId = self._insertAutopickStep(mic, convertDeps)
             allMicSteps.append(autopickId)
         # Register final coordinates as output
         self._insertFunctionStep('createOutputStep', 
@@ -91,7 +95,7 @@ class ProtRelionAutopickBase(ProtParticlePicking, ProtRelionBase):
     def _postprocessMicrographRow(self, img, imgRow):
         imgRow.writeToFile(self._getMicStarFile(img))
             
-    def convertInputStep(self, micsId, refsId):
+    def convertMicrographsStep(self, micsId):
         self._ih = ImageHandler() # used to convert micrographs
         # Match ctf information against the micrographs
         self.ctfDict = {}
@@ -103,7 +107,8 @@ class ProtRelionAutopickBase(ProtParticlePicking, ProtRelionBase):
         writeSetOfMicrographs(self.getInputMicrographs(), micStar, 
                               preprocessImageRow=self._preprocessMicrographRow,
                               postprocessImageRow=self._postprocessMicrographRow)
-        
+
+    def convertReferencesStep(self, refsId):
         writeReferences(self.getInputReferences(), self._getPath('input_references'), useBasename=True)  
         
     def autopickMicrographStep(self, micStarFile, params, threshold, minDistance, fom):
@@ -257,14 +262,14 @@ class ProtRelionAutopickFom(ProtRelionAutopickBase):
             self.autopickMicrographStep(self._getMicStarFile(mic), 
                                         params, threshold, minDistance, fom)  
                   
-    def _insertAutopickStep(self, mic, convertId):
+    def _insertAutopickStep(self, mic, convertDeps):
         """ Prepare the command line for calling 'relion_autopick' program """
         params = self.getAutopickParams()
         # Use by default the references size as --min_distance
         return self._insertFunctionStep('autopickMicrographStep', self._getMicStarFile(mic), 
                                         params, 0.25, 
                                         self.getInputDimA(), ' --write_fom_maps',
-                                        prerequisites=[convertId])
+                                        prerequisites=convertDeps)
         
     #--------------------------- STEPS functions -------------------------------
 
@@ -359,7 +364,7 @@ class ProtRelionAutopick(ProtRelionAutopickBase):
         
     #--------------------------- INSERT steps functions ------------------------
         
-    def _insertAutopickStep(self, mic, convertId):
+    def _insertAutopickStep(self, mic, convertDeps):
         """ Prepare the command line for calling 'relion_autopick' program """
         params = self.getAutopickParams()
         # Use by default the references size as --min_distance
@@ -368,7 +373,7 @@ class ProtRelionAutopick(ProtRelionAutopickBase):
                                         self.pickingThreshold.get(),
                                         self.interParticleDistance.get(),
                                         '', # neither read or write fom
-                                        prerequisites=[convertId])
+                                        prerequisites=convertDeps)
                 
     #--------------------------- STEPS functions -------------------------------
     
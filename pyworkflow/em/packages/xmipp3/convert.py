@@ -411,7 +411,16 @@ def imageToRow(img, imgRow, imgLabel, **kwargs):
     alignType = kwargs.get('alignType')
 
     if alignType != ALIGN_NONE:
-        alignmentToRow(img.getTransform(), imgRow, alignType)
+        # The geometry could be precomputed for the whole set
+        # (see setOfImagesToMd), use it if the transform was not changed
+        geometry = kwargs.get('alignmentGeometry', None)
+        transform = img.getTransform()
+        if (geometry is not None and transform is not None and
+                numpy.array_equal(transform.getMatrix(), geometry[0])):
+            geometryToRow(geometry[1], geometry[2], geometry[3],
+                          imgRow, alignType)
+        else:
+            alignmentToRow(transform, imgRow, alignType)
 
     if kwargs.get('writeAcquisition', True) and img.hasAcquisition():
         acquisitionToRow(img.getAcquisition(), imgRow)
@@ -453,7 +462,13 @@ def rowToImage(imgRow, imgLabel, imgClass, **kwargs):
     alignType = kwargs.get('alignType')
 
     if alignType != ALIGN_NONE:
-        img.setTransform(rowToAlignment(imgRow, alignType))
+        # The matrix could be precomputed for the whole metadata
+        # (see readSetOfImages)
+        matrix = kwargs.get('alignmentMatrix', None)
+        if matrix is None:
+            img.setTransform(rowToAlignment(imgRow, alignType))
+        else:
+            img.setTransform(Transform(matrix))
 
     if kwargs.get('readAcquisition', True):
         img.setAcquisition(rowToAcquisition(imgRow))
@@ -932,8 +947,14 @@ def readSetOfImages(filename, imgSet, rowToFunc, **kwargs):
             kwargs['alignType'] = ALIGN_NONE
 
     if imgMd.size() > 0:
-        for objId in imgMd:
+        matrices = None
+        if kwargs['alignType'] != ALIGN_NONE:
+            matrices = alignmentMatricesFromMd(imgMd, kwargs['alignType'])
+
+        for i, objId in enumerate(imgMd):
             imgRow = rowFromMd(imgMd, objId)
+            if matrices is not None:
+                kwargs['alignmentMatrix'] = matrices[i].copy()
             img = rowToFunc(imgRow, **kwargs)
             imgSet.append(img)
 
@@ -953,7 +974,17 @@ def setOfImagesToMd(imgSet, md, imgToFunc, **kwargs):
     if 'alignType' not in kwargs:
         kwargs['alignType'] = imgSet.getAlignment()
 
+    # Convert all the alignment matrices at once, they are matched
+    # with the images by id while iterating
+    geometryIter = _iterAlignmentGeometry(imgSet, kwargs['alignType'])
+    geometry = next(geometryIter, None)
+
     for img in imgSet:
+        if geometry is not None and geometry[0] == img.getObjId():
+            kwargs['alignmentGeometry'] = geometry[1:]
+            geometry = next(geometryIter, None)
+        else:
+            kwargs.pop('alignmentGeometry', None)
         objId = md.addObject()
         imgRow = XmippMdRow()
         imgToFunc(img, imgRow, **kwargs)
@@ -1460,10 +1491,17 @@ def alignmentToRow(alignment, alignmentRow, alignType):
                             "negative. This is not a valid transformation "
                             "matrix for Scipion.")
     shifts, angles = geometryFromMatrix(matrix, inverseTransform)
+    geometryToRow(shifts, angles, flip, alignmentRow, alignType)
+
+
+def geometryToRow(shifts, angles, flip, alignmentRow, alignType):
+    """ Write the shifts, angles and flip computed from an alignment
+    matrix (see alignmentToRow) into the row.
+    """
     alignmentRow.setValue(xmipp.MDL_SHIFT_X, shifts[0])
     alignmentRow.setValue(xmipp.MDL_SHIFT_Y, shifts[1])
 
-    if is2D:
+    if alignType == ALIGN_2D:
         angle = angles[0] + angles[2]
         alignmentRow.setValue(xmipp.MDL_ANGLE_PSI,  angle)
     else:
@@ -1472,7 +1510,114 @@ def alignmentToRow(alignment, alignmentRow, alignType):
         alignmentRow.setValue(xmipp.MDL_ANGLE_ROT,  angles[0])
         alignmentRow.setValue(xmipp.MDL_ANGLE_TILT, angles[1])
         alignmentRow.setValue(xmipp.MDL_ANGLE_PSI,  angles[2])
-    alignmentRow.setValue(xmipp.MDL_FLIP, flip)
+    alignmentRow.setValue(xmipp.MDL_FLIP, bool(flip))
+
+
+def alignmentMatricesFromMd(md, alignType):
+    """ Compute the transformation matrices of all rows of the metadata
+    at once, reading the alignment columns instead of row by row.
+    The result is the same as calling rowToAlignment for every row.
+    Return None if the metadata does not contain alignment labels.
+    """
+    from pyworkflow.em.transformations import matrices_from_geometry
+
+    if not _containsAny(md, ALIGNMENT_DICT):
+        return None
+
+    n = md.size()
+
+    def _column(label, dtype=float):
+        if md.containsLabel(label):
+            return numpy.array(md.getColumnValues(label), dtype=dtype)
+        return numpy.zeros(n, dtype=dtype)
+
+    flip = _column(xmipp.MDL_FLIP, dtype=bool)
+    shifts = numpy.zeros((n, 3))
+    angles = numpy.zeros((n, 3))
+    shifts[:, 0] = _column(xmipp.MDL_SHIFT_X)
+    shifts[:, 1] = _column(xmipp.MDL_SHIFT_Y)
+    psi = _column(xmipp.MDL_ANGLE_PSI)
+    rot = _column(xmipp.MDL_ANGLE_ROT)
+
+    if alignType == ALIGN_2D:
+        if numpy.any((rot != 0.) & (psi != 0.)):
+            print "HORROR rot and psi are different from zero in 2D case"
+        angles[:, 0] = psi + rot
+    else:
+        angles[:, 0] = rot
+        angles[:, 1] = _column(xmipp.MDL_ANGLE_TILT)
+        angles[:, 2] = psi
+        shifts[:, 2] = _column(xmipp.MDL_SHIFT_Z)
+        angles[flip, 1] += 180  # tilt + 180
+        angles[flip, 2] = 180 - angles[flip, 2]  # 180 - psi
+        shifts[flip, 0] *= -1  # -x
+
+    matrices = matrices_from_geometry(shifts, angles,
+                                      inverse=alignType == ALIGN_PROJ)
+
+    if alignType == ALIGN_2D:
+        matrices[flip, 0, :2] *= -1.
+        matrices[flip, 2, 2] = -1.
+    elif alignType == ALIGN_3D:
+        matrices[flip, 0, :3] *= -1.
+        matrices[flip, 3, 3] *= -1.
+
+    return matrices
+
+
+def geometryFromAlignmentMatrices(matrices, alignType):
+    """ Batch counterpart of the conversion done in alignmentToRow.
+    Params:
+        matrices: (N, 4, 4) array of alignment matrices.
+    Returns:
+        a tuple (shifts, angles, flip) of arrays with one row per matrix,
+        to be written with geometryToRow.
+    """
+    from pyworkflow.em.transformations import geometry_from_matrices
+
+    matrices = numpy.array(matrices, dtype=numpy.float64)
+
+    if alignType == ALIGN_2D:
+        flip = numpy.linalg.det(matrices[:, 0:2, 0:2]) < 0
+        matrices[flip, 0, :2] *= -1.
+        matrices[flip, 2, 2] = 1.
+    else:
+        flip = numpy.linalg.det(matrices[:, 0:3, 0:3]) < 0
+        if alignType == ALIGN_3D:
+            matrices[flip, 0, :4] *= -1.
+            matrices[flip, 3, 3] = 1.
+        elif numpy.any(flip):
+            raise Exception("the det of the transformation matrix is "
+                            "negative. This is not a valid transformation "
+                            "matrix for Scipion.")
+
+    shifts, angles = geometry_from_matrices(matrices,
+                                            inverse=alignType == ALIGN_PROJ)
+    return shifts, angles, flip
+
+
+def _iterAlignmentGeometry(imgSet, alignType):
+    """ Compute the geometry of all the alignment matrices of the set
+    in a single batch and yield (id, matrix, shifts, angles, flip) in the
+    same order used to iterate the set. Nothing is yielded if the
+    matrices can not be read from the set.
+    """
+    if alignType == ALIGN_NONE or not hasattr(imgSet, 'getColumns'):
+        return
+
+    try:
+        columns = imgSet.getColumns(['id', '_transform._matrix'])
+    except Exception:
+        # the items do not have a transform or the mapper does
+        # not allow to read the columns directly
+        return
+
+    if len(columns):
+        matrices = columns['_transform._matrix']
+        shifts, angles, flip = geometryFromAlignmentMatrices(matrices,
+                                                             alignType)
+        for i, objId in enumerate(columns['id']):
+            yield objId, matrices[i], shifts[i], angles[i], flip[i]
 
 
 def fillClasses(clsSet, updateClassCallback=None):
@@ -151,8 +151,13 @@ class XmippProtExtractParticlesPairs(ProtExtractParticlesPair, XmippProtocol):
     #--------------------------- INSERT steps functions ------------------------
     def _insertAllSteps(self):
         self._setupBasicProperties()
-        # Write pos files for each micrograph
-        firstStepId = self._insertFunctionStep('writePosFilesStep')
+        # Write pos files for each micrograph, the untilted and tilted
+        # coordinates are converted in parallel
+        coordsDeps = [self._insertFunctionStep('writeCoordinatesStep',
+                                               tilted, processStep=True)
+                      for tilted in [False, True]]
+        firstStepId = self._insertFunctionStep('writePosFilesStep',
+                                               prerequisites=coordsDeps)
 
         # For each micrograph insert the steps, run in parallel
         deps = []
@@ -203,16 +208,19 @@ class XmippProtExtractParticlesPairs(ProtExtractParticlesPair, XmippProtocol):
                                  prerequisites=[metaDeps], wait=False)
 
     # --------------------------- STEPS functions ------------------------------
-    def writePosFilesStep(self):
+    def writeCoordinatesStep(self, tilted):
         """ Write the pos file for each micrograph in metadata format
-        (both untilted and tilted). """
-        writeSetOfCoordinates(self._getExtraPath(),
-                              self.inputCoords.getUntilted(),
-                              scale=self.getBoxScale())
-        writeSetOfCoordinates(self._getExtraPath(),
-                              self.inputCoords.getTilted(),
+        (either untilted or tilted). """
+        if tilted:
+            coordSet = self.inputCoords.getTilted()
+        else:
+            coordSet = self.inputCoords.getUntilted()
+        writeSetOfCoordinates(self._getExtraPath(), coordSet,
                               scale=self.getBoxScale())
 
+    def writePosFilesStep(self):
+        """ Rename the pos files written for each micrograph when
+        using other micrographs. """
         # We need to find the mapping by micName (without ext) between the
         #  micrographs in the SetOfCoordinates and the Other micrographs
         if self._micsOther():
@@ -37,7 +37,7 @@ from pyworkflow import VERSION_1_1
 from pyworkflow.gui.plotter import plt
 import tkMessageBox
 from pyworkflow.protocol.constants import STATUS_RUNNING
-from pyworkflow.protocol import getUpdatedProtocol
+from pyworkflow.protocol import getUpdatedProtocol, getProtocolStatus
 
 from pyworkflow.em.plotter import EmPlotter
 from math import isinf
@@ -126,7 +126,10 @@ class MonitorCTF(Monitor):
         self.astigmatism = kwargs['astigmatism']
         self._dataBase = kwargs.get('dbName', CTF_LOG_SQLITE)
         self._tableName = kwargs.get('tableName', 'log')
-        self.readCTFs = set()
+        # Reader of the new CTFs and the columns to read, created
+        # when the output CTFs are available
+        self._ctfReader = None
+        self._ctfLabels = None
 
         self.conn = lite.connect(os.path.join(self.workingDir, self._dataBase),
                                  isolation_level=None)
@@ -138,41 +141,91 @@ class MonitorCTF(Monitor):
     def initLoop(self):
         self._createTable()
 
+    def _getCtfReader(self):
+        """ Create the reader of the output CTFs of the protocol, the
+        protocol is only loaded until its output is available.
+        """
+        if self._ctfReader is None:
+            from pyworkflow.object import SetStreamReader
+            from pyworkflow.em.data import SetOfCTF
+
+            prot = getUpdatedProtocol(self.protocol)
+            if hasattr(prot, 'outputCTF'):
+                ctf = prot.outputCTF.getFirstItem()
+                prot.outputCTF.close()
+                if ctf is not None:
+                    self._ctfLabels = self._getCtfLabels(ctf)
+                    self._ctfReader = SetStreamReader(
+                        SetOfCTF, prot.outputCTF.getFileName())
+        return self._ctfReader
+
+    def _getCtfLabels(self, ctf):
+        """ Return the labels of the columns to read for each CTF.
+        The resolution and fit quality labels depend on the program
+        used (see CTFModel.getResolution and CTFModel.getFitQuality).
+        """
+        def getLabel(attrName, otherNames):
+            if not getattr(ctf, attrName).hasValue():
+                for name in otherNames:
+                    if hasattr(ctf, name):
+                        return name
+            return attrName
+
+        labels = {'defocusU': '_defocusU',
+                  'defocusV': '_defocusV',
+                  'defocusAngle': '_defocusAngle',
+                  'resolution': getLabel('_resolution',
+                                         ['_ctffind4_ctfResolution',
+                                          '_gctf_ctfResolution',
+                                          '_xmipp_ctfCritMaxFreq']),
+                  'fitQuality': getLabel('_fitQuality',
+                                         ['_ctffind4_crossCorrelation',
+                                          '_gctf_crossCorrelation',
+                                          '_xmipp_ctfCritFitting']),
+                  'psdPath': '_psdFile',
+                  'micPath': '_micObj._filename'}
+
+        for plotName in ['plotCart', 'plotGlobal']:
+            if getattr(ctf.getMicrograph(), plotName, None) is not None:
+                labels['shiftPlotPath'] = '_micObj.%s._filename' % plotName
+                break
+
+        return labels
+
     def step(self):
-        prot = getUpdatedProtocol(self.protocol)
-        # Create set of processed CTF from CTF protocol
-        if hasattr(prot, 'outputCTF'):
-            CTFset = prot.outputCTF.getIdSet()
-        else:
+        # Read the status before the new rows, so the CTFs added before
+        # the protocol finished are read in this step or in the next one
+        finished = getProtocolStatus(self.protocol) != STATUS_RUNNING
+        reader = self._getCtfReader()
+        if reader is None:
             return False
-        # find difference
-        sys.stdout.flush()
-        diffSet = CTFset - self.readCTFs
-        setOfCTFs = prot.outputCTF
+
+        # Only the columns of the CTFs added since the last step are read
+        labels = self._ctfLabels
+        newRows, _ = reader.readColumns(labels.values())
         astigmatism = self.astigmatism
+        values = []
 
-        for ctfID in diffSet:
-            ctf = setOfCTFs[ctfID]
-            defocusU = ctf.getDefocusU()
-            defocusV = ctf.getDefocusV()
-            defocusAngle = ctf.getDefocusAngle()
+        for row in newRows:
+            ctfID = int(row['id'])
+            defocusU = row[labels['defocusU']]
+            defocusV = row[labels['defocusV']]
+            defocusAngle = row[labels['defocusAngle']]
             if defocusAngle > 360 or defocusAngle< -360:
                 defocusAngle = 0
             astig = abs(defocusU - defocusV)
-            resolution = ctf.getResolution()
-            if isinf(resolution):
+            resolution = row[labels['resolution']]
+            if resolution is None or isinf(resolution):
                  resolution = 0.
-            
-            fitQuality = ctf.getFitQuality()
-            if fitQuality is None or isinf(fitQuality): 
+
+            fitQuality = row[labels['fitQuality']]
+            if fitQuality is None or isinf(fitQuality):
                   fitQuality = 0.
-            
-            psdPath = os.path.abspath(ctf.getPsdFile())
-            micPath = os.path.abspath(ctf.getMicrograph().getFileName())
-            shiftPlot = (getattr(ctf.getMicrograph(), 'plotCart', None)
-                         or getattr(ctf.getMicrograph(), 'plotGlobal', None))
-            if shiftPlot is not None:
-                shiftPlotPath = os.path.abspath(shiftPlot.getFileName())
+
+            psdPath = os.path.abspath(row[labels['psdPath']])
+            micPath = os.path.abspath(row[labels['micPath']])
+            if 'shiftPlotPath' in labels:
+                shiftPlotPath = os.path.abspath(row[labels['shiftPlotPath']])
             else:
                 shiftPlotPath = ""
 
@@ -184,19 +237,9 @@ class MonitorCTF(Monitor):
                 defocusAngle = 180. - defocusAngle
                 print("ERROR: defocusU should be greater than defocusV")
 
-            # get CTFs with this ids a fill table
-            # do not forget to compute astigmatism
-#            sql = """INSERT INTO %s(defocusU,defocusV,astigmatism,ratio,psdPath)
-#                     VALUES(%f,%f,%f,%f,"%s");""" % (self._tableName, defocusU,
-#                     defocusV, defocusAngle, defocusU / defocusV, psdPath)
-            sql = """INSERT INTO %s(ctfID, defocusU,defocusV,astigmatism,ratio, resolution, fitQuality, micPath,psdPath,shiftPlotPath )
-                     VALUES(%d,%f,%f,%f,%f,%f,%f,"%s","%s","%s");""" % (self._tableName, ctfID, defocusU,
-                     defocusV, astig, defocusU / defocusV, resolution, fitQuality, micPath, psdPath, shiftPlotPath)
-            try:
-                self.cur.execute(sql)
-            except Exception as e:
-                print("ERROR: saving one data point (CTF monitor). I continue")
-                print e
+            values.append((ctfID, defocusU, defocusV, astig,
+                           defocusU / defocusV, resolution, fitQuality,
+                           micPath, psdPath, shiftPlotPath))
 
             if abs(defocusU - defocusV) > astigmatism:
                 self.warning("Astigmatism (defocusU - defocusV)  = %f."
@@ -212,9 +255,23 @@ class MonitorCTF(Monitor):
                              "minumum (%f)" % (defocusV, self.maxDefocus))
                 self.minDefocus = defocusV
 
-        self.readCTFs.update(diffSet)
+        # Store all the new CTFs at once
+        sql = """INSERT INTO %s(ctfID, defocusU, defocusV, astigmatism, ratio,
+                                resolution, fitQuality, micPath, psdPath,
+                                shiftPlotPath)
+                 VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?);""" % self._tableName
+        if values:
+            try:
+                self.cur.execute("BEGIN")
+                self.cur.executemany(sql, values)
+                self.cur.execute("COMMIT")
+            except Exception as e:
+                print("ERROR: saving data points (CTF monitor). I continue")
+                print e
+                self.conn.rollback()
+
         # Finish when protocol is not longer running
-        return prot.getStatus() != STATUS_RUNNING
+        return finished
 
     def _createTable(self):
         self.cur.execute("""CREATE TABLE IF NOT EXISTS  %s(
@@ -196,6 +196,7 @@ class ProtMonitorSummary(ProtMonitor):
         monitor.step = stepAll
 
         monitor.loop()
+        reportHtml.close()
 
     def createReportDir(self):
         self.reportDir = os.path.abspath(self._getExtraPath(self.getProject().getShortName()))
@@ -44,7 +44,7 @@ import getnifs
 from pyworkflow import VERSION_1_1
 from pyworkflow.gui.plotter import plt
 from pyworkflow.protocol.constants import STATUS_RUNNING, STATUS_FINISHED
-from pyworkflow.protocol import getUpdatedProtocol
+from pyworkflow.protocol import getProtocolStatus
 from pyworkflow.em.plotter import EmPlotter
 from pyworkflow.viewer import (DESKTOP_TKINTER, WEB_DJANGO, Viewer)
 
@@ -252,6 +252,7 @@ class MonitorSystem(Monitor):
         self.conn = lite.connect(os.path.join(self.workingDir, self._dataBase),
                                  isolation_level=None)
         self.cur = self.conn.cursor()
+        self._insertCmd = None
 
     def warning(self, msg):
         self.notify("Scipion System Monitor WARNING", msg)
@@ -263,7 +264,6 @@ class MonitorSystem(Monitor):
 
     def step(self):
         valuesDict = {}
-        valuesDict['table'] = self._tableName
         cpu = valuesDict['cpu'] = psutil.cpu_percent(interval=0)
         mem = valuesDict['mem'] = psutil.virtual_memory().percent
         swap = valuesDict['swap'] = psutil.swap_memory().percent
@@ -330,30 +330,21 @@ class MonitorSystem(Monitor):
             self.warning("SWAP allocation =%f." % swap)
             self.swapAlert = swap
 
-        sqlCommand = "INSERT INTO %(table)s ("
-        for label in self.labelList:
-            sqlCommand += "%s, " % label
-        # remove last comma
-        sqlCommand = sqlCommand[:-2]
-        sqlCommand += ") VALUES("
-        for label in self.labelList:
-            sqlCommand += "%"+"(%s)f, " % label
-        # remove last comma
-        sqlCommand = sqlCommand[:-2]
-        sqlCommand += ");"
-
-        sql = sqlCommand % valuesDict
+        if self._insertCmd is None:
+            self._insertCmd = "INSERT INTO %s (%s) VALUES(%s);" % (
+                self._tableName, ', '.join(self.labelList),
+                ', '.join('?' * len(self.labelList)))
 
         try:
-            self.cur.execute(sql)
+            self.cur.execute(self._insertCmd,
+                             [valuesDict.get(label) for label in self.labelList])
         except Exception as e:
             print("ERROR: saving one data point (monitor). I continue")
 
-        # Return finished = True if all protocols have finished
-        finished = []
-        for prot in self.protocols:
-            updatedProt = getUpdatedProtocol(prot)
-            finished.append(updatedProt.getStatus() != STATUS_RUNNING)
+        # Return finished = True if all protocols have finished, the
+        # status is read from the run.db without loading the protocols
+        finished = [getProtocolStatus(prot) != STATUS_RUNNING
+                    for prot in self.protocols]
 
         return all(finished)
 
@@ -55,6 +55,41 @@ SHIFT_THUMBS = 'imgShiftThumbs'
 MIC_ID = 'micId'
 DEFOCUS_HIST_BIN_WIDTH = 0.5
 RESOLUTION_HIST_BIN_WIDTH = 0.5
+# Actions to generate the images of the report
+IMG_LINK = 'link'
+IMG_THUMB = 'thumb'
+IMG_PSD = 'psd'
+
+
+def isUpToDate(srcPath, dstPath):
+    """ Return True if dstPath exists and is newer than srcPath. """
+    return (exists(dstPath) and
+            (not exists(srcPath) or
+             os.path.getmtime(dstPath) >= os.path.getmtime(srcPath)))
+
+
+def generateImage(args):
+    """ Generate one image of the report. This function is executed by
+    the workers of the ReportHtml pool, so it receives a tuple
+    (action, srcPath, dstPath, scaleFactor) and returns an error message
+    or None if the image was generated.
+    """
+    action, srcPath, dstPath, scaleFactor = args
+    try:
+        if action == IMG_LINK:
+            pwutils.createAbsLink(srcPath, dstPath)
+        elif action == IMG_PSD:
+            from pyworkflow.em.image_numpy import writePNG
+            psdImg = ImageHandler().read(srcPath)
+            psdImg.convertPSD()
+            writePNG(psdImg.getData(), dstPath, flipOnY=True)
+        else:
+            ImageHandler().computeThumbnail(srcPath, dstPath,
+                                            scaleFactor=scaleFactor,
+                                            flipOnY=True)
+    except Exception as ex:
+        return "Error generating image %s: %s" % (dstPath, ex)
+    return None
 
 
 class ReportHtml:
@@ -89,6 +124,11 @@ class ReportHtml:
 
         self.publishCmd = publishCmd
         self.refreshSecs = kwargs.get('refreshSecs', 60)
+        # Number of processes used to generate the thumbnails
+        self.numWorkers = kwargs.get('numWorkers',
+                                     min(4, multiprocessing.cpu_count()))
+        self._pool = None
+
     def _getHTMLTemplatePath(self):
         """ Returns the path of the customized template at
         config/execution.summary.html or the standard scipion HTML template"""
@@ -234,60 +274,89 @@ class ReportHtml:
                     if PSD_PATH in self.thumbPaths:
                         self.thumbPaths.pop(PSD_PATH, None)
 
-    def generateReportImages(self, firstThumbIndex=0, micScaleFactor=6):
-        """ Function to generate thumbnails for the report. Uses data from
-        self.thumbPaths.
-
-        ===== Params =====
-        - firstThumbIndex: index from which we start generating thumbnails
-        - micScaleFactor: how much to reduce in size the micrographs.
-
+    def _getPool(self):
+        """ Create the pool of processes to generate the images. """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.numWorkers)
+        return self._pool
+
+    def close(self):
+        """ Wait for the pending images and stop the pool. """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def getReportImagesTasks(self, firstThumbIndex=0, micScaleFactor=6):
+        """ Return the list of (action, srcPath, dstPath, scaleFactor)
+        needed to generate the thumbnails of the report, starting from
+        firstThumbIndex and skipping the ones that are up to date.
         """
-        ih = ImageHandler()
+        tasks = []
+
+        def addTask(action, srcPath, dstKey, i, scaleFactor=1):
+            dstPath = join(self.reportDir, self.thumbPaths[dstKey][i])
+            if not isUpToDate(srcPath, dstPath):
+                tasks.append((action, srcPath, dstPath, scaleFactor))
 
         numMics = len(self.thumbPaths[MIC_PATH])
 
         for i in range(firstThumbIndex, numMics):
-            print('Generating images for mic %d' % (i+1))
             # mic thumbnails
-            dstImgPath = join(self.reportDir, self.thumbPaths[MIC_THUMBS][i])
-            if not exists(dstImgPath):
-                if self.micThumbSymlinks:
-                    pwutils.createAbsLink(self.thumbPaths[MIC_PATH][i], dstImgPath)
-                else:
-                    ih.computeThumbnail(self.thumbPaths[MIC_PATH][i],
-                                        dstImgPath, scaleFactor=micScaleFactor,
-                                        flipOnY=True)
+            micPath = self.thumbPaths[MIC_PATH][i]
+            if self.micThumbSymlinks:
+                addTask(IMG_LINK, micPath, MIC_THUMBS, i)
+            else:
+                addTask(IMG_THUMB, micPath, MIC_THUMBS, i, micScaleFactor)
 
             # shift plots
             if SHIFT_THUMBS in self.thumbPaths:
-                dstImgPath = join(self.reportDir, self.thumbPaths[SHIFT_THUMBS][i])
-                if not exists(dstImgPath):
-                    pwutils.createAbsLink(self.thumbPaths[SHIFT_PATH][i], dstImgPath)
+                addTask(IMG_LINK, self.thumbPaths[SHIFT_PATH][i],
+                        SHIFT_THUMBS, i)
 
             # Psd thumbnails
             # If there ARE thumbnail for the PSD (no ctf protocol and
             # moviealignment hasn't computed it
             if PSD_THUMBS in self.thumbPaths:
+                srcImgPath = self.thumbPaths[PSD_PATH][i]
                 if self.ctfProtocol is None:
-                    srcImgPath = self.thumbPaths[PSD_PATH][i]
-                    dstImgPath = join(self.reportDir, self.thumbPaths[PSD_THUMBS][i])
-                    if not exists(dstImgPath) and srcImgPath is not None:
-                        if srcImgPath.endswith('psd'):
-                            psdImg1 = ih.read(srcImgPath)
-                            psdImg1.convertPSD()
-                            psdImg1.write(dstImgPath)
-                            ih.computeThumbnail(dstImgPath, dstImgPath,
-                                                scaleFactor=1, flipOnY=True)
-                        else:
-                            pwutils.createAbsLink(srcImgPath, dstImgPath)
+                    if srcImgPath is not None:
+                        action = (IMG_PSD if srcImgPath.endswith('psd')
+                                  else IMG_LINK)
+                        addTask(action, srcImgPath, PSD_THUMBS, i)
                 else:
-                    dstImgPath = join(self.reportDir, self.thumbPaths[PSD_THUMBS][i])
-                    if not exists(dstImgPath):
-                        ih.computeThumbnail(self.thumbPaths[PSD_PATH][i],
-                                            dstImgPath, scaleFactor=1, flipOnY=True)
+                    addTask(IMG_THUMB, srcImgPath, PSD_THUMBS, i)
+
+        return tasks
+
+    def generateReportImages(self, firstThumbIndex=0, micScaleFactor=6,
+                             wait=True):
+        """ Function to generate thumbnails for the report. Uses data from
+        self.thumbPaths. The images are generated by a pool of processes.
+
+        ===== Params =====
+        - firstThumbIndex: index from which we start generating thumbnails
+        - micScaleFactor: how much to reduce in size the micrographs.
+        - wait: if False, return without waiting for the images to be done.
+
+        """
+        tasks = self.getReportImagesTasks(firstThumbIndex, micScaleFactor)
+        if not tasks:
+            return
 
-        return
+        print('Generating %d images for mics %d to %d'
+              % (len(tasks), firstThumbIndex + 1,
+                 len(self.thumbPaths[MIC_PATH])))
+
+        def printErrors(errors):
+            for err in errors:
+                if err is not None:
+                    print(err)
+
+        result = self._getPool().map_async(generateImage, tasks,
+                                           callback=printErrors)
+        if wait:
+            result.wait()
 
     def processDefocusValues(self, defocusList):
         maxDefocus = self.protocol.maxDefocus.get()*1e-4
@@ -381,14 +450,10 @@ class ReportHtml:
             numMics = len(self.thumbPaths[MIC_PATH])
             numMicsToDo = numMics - numMicsDone
 
-        if numMicsToDo <= 10:
-            # we have few new images, eg streaming mode, generate thumbnails now
-            self.generateReportImages(firstThumbIndex=numMicsDone)
-        else:
-            # we have many images, generate thumbs in a separate process
-            process = multiprocessing.Process(target=self.generateReportImages,
-                                              args=(numMicsDone,))
-            process.start()
+        # If we have few new images, eg streaming mode, wait for the
+        # thumbnails now, otherwise they will be ready in next updates
+        self.generateReportImages(firstThumbIndex=numMicsDone,
+                                  wait=numMicsToDo <= 10)
 
         # send over only thumbnails of the mics that have been fully processed
         self.thumbsReady = self.checkNewThumbsReady()
@@ -250,6 +250,33 @@ class EMProtocol(Protocol):
                       % sleepOnWait)
             time.sleep(sleepOnWait)
 
+    def _getStreamReader(self, inputSet, SetClass):
+        """ Return the reader used to load the new items of the input set
+        in streaming. A reader is kept for each set file, so every call to
+        its read() method will only return items not read before.
+        """
+        from pyworkflow.object import SetStreamReader
+        readers = getattr(self, '_streamReaders', None)
+        if readers is None:
+            readers = self._streamReaders = {}
+        setFn = inputSet.getFileName()
+        if setFn not in readers:
+            readers[setFn] = SetStreamReader(SetClass, setFn)
+        return readers[setFn]
+
+    def _getJournal(self, filename):
+        """ Return the journal used to keep track of the ids written to
+        the given file (e.g. done or failed items in streaming). A journal
+        is kept for each file, so every call to its update() method will
+        only read the ids added after the previous one.
+        """
+        from pyworkflow.utils.journal import IdJournal
+        journals = getattr(self, '_journals', None)
+        if journals is None:
+            journals = self._journals = {}
+        if filename not in journals:
+            journals[filename] = IdJournal(filename)
+        return journals[filename]
 
     def _insertNewMics(self, inputMics, getMicKeyFunc,
                        insertStepFunc, insertStepListFunc, *args):
@@ -32,7 +32,7 @@ from datetime import timedelta, datetime
 
 import pyworkflow.utils as pwutils
 import pyworkflow.protocol.params as params
-from pyworkflow.utils.path import expandPattern, copyFile, createAbsLink
+from pyworkflow.utils.path import expandPattern, cloneFile, createAbsLink
 from pyworkflow.em.protocol import EMProtocol
 
 
@@ -141,6 +141,15 @@ class ProtImportFiles(ProtImport):
               help="Interval of time (in seconds) after which, if a file has "
                    "not changed, we consider it as a new file. \n")
 
+        form.addParam('copyWorkers', params.IntParam, default=4,
+              condition='dataStreaming',
+              expertLevel=params.LEVEL_ADVANCED,
+              label="Import threads",
+              help="Number of files that are copied (or linked) and "
+                   "whose header is read at the same time while importing "
+                   "in streaming. Files are added to the output in the same "
+                   "order they are found.")
+
     def _defineImportParams(self, form):
         """ Override to add options related to the different types
         of import that are allowed by each protocol.
@@ -221,17 +230,37 @@ class ProtImportFiles(ProtImport):
         if pattern is None:
             pattern = self.getPattern()
 
-        filePaths = glob(pattern)
-        filePaths.sort()
+        watcher = getattr(self, '_fileWatcher', None)
+
+        if watcher is not None and watcher.getPattern() == pattern:
+            filePaths = watcher.update()
+            msg = ("Found %d files (%d new), %d folders listed in %0.3f secs"
+                   % (len(filePaths), watcher.lastNew, watcher.lastScanned,
+                      watcher.lastTime))
+            if watcher.lastNew or watcher.lastTime > 1:
+                self.info(msg)
+            else:
+                self.debug(msg)
+        else:
+            filePaths = glob(pattern)
+            filePaths.sort()
         self.numberOfFiles = len(filePaths)
         
         return filePaths
 
+    def watchMatchFiles(self, pattern=None):
+        """ Keep the files matching the pattern between calls to
+        getMatchFiles, so only the folders modified since the previous
+        call are listed. Used when importing in streaming.
+        """
+        from pyworkflow.utils.watcher import FileWatcher
+        self._fileWatcher = FileWatcher(pattern or self.getPattern())
+
     def getCopyOrLink(self):    
         # Set a function to copyFile or createLink
         # depending in the user selected option 
         if self.copyFiles:
-            return copyFile
+            return cloneFile
         else:
             return createAbsLink
 
@@ -32,6 +32,8 @@ import re
 from os.path import basename, exists, isdir
 import time
 from datetime import timedelta, datetime
+from itertools import izip
+from multiprocessing.pool import ThreadPool
 
 import pyworkflow.utils as pwutils
 from pyworkflow.utils.properties import Message
@@ -210,11 +212,10 @@ class ProtImportImages(ProtImportFiles):
         # Call a function that should be implemented by each subclass
         self.setSamplingRate(imgSet)
         outFiles = [imgSet.getFileName()]
-        imgh = ImageHandler()
         img = imgSet.ITEM_TYPE()
         img.setAcquisition(acquisition)
-        n = 1
         copyOrLink = self.getCopyOrLink()
+        pool = ThreadPool(self.copyWorkers.get(1))
         outputName = self._getOutputName()
         alreadyWarned = False  # Use this flag to warn only once
 
@@ -224,6 +225,8 @@ class ProtImportImages(ProtImportFiles):
 
         i = 0
         lastDetectedChange = datetime.now()
+        # Only list again the folders that changed in each check
+        self.watchMatchFiles()
 
         # Ignore the timeout variables if we are not really in streaming mode
         if self.dataStreaming:
@@ -238,6 +241,8 @@ class ProtImportImages(ProtImportFiles):
             someNew = False
             someAdded = False
 
+            newFiles = []
+
             for fileName, uniqueFn, fileId in self.iterNewInputFiles():
                 someNew = True
                 if self.fileModified(fileName, fileTimeout):
@@ -251,15 +256,21 @@ class ProtImportImages(ProtImportFiles):
                         self.warning('Removing white spaces from copies/symlinks.')
                         alreadyWarned = True
                     dst = dst.replace(' ', '')
-                copyOrLink(fileName, dst)
+                newFiles.append((fileName, uniqueFn, fileId, dst))
 
+            # Files are copied (or linked) and their dimensions read by
+            # the pool workers, but they are added to the set in order
+            t0 = time.time()
+            totalSize = 0
+
+            for (fileName, uniqueFn, fileId, dst), (n, size) in \
+                    _iterImportFiles(pool, copyOrLink, newFiles,
+                                     self._checkStacks):
+                totalSize += size
                 self.debug('Importing file: %s' % fileName)
                 self.debug("uniqueFn: %s" % uniqueFn)
                 self.debug("dst Fn: %s" % dst)
 
-                if self._checkStacks:
-                    _, _, _, n = imgh.getDimensions(dst)
-
                 someAdded = True
                 self.debug('Appending file to DB...')
                 if self.importedFiles: # enable append after first append
@@ -284,6 +295,15 @@ class ProtImportImages(ProtImportFiles):
                 outFiles.append(dst)
                 self.debug('After append. Files: %d' % len(outFiles))
 
+            if newFiles:
+                elapsed = time.time() - t0
+                mb = totalSize / float(1024 * 1024)
+                self.info("Imported %d files (%0.1f MB) in %0.2f secs "
+                          "(%0.1f MB/s, %0.1f files/s)"
+                          % (len(newFiles), mb, elapsed,
+                             mb / max(elapsed, 1e-3),
+                             len(newFiles) / max(elapsed, 1e-3)))
+
             if someAdded:
                 self.debug('Updating output...')
                 self._updateOutputSet(outputName, imgSet,
@@ -313,6 +333,9 @@ class ProtImportImages(ProtImportFiles):
                 # the timestamp of the last event
                 lastDetectedChange = now
 
+        pool.close()
+        pool.join()
+
         self._updateOutputSet(outputName, imgSet,
                               state=imgSet.STREAM_CLOSED)
 
@@ -559,3 +582,26 @@ class ProtImportImages(ProtImportFiles):
     def streamingHasFinished(self):
         return os.path.exists(self._getStopStreamingFilename())
     
+
+
+def _iterImportFiles(pool, copyOrLink, newFiles, checkStacks):
+    """ Import the new files with the pool workers. Each item of newFiles
+    is a tuple (fileName, uniqueFn, fileId, dst), and (item, (n, size))
+    is yielded in the same order of newFiles, no matter the order in
+    which the workers finish.
+    """
+    tasks = [(copyOrLink, newFile[0], newFile[-1], checkStacks)
+             for newFile in newFiles]
+    return izip(newFiles, pool.imap(_importFileTask, tasks))
+
+
+def _importFileTask(task):
+    """ Copy (or link) a file to import and read its number of images
+    if it is a stack. Executed by the workers of the import pool.
+    Returns the number of images and the size of the copied file.
+    """
+    copyOrLink, fileName, dst, checkStacks = task
+    copyOrLink(fileName, dst)
+    n = ImageHandler().getDimensions(dst)[3] if checkStacks else 1
+    size = os.path.getsize(dst) if not os.path.islink(dst) else 0
+    return n, size
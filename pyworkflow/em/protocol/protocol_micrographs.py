@@ -52,6 +52,9 @@ class ProtMicrographs(EMProtocol):
 
 class ProtCTFMicrographs(ProtMicrographs):
     """ Base class for all protocols that estimates the CTF"""
+    # Seconds between checks of the done marker file of micrographs
+    # not found in the list of processed ones (see _isMicDone)
+    MARKER_CHECK_SECS = 30
 
     def __init__(self, **kwargs):
         EMProtocol.__init__(self, **kwargs)
@@ -460,6 +463,21 @@ class ProtCTFMicrographs(ProtMicrographs):
         self._checkNewInput()
         self._checkNewOutput()
 
+    def _stepFinished(self, step):
+        """ Add the micrograph to the list of processed ones as soon as
+        its estimation step finishes, so _isMicDone does not need to
+        check the marker file of every micrograph.
+        """
+        doContinue = ProtMicrographs._stepFinished(self, step)
+
+        if step.funcName.get() == '_estimateCTF' and step.isFinished():
+            _, micDir, micKey = step._args
+            mic = getattr(self, 'micDict', {}).get(micKey)
+            if mic is not None and exists(self._getMicrographDone(micDir)):
+                self._writeProcessedList([mic])
+
+        return doContinue
+
     def _checkNewInput(self):
         # Check if there are new micrographs to process from the input set
         localFile = self.getInputMicrographs().getFileName()
@@ -543,22 +561,19 @@ class ProtCTFMicrographs(ProtMicrographs):
                         lambda mic: mic.getMicName())
         
     def _loadSet(self, inputSet, SetClass, getKeyFunc):
-        """ Load a given input set if their items are not already present
-        in the self.micDict.
+        """ Load the new items of a given input set if their items are not
+        already present in the self.micDict.
         This can be used to load new micrographs for picking as well as
         new CTF (if used) in streaming.
         """
-        setFn = inputSet.getFileName()
-        self.debug("Loading input db: %s" % setFn)
-        updatedSet = SetClass(filename=setFn)
-        updatedSet.loadAllProperties()
+        reader = self._getStreamReader(inputSet, SetClass)
+        self.debug("Loading input db: %s" % reader.getFileName())
+        newItems, streamClosed = reader.read()
         newItemDict = OrderedDict()
-        for item in updatedSet:
+        for item in newItems:
             micKey = getKeyFunc(item)
             if micKey not in self.micDict:
-                newItemDict[micKey] = item.clone()
-        streamClosed = updatedSet.isStreamClosed()
-        updatedSet.close()
+                newItemDict[micKey] = item
         self.debug("Closed db.")
 
         return newItemDict, streamClosed
@@ -620,34 +635,57 @@ class ProtCTFMicrographs(ProtMicrographs):
         self._updateOutputSet(outputName, outputCtf, streamMode)
 
     def _readDoneList(self):
-        """ Read from a text file the id's of the items that have been done. """
-        doneFile = self._getAllDone()
-        doneList = []
-        # Check what items have been previously done
-        if exists(doneFile):
-            with open(doneFile) as f:
-                doneList += [int(line.strip()) for line in f]
+        """ Read from a text file the id's of the items that have been done.
+        Only the lines added since the last call are read, the processed
+        micrographs are also updated here to be used by _isMicDone.
+        """
+        self._getJournal(self._getAllProcessed()).update()
+        doneList = self._getJournal(self._getAllDone())
+        doneList.update()
         return doneList
 
     def _writeDoneList(self, micList):
         """ Write to a text file the items that have been done. """
-        doneFile = self._getAllDone()
-
-        if not exists(doneFile):
-            makeFilePath(doneFile)
+        self._getJournal(self._getAllDone()).append(
+            *[mic.getObjId() for mic in micList])
 
-        with open(doneFile, 'a') as f:
-            for mic in micList:
-                f.write('%d\n' % mic.getObjId())
+    def _writeProcessedList(self, micList):
+        """ Write to a text file the items that have been processed. """
+        self._getJournal(self._getAllProcessed()).append(
+            *[mic.getObjId() for mic in micList])
 
     def _isMicDone(self, mic):
-        """ A mic is done if the marker file exists. """
-        micDir = self._getMicrographDir(mic)
-        return exists(self._getMicrographDone(micDir))
+        """ A mic is done if it is in the list of processed micrographs.
+        For micrographs that are not there, the marker file is also checked
+        (at most every MARKER_CHECK_SECS), since they could be processed
+        before the list was used or by steps that do not update it.
+        """
+        micId = mic.getObjId()
+        processedList = self._getJournal(self._getAllProcessed())
+
+        if micId in processedList:
+            return True
+
+        checked = getattr(self, '_checkedMarkers', None)
+        if checked is None:
+            checked = self._checkedMarkers = {}
+
+        now = time.time()
+        if now - checked.get(micId, 0) >= self.MARKER_CHECK_SECS:
+            checked[micId] = now
+            micDir = self._getMicrographDir(mic)
+            if exists(self._getMicrographDone(micDir)):
+                self._writeProcessedList([mic])
+                return True
+
+        return False
 
     def _getAllDone(self):
         return self._getExtraPath('DONE', 'all.TXT')
 
+    def _getAllProcessed(self):
+        return self._getExtraPath('DONE', 'processed.TXT')
+
 
 class ProtPreprocessMicrographs(ProtMicrographs):
     pass
@@ -28,6 +28,7 @@
 # **************************************************************************
 
 import os
+import time
 from os.path import join, basename, exists
 from datetime import datetime
 
@@ -56,6 +57,9 @@ class ProtProcessMovies(ProtPreprocessMicrographs):
     # the value should be either 'mrc' or 'mrcs'
     CONVERT_TO_MRC = None
     CORRECT_GAIN = False
+    # Seconds between checks of the done marker file of movies
+    # not found in the list of processed ones (see _isMovieDone)
+    MARKER_CHECK_SECS = 30
 
     def __init__(self, **kwargs):
         ProtPreprocessMicrographs.__init__(self, **kwargs)
@@ -197,15 +201,17 @@ class ProtProcessMovies(ProtPreprocessMicrographs):
         return None
 
     def _loadInputList(self):
-        """ Load the input set of movies and create a list. """
-        moviesFile = self.inputMovies.get().getFileName()
-        self.debug("Loading input db: %s" % moviesFile)
-        movieSet = SetOfMovies(filename=moviesFile)
-        movieSet.loadAllProperties()
-        self.listOfMovies = [m.clone() for m in movieSet]
-        self.streamClosed = movieSet.isStreamClosed()
-        movieSet.close()
+        """ Load the new movies from the input set and add them to the list.
+        Return the list of new movies.
+        """
+        reader = self._getStreamReader(self.inputMovies.get(), SetOfMovies)
+        self.debug("Loading input db: %s" % reader.getFileName())
+        newMovies, self.streamClosed = reader.read()
+        if not hasattr(self, 'listOfMovies'):
+            self.listOfMovies = []
+        self.listOfMovies.extend(newMovies)
         self.debug("Closed db.")
+        return newMovies
 
     def _checkNewInput(self):
         # Check if there are new movies to process from the input set
@@ -223,14 +229,12 @@ class ProtProcessMovies(ProtPreprocessMicrographs):
 
         self.lastCheck = now
         # Open input movies.sqlite and close it as soon as possible
-        self._loadInputList()
-        newMovies = any(m.getObjId() not in self.insertedDict
-                        for m in self.listOfMovies)
+        newMovies = [m for m in self._loadInputList()
+                     if m.getObjId() not in self.insertedDict]
         outputStep = self._getFirstJoinStep()
 
         if newMovies:
-            fDeps = self._insertNewMoviesSteps(self.insertedDict,
-                                               self.listOfMovies)
+            fDeps = self._insertNewMoviesSteps(self.insertedDict, newMovies)
             if outputStep is not None:
                 outputStep.addPrerequisites(*fDeps)
             self.updateSteps()
@@ -295,6 +299,7 @@ class ProtProcessMovies(ProtPreprocessMicrographs):
 
         if (self.isContinued() and os.path.exists(movieDoneFn)):
             self.info("Skipping movie: %s, seems to be done" % movieFn)
+            self._writeProcessedList([movie])
             return
 
         # Clean old finished files
@@ -379,6 +384,7 @@ class ProtProcessMovies(ProtPreprocessMicrographs):
 
         # Mark this movie as finished
         open(movieDoneFn, 'w').close()
+        self._writeProcessedList([movie])
 
     #--------------------------- UTILS functions ----------------------------
     def _getOutputMovieFolder(self, movie):
@@ -392,8 +398,29 @@ class ProtProcessMovies(ProtPreprocessMicrographs):
         return self._getExtraPath('DONE_movie_%06d.TXT' % movie.getObjId())
 
     def _isMovieDone(self, movie):
-        """ A movie is done if the marker file exists. """
-        return os.path.exists(self._getMovieDone(movie))
+        """ A movie is done if it is in the list of processed movies.
+        For movies that are not there, the marker file is also checked
+        (at most every MARKER_CHECK_SECS), since they could be processed
+        before the list was used or by steps that do not update it.
+        """
+        movieId = movie.getObjId()
+        processedList = self._getJournal(self._getAllProcessed())
+
+        if movieId in processedList:
+            return True
+
+        checked = getattr(self, '_checkedMarkers', None)
+        if checked is None:
+            checked = self._checkedMarkers = {}
+
+        now = time.time()
+        if now - checked.get(movieId, 0) >= self.MARKER_CHECK_SECS:
+            checked[movieId] = now
+            if os.path.exists(self._getMovieDone(movie)):
+                self._writeProcessedList([movie])
+                return True
+
+        return False
 
     def _getAllDone(self):
         return self._getExtraPath('DONE_all.TXT')
@@ -401,39 +428,39 @@ class ProtProcessMovies(ProtPreprocessMicrographs):
     def _getAllFailed(self):
         return self._getExtraPath('FAILED_all.TXT')
 
-    def _readDoneList(self):
-        """ Read from a text file the id's of the items that have been done. """
-        doneFile = self._getAllDone()
-        doneList = []
-        # Check what items have been previously done
-        if os.path.exists(doneFile):
-            with open(doneFile) as f:
-                doneList += [int(line.strip()) for line in f]
+    def _getAllProcessed(self):
+        return self._getExtraPath('PROCESSED_all.TXT')
 
+    def _readDoneList(self):
+        """ Read from a text file the id's of the items that have been done.
+        Only the lines added since the last call are read, the processed
+        movies are also updated here to be used by _isMovieDone.
+        """
+        self._getJournal(self._getAllProcessed()).update()
+        doneList = self._getJournal(self._getAllDone())
+        doneList.update()
         return doneList
 
     def _readFailedList(self):
         """ Read from a text file the id's of the items that have failed. """
-        failedFile = self._getAllFailed()
-        failedList = []
-        # Check what items have been previously done
-        if os.path.exists(failedFile):
-            with open(failedFile) as f:
-                failedList += [int(line.strip()) for line in f]
-
+        failedList = self._getJournal(self._getAllFailed())
+        failedList.update()
         return failedList
 
     def _writeDoneList(self, movieList):
         """ Write to a text file the items that have been done. """
-        with open(self._getAllDone(), 'a') as f:
-            for movie in movieList:
-                f.write('%d\n' % movie.getObjId())
+        self._getJournal(self._getAllDone()).append(
+            *[movie.getObjId() for movie in movieList])
 
     def _writeFailedList(self, movieList):
         """ Write to a text file the items that have failed. """
-        with open(self._getAllFailed(), 'a') as f:
-            for movie in movieList:
-                f.write('%d\n' % movie.getObjId())
+        self._getJournal(self._getAllFailed()).append(
+            *[movie.getObjId() for movie in movieList])
+
+    def _writeProcessedList(self, movieList):
+        """ Write to a text file the items that have been processed. """
+        self._getJournal(self._getAllProcessed()).append(
+            *[movie.getObjId() for movie in movieList])
 
     #--------------------------- OVERRIDE functions --------------------------
     def _filterMovie(self, movie):
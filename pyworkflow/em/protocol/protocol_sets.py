@@ -34,7 +34,7 @@ This module contains protocols related to Set operations such us:
 import random
 from protocol import EMProtocol
 import pyworkflow.protocol as pwprot
-from pyworkflow.object import Boolean, Object
+from pyworkflow.object import Boolean, Object, Set
 
 
 class ProtSets(EMProtocol):
@@ -142,6 +142,17 @@ class ProtUnionSet(ProtSets):
         # or we find duplicated ids in the sets
         cleanIds = self.renumber.get() or self.duplicatedIds()
 
+        inputSets = [itemSet.get() for itemSet in self.inputSets]
+        if not outputSet.appendFromSets(inputSets, renumber=cleanIds):
+            self._appendItems(outputSet, cleanIds)
+
+        self._defineOutputs(outputSet=outputSet)
+        for itemSet in self.inputSets:
+            self._defineSourceRelation(itemSet, outputSet)
+
+    def _appendItems(self, outputSet, cleanIds):
+        """ Append the items of all input sets one by one, keeping only
+        the attributes that are common to all of them. """
         #TODO ROB remove ignoreExtraAttributes condition
         #or implement it. But this will be for Scipion 1.2
         self.ignoreExtraAttributes = Boolean(True)
@@ -170,10 +181,6 @@ class ProtUnionSet(ProtSets):
                     newObj.cleanObjId()
                 outputSet.append(newObj)
 
-        self._defineOutputs(outputSet=outputSet)
-        for itemSet in self.inputSets:
-            self._defineSourceRelation(itemSet, outputSet)
-
     def cleanExtraAttributes(self, obj, verifyAttrs, prefix=""):
 
         for attr, value in obj.getAttributesToStore():
@@ -197,13 +204,19 @@ class ProtUnionSet(ProtSets):
         usedIds = set()  # to keep track of the object ids we have already seen
         
         for itemSet in self.inputSets:
-            for obj in itemSet.get():
-                objId = obj.getObjId()
+            for objId in self._iterIds(itemSet.get()):
                 if objId in usedIds:
                     return True
                 usedIds.add(objId)
         return False
 
+    def _iterIds(self, itemSet):
+        """ Iterate over the item ids, reading them from the database
+        without building the items when possible. """
+        if isinstance(itemSet, Set):
+            return itemSet.getColumns(['id'])['id'].tolist()
+        return (obj.getObjId() for obj in itemSet)
+
     def getAllSetsAttributes(self):
         allSetsAttributes = list()
 
@@ -319,6 +332,28 @@ class ProtSplitSet(ProtSets):
 
         ns = [len(elements) // n + (1 if i < len(elements) % n else 0)
               for i in range(n)]  # number of elements in each subset
+
+        # Take the ids of each subset and copy the items in the database
+        ids = elements.getColumns(['id'])['id'].tolist()
+        if self.randomize:
+            random.shuffle(ids)
+        if subsets[0].appendFromSets([elements], ids=ids[:ns[0]]):
+            first = ns[0]
+            for subset, size in zip(subsets[1:], ns[1:]):
+                subset.appendFromSets([elements], ids=ids[first:first+size])
+                first += size
+        else:
+            self._appendItems(elements, subsets, ns)
+
+        key = 'output' + inputClassName.replace('SetOf', '') + '%02d'
+        for i in range(1, n+1):
+            subset = subsets[i-1]
+            subset.copyInfo(inputSet)
+            self._defineOutputs(**{key % i: subset})
+            self._defineTransformRelation(inputSet, subset)
+
+    def _appendItems(self, elements, subsets, ns):
+        """ Append the items to the subsets one by one. """
         pos, i = 0, 0  # index of current subset and index of position inside it
         orderBy = 'RANDOM()' if self.randomize else 'id'
 
@@ -329,13 +364,6 @@ class ProtSplitSet(ProtSets):
             subsets[pos].append(elem)
             i += 1
 
-        key = 'output' + inputClassName.replace('SetOf', '') + '%02d'
-        for i in range(1, n+1):
-            subset = subsets[i-1]
-            subset.copyInfo(inputSet)
-            self._defineOutputs(**{key % i: subset})
-            self._defineTransformRelation(inputSet, subset)
-
     # -------------------------- INFO functions -------------------------------
     def _validate(self):
         errors = []
@@ -426,31 +454,25 @@ class ProtSubSet(ProtSets):
         outputSet.copyInfo(inputFullSet)
 
         if self.chooseAtRandom:
-            chosen = random.sample(xrange(len(inputFullSet)),
-                                   self.nElements.get())
-            for i, elem in enumerate(inputFullSet):
-                if i in chosen:
-                    outputSet.append(elem)
+            ids = inputFullSet.getColumns(['id'])['id'].tolist()
+            chosen = set(random.sample(ids, self.nElements.get()))
+            if not outputSet.appendFromSets([inputFullSet], ids=chosen):
+                for elem in inputFullSet:
+                    if elem.getObjId() in chosen:
+                        outputSet.append(elem)
         else:
-            # Iterate over the elements in the smaller set
-            # and take the info from the full set
+            # Take the info from the full set for the elements
+            # that are (intersection) or not (difference) in the other set
             inputSubSet = self.inputSubSet.get()
-            # The function to include an element or not
-            # depends on the set operation
-            # if it is 'intersection' we want that item is not None (found)
-            # if it is 'difference' we want that item is None
-            # (not found, different)
-            if self.setOperation == self.SET_INTERSECTION:
-                checkElem = lambda e: e is not None
-            else:
-                checkElem = lambda e: e is None 
-            
-            for origElem in inputFullSet:
-                # TODO: this can be improved if we perform
-                # intersection directly in sqlite
-                otherElem = inputSubSet[origElem.getObjId()]
-                if checkElem(otherElem):
-                    outputSet.append(origElem)
+            difference = self.setOperation == self.SET_DIFFERENCE
+
+            if not outputSet.appendFromSets([inputFullSet],
+                                            filterSet=inputSubSet,
+                                            exclude=difference):
+                subIds = set(inputSubSet.getColumns(['id'])['id'].tolist())
+                for origElem in inputFullSet:
+                    if (origElem.getObjId() in subIds) != difference:
+                        outputSet.append(origElem)
             
         if outputSet.getSize():
             key = 'output' + inputClassName.replace('SetOf', '') 
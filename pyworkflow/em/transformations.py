@@ -1160,6 +1160,165 @@ def euler_from_matrix(matrix, axes='sxyz'):
     return ax, ay, az
 
 
+def euler_matrices(angles, axes='sxyz'):
+    """Return stack of rotation matrices from array of Euler angles.
+
+    angles : (N, 3) array of Euler's roll, pitch and yaw angles
+    axes : One of 24 axis sequences as string or encoded tuple
+
+    Same as calling euler_matrix for each row, but vectorized.
+
+    >>> angles = (4*math.pi) * (numpy.random.random((5, 3)) - 0.5)
+    >>> M = euler_matrices(angles, 'szyz')
+    >>> M.shape
+    (5, 4, 4)
+    >>> numpy.allclose(M[3], euler_matrix(axes='szyz', *angles[3]))
+    True
+
+    """
+    try:
+        firstaxis, parity, repetition, frame = _AXES2TUPLE[axes]
+    except (AttributeError, KeyError):
+        _TUPLE2AXES[axes]  # validation
+        firstaxis, parity, repetition, frame = axes
+
+    i = firstaxis
+    j = _NEXT_AXIS[i+parity]
+    k = _NEXT_AXIS[i-parity+1]
+
+    angles = numpy.array(angles, dtype=numpy.float64, ndmin=2)
+    ai, aj, ak = angles[:, 0], angles[:, 1], angles[:, 2]
+    if frame:
+        ai, ak = ak, ai
+    if parity:
+        ai, aj, ak = -ai, -aj, -ak
+
+    si, sj, sk = numpy.sin(ai), numpy.sin(aj), numpy.sin(ak)
+    ci, cj, ck = numpy.cos(ai), numpy.cos(aj), numpy.cos(ak)
+    cc, cs = ci*ck, ci*sk
+    sc, ss = si*ck, si*sk
+
+    M = numpy.zeros((len(angles), 4, 4))
+    M[:, 3, 3] = 1.0
+    if repetition:
+        M[:, i, i] = cj
+        M[:, i, j] = sj*si
+        M[:, i, k] = sj*ci
+        M[:, j, i] = sj*sk
+        M[:, j, j] = -cj*ss+cc
+        M[:, j, k] = -cj*cs-sc
+        M[:, k, i] = -sj*ck
+        M[:, k, j] = cj*sc+cs
+        M[:, k, k] = cj*cc-ss
+    else:
+        M[:, i, i] = cj*ck
+        M[:, i, j] = sj*sc-cs
+        M[:, i, k] = sj*cc+ss
+        M[:, j, i] = cj*sk
+        M[:, j, j] = sj*ss+cc
+        M[:, j, k] = sj*cs-sc
+        M[:, k, i] = -sj
+        M[:, k, j] = cj*si
+        M[:, k, k] = cj*ci
+    return M
+
+
+def euler_from_matrices(matrices, axes='sxyz'):
+    """Return (N, 3) array of Euler angles from stack of rotation matrices.
+
+    axes : One of 24 axis sequences as string or encoded tuple
+
+    Same as calling euler_from_matrix for each matrix, but vectorized.
+
+    >>> angles = (4*math.pi) * (numpy.random.random((5, 3)) - 0.5)
+    >>> M = euler_matrices(angles, 'szyz')
+    >>> numpy.allclose(euler_from_matrices(M, 'szyz')[2],
+    ...                euler_from_matrix(M[2], 'szyz'))
+    True
+
+    """
+    try:
+        firstaxis, parity, repetition, frame = _AXES2TUPLE[axes.lower()]
+    except (AttributeError, KeyError):
+        _TUPLE2AXES[axes]  # validation
+        firstaxis, parity, repetition, frame = axes
+
+    i = firstaxis
+    j = _NEXT_AXIS[i+parity]
+    k = _NEXT_AXIS[i-parity+1]
+
+    M = numpy.array(matrices, dtype=numpy.float64, copy=False, ndmin=3)
+    M = M[:, :3, :3]
+    if repetition:
+        sy = numpy.sqrt(M[:, i, j]*M[:, i, j] + M[:, i, k]*M[:, i, k])
+        valid = sy > _EPS
+        ax = numpy.where(valid, numpy.arctan2( M[:, i, j],  M[:, i, k]),
+                                numpy.arctan2(-M[:, j, k],  M[:, j, j]))
+        ay = numpy.arctan2( sy,       M[:, i, i])
+        az = numpy.where(valid, numpy.arctan2( M[:, j, i], -M[:, k, i]), 0.0)
+    else:
+        cy = numpy.sqrt(M[:, i, i]*M[:, i, i] + M[:, j, i]*M[:, j, i])
+        valid = cy > _EPS
+        ax = numpy.where(valid, numpy.arctan2( M[:, k, j],  M[:, k, k]),
+                                numpy.arctan2(-M[:, j, k],  M[:, j, j]))
+        ay = numpy.arctan2(-M[:, k, i],  cy)
+        az = numpy.where(valid, numpy.arctan2( M[:, j, i],  M[:, i, i]), 0.0)
+
+    if parity:
+        ax, ay, az = -ax, -ay, -az
+    if frame:
+        ax, az = az, ax
+    return numpy.column_stack((ax, ay, az))
+
+
+def matrices_from_geometry(shifts, angles, inverse=False):
+    """Return stack of transformation matrices from shifts and angles.
+
+    shifts : (N, 3) array of shifts in x, y and z
+    angles : (N, 3) array of rot, tilt and psi angles in degrees
+    inverse : if True, return the inverse of each transformation
+
+    This follows the convention used by Scipion to store alignments
+    (negated 'szyz' Euler angles), the batch counterpart of the
+    matrixFromGeometry functions in the conversion modules.
+
+    >>> shifts = numpy.random.random((4, 3)) - 0.5
+    >>> angles = 360 * numpy.random.random((4, 3))
+    >>> M = matrices_from_geometry(shifts, angles, inverse=True)
+    >>> s, a = geometry_from_matrices(M, inverse=True)
+    >>> numpy.allclose(shifts, s)
+    True
+    >>> numpy.allclose(M, matrices_from_geometry(s, a, inverse=True))
+    True
+
+    """
+    shifts = numpy.array(shifts, dtype=numpy.float64, ndmin=2)
+    M = euler_matrices(-numpy.deg2rad(angles), 'szyz')
+    if inverse:
+        M[:, :3, 3] = -shifts[:, :3]
+        M = numpy.linalg.inv(M)
+    else:
+        M[:, :3, 3] = shifts[:, :3]
+    return M
+
+
+def geometry_from_matrices(matrices, inverse=False):
+    """Return (shifts, angles) arrays from stack of transformation matrices.
+
+    Reverse of matrices_from_geometry: shifts and angles (in degrees)
+    are returned as (N, 3) arrays.
+
+    """
+    M = numpy.array(matrices, dtype=numpy.float64, copy=False, ndmin=3)
+    if inverse:
+        M = numpy.linalg.inv(M)
+        shifts = -M[:, :3, 3]
+    else:
+        shifts = M[:, :3, 3].copy()
+    angles = -numpy.rad2deg(euler_from_matrices(M, axes='szyz'))
+    return shifts, angles
+
+
 def euler_from_quaternion(quaternion, axes='sxyz'):
     """Return Euler angles from quaternion for specified axis sequence.
 
@@ -36,6 +36,8 @@ import pickle
 import json
 import re
 import tempfile
+import time
+import threading
 from collections import OrderedDict
 import Tkinter as tk
 import ttk
@@ -606,6 +608,9 @@ class ProtocolsView(tk.Frame):
 
         self.__autoRefresh = None
         self.__autoRefreshCounter = INIT_REFRESH_SECONDS  # start by 3 secs
+        # Thread refreshing the runs and refresh requested meanwhile
+        self._refreshThread = None
+        self._pendingRefresh = None
 
         c = self.createContent()
         pwgui.configureWeigths(self)
@@ -811,8 +816,7 @@ class ProtocolsView(tk.Frame):
                 print("    - %s, %s" % (f.path, f.fd))
             print("  memory percent: ", proc.get_memory_percent())
 
-        self.updateRunsGraph(True, checkPids=checkPids)
-        self.updateRunsTree(False)
+        self._requestRunsRefresh(checkPids=checkPids)
 
         if initRefreshCounter:
 
@@ -829,19 +833,105 @@ class ProtocolsView(tk.Frame):
         if pwutils.envVarOn('DO_NOT_AUTO_REFRESH'):
             return
 
-        if self.project.needRefresh():
+        # The runs are only refreshed if needed, the next automatic
+        # refresh is scheduled when this one is done
+        self._requestRunsRefresh(auto=True)
 
-            self.refreshRuns(initRefreshCounter=False)
+    def _scheduleAutomaticRefresh(self, refreshed):
+        """ Schedule the next automatic refresh, after a longer time
+        if the runs were refreshed. """
+        if refreshed:
             secs = self.__autoRefreshCounter
-
         else:
             secs = INIT_REFRESH_SECONDS / 2
 
         # double the number of seconds up to 30 min
         self.__autoRefreshCounter = min(2 * secs, 1800)
+        if self.__autoRefresh:
+            self.runsTree.after_cancel(self.__autoRefresh)
         self.__autoRefresh = self.runsTree.after(secs * 1000,
                                                  self._automaticRefreshRuns)
 
+    def _requestRunsRefresh(self, checkPids=False, auto=False):
+        """ Refresh the runs in a background thread, so the GUI is not
+        blocked while the project and runs databases are read.
+        If there is a refresh running, a new one will be done when it
+        finishes, merging all the requests done in the meantime.
+        Params:
+            checkPids: check if the running protocols are still alive.
+            auto: True for the automatic refresh, the runs are only loaded
+                if any of them has changed.
+        """
+        if self._refreshThread is not None:
+            # The merged refresh is only automatic (and can be skipped)
+            # if all the requests were automatic ones
+            pending = self._pendingRefresh or {'checkPids': False,
+                                               'auto': True}
+            pending['checkPids'] |= checkPids
+            pending['auto'] &= auto
+            self._pendingRefresh = pending
+            if auto:
+                # The next automatic refresh should be scheduled even if
+                # this request is merged with a manual one
+                self._scheduleAutomaticRefresh(False)
+            return
+
+        # Checking if the runs changed is fast (only the runs.db
+        # modification times), so it is done here
+        if auto and not self.project.needRefresh():
+            self._scheduleAutomaticRefresh(False)
+            return
+
+        # The snapshot is created here to know if the runs are refreshed
+        # or modified from this thread before the new ones are loaded
+        snapshot = self.project.newRunsSnapshot()
+        self._refreshThread = threading.Thread(target=self._refreshRunsWorker,
+                                               args=(snapshot, checkPids,
+                                                     auto))
+        self._refreshThread.setDaemon(True)
+        self._refreshThread.start()
+
+    def _refreshRunsWorker(self, snapshot, checkPids, auto):
+        """ Load the runs graph (executed in the refresh thread) and pass
+        it to the GUI main thread to be displayed. The runs are loaded in
+        a new project instance, since the project of this view can be
+        used from the GUI thread in the meantime. """
+        t0 = time.time()
+        error = None
+        try:
+            snapshot.loadSnapshotRuns(checkPids=checkPids)
+        except Exception as ex:
+            snapshot, error = None, ex
+        elapsed = time.time() - t0
+
+        self.windows.enqueue(lambda: self._runsRefreshed(snapshot, auto,
+                                                         elapsed, error))
+
+    def _runsRefreshed(self, snapshot, auto, elapsed, error):
+        """ Display the refreshed runs (executed in the GUI main thread). """
+        self._refreshThread = None
+
+        runsGraph = None
+        if error is not None:
+            print("ERROR refreshing runs: %s" % error)
+        else:
+            # None if the runs were refreshed or modified in the meantime
+            runsGraph = self.project.useRunsSnapshot(snapshot)
+
+        if runsGraph is not None:
+            self.runsGraph = runsGraph
+            self.drawRunsGraph()
+            self.updateRunsTree(False)
+            self.refreshLabel.config(text='Refreshed at %s (%0.2f secs)'
+                                     % (time.strftime('%H:%M:%S'), elapsed))
+
+        if auto:
+            self._scheduleAutomaticRefresh(runsGraph is not None)
+
+        if self._pendingRefresh is not None:
+            pending, self._pendingRefresh = self._pendingRefresh, None
+            self._requestRunsRefresh(**pending)
+
     # noinspection PyUnusedLocal
     def _findProtocol(self, e=None):
         """ Find a desired protocol by typing some keyword. """
@@ -890,6 +980,11 @@ class ProtocolsView(tk.Frame):
         btn.grid(row=0, column=2)
         self.viewButtons[ACTION_REFRESH] = btn
 
+        # Time of the last refresh and how long it took
+        self.refreshLabel = tk.Label(self.allToolbar, text='', bg='white',
+                                     fg='grey')
+        self.refreshLabel.grid(row=1, column=0, columnspan=3, sticky='e')
+
     def _createViewCombo(self, parent):
         """ Create the select-view combobox. """
         label = tk.Label(parent, text='View:', bg='white')
@@ -26,7 +26,12 @@
 
 
 from __future__ import print_function
+import re
+from collections import OrderedDict
+
 from pyworkflow.utils.path import replaceExt, joinExt
+from pyworkflow.utils.utils import (matrixFromValue, matrixToValue,
+                                    MATRIX_FLOAT64)
 from mapper import Mapper
 from sqlite_db import SqliteDb
 
@@ -41,6 +46,7 @@ class SqliteMapper(Mapper):
         Mapper.__init__(self, dictClasses)
         self.__initObjDict()
         self.__initUpdateDict()
+        self.__initStoredDicts()
         try:
             self.db = SqliteObjectsDb(dbName)
         except Exception as ex:
@@ -67,22 +73,50 @@ class SqliteMapper(Mapper):
                 value = "Pending update" 
             
         return value
+
+    def __initStoredDicts(self):
+        """ Clear the rows and childs stored (or loaded) for each object.
+        They are used to only write the objects modified since then.
+        """
+        # Values of the row of each object id
+        self.storedRows = {}
+        # Ids of the childs of each object id, only for objects whose
+        # childs have all been loaded or stored by this mapper
+        self.storedChilds = {}
+
+    def __getObjectRow(self, obj, value):
+        """ Return the values of the row to store obj (without the id). """
+        return (obj._objName, Mapper.getObjectPersistingClassName(obj),
+                value, obj._objParentId, obj._objLabel, obj._objComment)
+
+    def __setStoredRow(self, obj, row):
+        if obj in self.updatePendingPointers:
+            # The value will be set later, so it should always be updated
+            self.storedRows.pop(obj._objId, None)
+        else:
+            self.storedRows[obj._objId] = row
+
+    def __getChildIds(self, obj):
+        return set(attr._objId for _, attr in obj.getAttributesToStore())
         
     def __insert(self, obj, namePrefix=None):
         if not hasattr(obj, '_objDoStore'):
             print("MAPPER: object '%s' doesn't seem to be an Object subclass," % obj)
             print("       it does not have attribute '_objDoStore'. Insert skipped.")
             return 
+        value = self.__getObjectValue(obj)
         obj._objId = self.db.insertObject(obj._objName, obj.getClassName(),
-                                          self.__getObjectValue(obj), obj._objParentId,
+                                          value, obj._objParentId,
                                           obj._objLabel, obj._objComment)
         self.updateDict[obj._objId] = obj
+        self.__setStoredRow(obj, self.__getObjectRow(obj, value))
         sid = obj.strId()
         if namePrefix is None:
             namePrefix = sid
         else:
             namePrefix = joinExt(namePrefix, sid)
         self.insertChilds(obj, namePrefix)
+        self.storedChilds[obj._objId] = self.__getChildIds(obj)
         
     def insert(self, obj):
         """Insert a new object into the system, the id will be set"""
@@ -117,6 +151,8 @@ class SqliteMapper(Mapper):
     def deleteAll(self):
         """ Delete all objects stored """
         self.db.deleteAll()
+        # Ids will be reused after deleting all
+        self.__initStoredDicts()
                 
     def delete(self, obj):
         """Delete an object and all its childs"""
@@ -135,7 +171,12 @@ class SqliteMapper(Mapper):
         print("obj.getObjValue()", obj.getObjValue())
 
     def updateTo(self, obj, level=1):
+        """ Update the object and its childs in the database.
+        Only the rows that changed since the objects were loaded
+        or stored by this mapper are written.
+        """
         self.__initUpdateDict()
+        self.missingChilds = False
         self.__updateTo(obj, level)
         # Update pending pointers to objects
         for ptr in self.updatePendingPointers:
@@ -146,13 +187,16 @@ class SqliteMapper(Mapper):
         # Delete any child objects that have not been found.
         # This could be the case if some elements (such as inside List)
         # were stored in the database and were removed from the object
-        self.db.deleteMissingObjectsByAncestor(self.__getNamePrefix(obj),
-                                               self.updateDict.keys())
+        if self.missingChilds:
+            self.db.deleteMissingObjectsByAncestor(self.__getNamePrefix(obj),
+                                                   self.updateDict.keys())
 
     def __updateTo(self, obj, level):
-        self.db.updateObject(obj._objId, obj._objName, Mapper.getObjectPersistingClassName(obj),
-                             self.__getObjectValue(obj), obj._objParentId, 
-                             obj._objLabel, obj._objComment)
+        row = self.__getObjectRow(obj, self.__getObjectValue(obj))
+
+        if self.storedRows.get(obj._objId) != row:
+            self.db.updateObject(obj._objId, *row)
+            self.__setStoredRow(obj, row)
 
         if obj.getObjId() in self.updateDict:
             raise Exception('Circular reference, object: %s found twice'
@@ -169,6 +213,15 @@ class SqliteMapper(Mapper):
             else:  
                 self.__updateTo(attr, level + 2)
 
+        # If some of the previous childs is not longer there, or we
+        # do not know all the previous childs, the missing childs
+        # should be deleted
+        childIds = self.__getChildIds(obj)
+        storedIds = self.storedChilds.get(obj._objId)
+        if storedIds is None or not storedIds <= childIds:
+            self.missingChilds = True
+        self.storedChilds[obj._objId] = childIds
+
     def updateFrom(self, obj):
         objRow = self.db.selectObjectById(obj._objId)
         self.fillObject(obj, objRow)
@@ -215,6 +268,9 @@ class SqliteMapper(Mapper):
             else:
                 objValue = None
         obj.set(objValue)
+        # Keep the loaded values to only update the modified rows
+        value = objRow['value'] if obj.isPointer() else obj.getObjValue()
+        self.storedRows[obj._objId] = self.__getObjectRow(obj, value)
         
     def fillObject(self, obj, objRow, includeChildren=True):
         self.fillObjectWithRow(obj, objRow)
@@ -222,12 +278,16 @@ class SqliteMapper(Mapper):
 
         if includeChildren:
             childs = self.db.selectObjectsByAncestor(namePrefix)
-            #childsDict = {obj._objId: obj}
+            # Ids of the childs rows found for each object,
+            # including the rows that could not be loaded
+            childsDict = {obj._objId: set()}
 
             for childRow in childs:
                 childParts = childRow[NAME].split('.')
                 childName = childParts[-1]
                 parentId = int(childParts[-2])
+                if parentId in childsDict:
+                    childsDict[parentId].add(childRow[ID])
                 # Here we are assuming that always the parent have
                 # been processed first, so it will be in the dictionary
                 parentObj = self.objDict.get(parentId, None)
@@ -243,7 +303,9 @@ class SqliteMapper(Mapper):
                     setattr(parentObj, childName, childObj)
 
                 self.fillObjectWithRow(childObj, childRow)
-                #childsDict[childObj._objId] = childObj
+                childsDict[childObj._objId] = set()
+
+            self.storedChilds.update(childsDict)
 
 
     def __buildObject(self, row):
@@ -370,14 +432,22 @@ class SqliteMapper(Mapper):
 
         # Dictionary to store objects
         objs = []
+        # All rows are loaded, so we know the childs of every object
+        childsDict = {}
 
         # For each row
         for row in objAll:
             obj = self._getObjectFromRow(row)
+            childsDict.setdefault(row[ID], set())
+            parentId = row[PARENT_ID]
+            if parentId is not None:
+                childsDict.setdefault(parentId, set()).add(row[ID])
 
             if obj is not None and objectFilter is None or objectFilter(obj):
                 objs.append(obj)
 
+        self.storedChilds.update(childsDict)
+
         return objs
 
     def _getObjectFromRow(self, row):
@@ -486,7 +556,8 @@ class SqliteObjectsDb(SqliteDb):
     # Maintain the current version of the DB schema
     # useful for future updates and backward compatibility
     # version should be an integer number
-    VERSION = 1
+    # version 2: indexes on Objects name and parent_id and Relations parent_id
+    VERSION = 2
     
     SELECT = "SELECT id, parent_id, name, classname, value, label, comment, datetime(creation, 'localtime') as creation FROM Objects WHERE "
     DELETE = "DELETE FROM Objects WHERE "
@@ -545,13 +616,27 @@ class SqliteObjectsDb(SqliteDb):
                       object_parent_extended TEXT DEFAULT NULL, -- extended property to consider internal objects
                       object_child_extended TEXT DEFAULT NULL
                       )""")
+        self.__createIndexes()
         self.commit()
+
+    def __createIndexes(self):
+        """ Create the indexes used to select the objects by parent
+        and by name prefix (all the childs of a given object).
+        """
+        self.executeCommand("CREATE INDEX IF NOT EXISTS Objects_name_index "
+                            "ON Objects(name)")
+        self.executeCommand("CREATE INDEX IF NOT EXISTS "
+                            "Objects_parent_id_index ON Objects(parent_id)")
+        self.executeCommand("CREATE INDEX IF NOT EXISTS "
+                            "Relations_parent_id_index ON Relations(parent_id)")
         
     def __updateTables(self):
         """ This method is intended to update the table schema
         in the case of dealing with old database version.
         """
-        if self.getVersion() < self.VERSION: # This applies for version 1
+        version = self.getVersion()
+
+        if version < 1:
             # Add the extra column for pointer extended attribute in Relations table
             # from version 1 on, there is not needed since the table will 
             # already contains this column
@@ -562,7 +647,21 @@ class SqliteObjectsDb(SqliteDb):
             if not 'object_child_extended' in columns:    
                 self.executeCommand("ALTER TABLE Relations "
                                     "ADD COLUMN object_child_extended  TEXT DEFAULT NULL")
+        if version < 2:
+            self.__createIndexes()
+
+        if version < self.VERSION:
             self.setVersion(self.VERSION)
+
+    @staticmethod
+    def _getPrefixWhere(ancestor_namePrefix):
+        """ Return the where string and the parameters to select the
+        objects whose name starts with 'ancestor_namePrefix.'.
+        A range is used instead of LIKE, so the name index is used
+        ('/' is the character that follows '.').
+        """
+        return ("name >= ? AND name < ?",
+                (ancestor_namePrefix + '.', ancestor_namePrefix + '/'))
         
         
     def insertObject(self, name, classname, value, parent_id, label, comment):
@@ -624,8 +723,8 @@ class SqliteObjectsDb(SqliteDb):
     
     def selectObjectsByAncestor(self, ancestor_namePrefix, iterate=False):
         """Select all objects in the hierarchy of ancestor_id"""
-        self.executeCommand(self.selectCmd("name LIKE '%s.%%'"
-                                           % ancestor_namePrefix))
+        whereStr, params = self._getPrefixWhere(ancestor_namePrefix)
+        self.executeCommand(self.selectCmd(whereStr), params)
         return self._results(iterate)
 
     def selectObjectsBy(self, iterate=False, **args):     
@@ -654,23 +753,24 @@ class SqliteObjectsDb(SqliteDb):
     def deleteChildObjects(self, ancestor_namePrefix):
         """ Delete from db all objects that are childs 
         of an ancestor, now them will have the same starting prefix"""
-        self.executeCommand(self.DELETE + "name LIKE '%s.%%'"
-                            % ancestor_namePrefix)
+        whereStr, params = self._getPrefixWhere(ancestor_namePrefix)
+        self.executeCommand(self.DELETE + whereStr, params)
 
     def selectMissingObjectsByAncestor(self, ancestor_namePrefix,
                                            idList):
         """Select all objects in the hierarchy of ancestor_id"""
         idStr = ','.join(str(i) for i in idList)
-        cmd = self.selectCmd("name LIKE '%s.%%' AND id NOT IN (%s) "
-                             % (ancestor_namePrefix, idStr))
-        self.executeCommand(cmd)
+        whereStr, params = self._getPrefixWhere(ancestor_namePrefix)
+        cmd = self.selectCmd("%s AND id NOT IN (%s) " % (whereStr, idStr))
+        self.executeCommand(cmd, params)
         return self._results(iterate=False)
 
     def deleteMissingObjectsByAncestor(self, ancestor_namePrefix, idList):
         """Select all objects in the hierarchy of ancestor_id"""
         idStr = ','.join(str(i) for i in idList)
-        cmd = "%s name LIKE '%s.%%' AND id NOT IN (%s) " % (self.DELETE, ancestor_namePrefix, idStr)
-        self.executeCommand(cmd)
+        whereStr, params = self._getPrefixWhere(ancestor_namePrefix)
+        cmd = "%s %s AND id NOT IN (%s) " % (self.DELETE, whereStr, idStr)
+        self.executeCommand(cmd, params)
 
     def deleteAll(self):
         """ Delete all objects from the db. """
@@ -704,6 +804,10 @@ class SqliteFlatMapper(Mapper):
     def __init__(self, dbName, dictClasses=None, tablePrefix=''):
         Mapper.__init__(self, dictClasses)
         self._objTemplate = None
+        # Rows pending to be inserted when buffered insertion is enabled
+        # (see setInsertBufferSize), a size of 0 means insert right away
+        self._insertBuffer = []
+        self._insertBufferSize = 0
         try:
             self.db = SqliteFlatDb(dbName, tablePrefix)
             self.doCreateTables = self.db.missingTables()
@@ -716,18 +820,46 @@ class SqliteFlatMapper(Mapper):
                             (dbName, tablePrefix, ex))
     
     def commit(self):
+        self.flush()
         self.db.commit()
         
     def close(self):
+        self.flush()
         self.db.close()
         
     def insert(self, obj):
+        """Insert a new object into the system, the id will be set"""
         if self.doCreateTables:
             self.db.createTables(obj.getObjDict(includeClass=True))
             self.doCreateTables = False
-        """Insert a new object into the system, the id will be set"""
-        self.db.insertObject(obj.getObjId(), obj.isEnabled(), obj.getObjLabel(), obj.getObjComment(), 
-                             *obj.getObjDict().values())
+        row = (obj.getObjId(), obj.isEnabled(), obj.getObjLabel(),
+               obj.getObjComment()) + tuple(obj.getObjDict().values())
+
+        if self._insertBufferSize > 0:
+            self._insertBuffer.append(row)
+            if len(self._insertBuffer) >= self._insertBufferSize:
+                self.flush()
+        else:
+            self.db.insertObject(*row)
+
+    def setInsertBufferSize(self, size):
+        """ Enable (size > 0) or disable (size = 0) buffered insertions.
+        When enabled, rows are kept in memory and inserted with a single
+        executemany every 'size' rows, on commit or on any read operation.
+        Disabling the buffer will flush the pending rows.
+        """
+        if size <= 0:
+            self.flush()
+        self._insertBufferSize = max(size, 0)
+
+    def getInsertBufferSize(self):
+        return self._insertBufferSize
+
+    def flush(self):
+        """ Insert all pending rows in the buffer. """
+        if self._insertBuffer:
+            self.db.insertObjects(self._insertBuffer)
+            self._insertBuffer = []
         
     def enableAppend(self):
         """ This will allow to append items to existing db. 
@@ -740,19 +872,23 @@ class SqliteFlatMapper(Mapper):
                 self.db.setupCommands(obj.getObjDict(includeClass=True))
         
     def clear(self):
+        self._insertBuffer = []
         self.db.clear()
         self.doCreateTables = True
     
     def deleteAll(self):
         """ Delete all objects stored """
+        self._insertBuffer = []
         self.db.deleteAll()
                 
     def delete(self, obj):
         """Delete an object and all its childs"""
+        self.flush()
         self.db.deleteObject(obj.getObjId())
     
     def updateTo(self, obj, level=1):
         """ Update database entry with new object values. """ 
+        self.flush()
         if self.db.INSERT_OBJECT is None:
             self.db.setupCommands(obj.getObjDict(includeClass=True))
         args = list(obj.getObjDict().values())
@@ -761,6 +897,7 @@ class SqliteFlatMapper(Mapper):
             
     def selectById(self, objId):
         """Build the object which id is objId"""
+        self.flush()
         objRow = self.db.selectObjectById(objId)
         if objRow is None:
             obj = None
@@ -775,6 +912,7 @@ class SqliteFlatMapper(Mapper):
         rows = self.db.getClassRows()
         attrClasses = {}
         self._objBuildList = []
+        self._objClasses = attrClasses
 
         for r in rows:
             label = r['label_property']
@@ -860,6 +998,7 @@ class SqliteFlatMapper(Mapper):
          
     def selectBy(self, iterate=False, objectFilter=None, **args):
         """Select object meetings some criteria"""
+        self.flush()
         objRows = self.db.selectObjectsBy(**args)
         return self.__objectsFromRows(objRows, iterate, objectFilter)
     
@@ -871,7 +1010,8 @@ class SqliteFlatMapper(Mapper):
         # Just a sanity check for emtpy sets, that doesn't contains 'Properties' table
         if not self.db.hasTable('Properties'):
             return iter([]) if iterate else []
-            
+
+        self.flush()
         if self._objTemplate is None:
             self.__loadObjDict()
         objRows = self.db.selectAll(orderBy=orderBy,
@@ -880,7 +1020,56 @@ class SqliteFlatMapper(Mapper):
         
         return self.__objectsFromRows(objRows, iterate, objectFilter) 
 
+    def getColumns(self, labels, orderBy=ID, direction='ASC', where='1'):
+        """ Read some attribute columns directly from the db without
+        building any object. Nested attributes are referred by their
+        full label (e.g _ctfModel._defocusU) and 'id', 'enabled' and
+        'creation' are also accepted.
+        Returns:
+            a numpy structured array with one field per label.
+            Matrix attributes are returned as (4, 4) float fields.
+        """
+        import numpy as np
+
+        # Just a sanity check for empty sets
+        if self.doCreateTables:
+            return np.array([], dtype=[(str(l), np.float64) for l in labels])
+
+        self.flush()
+        if self._objTemplate is None:
+            self.__loadObjDict()
+
+        rows = self.db.selectColumns(labels, orderBy=orderBy,
+                                     direction=direction, where=where)
+        dtype = []
+        columns = []
+        for i, label in enumerate(labels):
+            values = [row[i] for row in rows]
+            className = self._objClasses.get(label)
+            if className == 'Matrix':
+                dtype.append((str(label), np.float64, (4, 4)))
+                values = [np.eye(4) if v is None else matrixFromValue(v)
+                          for v in values]
+            elif className == 'Float':
+                dtype.append((str(label), np.float64))
+            elif className == 'Boolean' or label == 'enabled':
+                dtype.append((str(label), np.bool_))
+            elif className == 'Integer' or label == ID:
+                # Missing values can not be represented as integers
+                t = np.float64 if None in values else np.int64
+                dtype.append((str(label), t))
+            else:
+                dtype.append((str(label), np.object_))
+            columns.append(values)
+
+        result = np.empty(len(rows), dtype=dtype)
+        for d, values in zip(dtype, columns):
+            result[d[0]] = values
+
+        return result
+
     def aggregate(self, operations, operationLabel, groupByLabels=None):
+        self.flush()
         rows = self.db.aggregate(operations, operationLabel, groupByLabels)
         results = []
         for row in rows:
@@ -895,11 +1084,41 @@ class SqliteFlatMapper(Mapper):
         return results
 
     def count(self):
+        self.flush()
         return 0 if self.doCreateTables else self.db.count()
 
     def maxId(self):
+        self.flush()
         return 0 if self.doCreateTables else self.db.maxId()
 
+    def createIndexes(self, labels):
+        """ Create (if not existing) indexes on the columns of the given
+        attribute labels, to speed up where and orderBy queries.
+        """
+        self.flush()
+        if not self.doCreateTables:
+            self.db.createIndexes(labels)
+
+    def insertFrom(self, mappers, ids=None, filterMapper=None,
+                   exclude=False, newIds=False):
+        """ Copy the items stored by other flat mappers directly with
+        sqlite (see SqliteFlatDb.insertObjectsFrom).
+        Return the number of inserted items or None if the columns of
+        some source do not match and nothing was inserted.
+        """
+        def _source(mapper):
+            mapper.commit()
+            return mapper.db.getDbName(), mapper.db.tablePrefix
+
+        self.flush()
+        filterSource = _source(filterMapper) if filterMapper else None
+        n = self.db.insertObjectsFrom([_source(m) for m in mappers], ids=ids,
+                                      filterSource=filterSource,
+                                      exclude=exclude, newIds=newIds)
+        if n is not None:
+            self.doCreateTables = False
+        return n
+
     def __objectsFromIds(self, objIds):
         """Return a list of objects, given a list of id's
         """
@@ -941,6 +1160,10 @@ class SqliteFlatDb(SqliteDb):
                  'Boolean': 'INTEGER'
                  }
 
+    # Match the names (e.g. _micId or _ctfModel._defocusU) in where strings,
+    # the quoted string literals are matched first to keep them unchanged
+    WHERE_NAMES = re.compile(r"'(?:[^']|'')*'|[A-Za-z_][\w.]*")
+
     def __init__(self, dbName, tablePrefix='', timeout=1000):
         SqliteDb.__init__(self)
         tablePrefix = tablePrefix.strip()
@@ -1079,6 +1302,11 @@ class SqliteFlatDb(SqliteDb):
         CREATE_OBJECT_TABLE += ')'
         # Create the Objects table
         self.executeCommand(CREATE_OBJECT_TABLE)
+        # Index the creation time to read only the newly appended items
+        # from sets in streaming (see SetStreamReader)
+        self.executeCommand("CREATE INDEX IF NOT EXISTS "
+                            "%sObjects_creation_index ON %sObjects(creation)"
+                            % (self.tablePrefix, self.tablePrefix))
         self.commit()
         # Prepare the INSERT and UPDATE commands
         self.setupCommands(objDict)
@@ -1123,6 +1351,13 @@ class SqliteFlatDb(SqliteDb):
         """
         self.executeCommand(self.INSERT_OBJECT, args)
 
+    def insertObjects(self, rows):
+        """ Insert several objects at once using executemany.
+        Each row should contain the same values as the *args
+        passed to insertObject.
+        """
+        self.cursor.executemany(self.INSERT_OBJECT, rows)
+
     def updateObject(self, *args):
         """Update object data """
         self.executeCommand(self.UPDATE_OBJECT, args)
@@ -1132,44 +1367,61 @@ class SqliteFlatDb(SqliteDb):
         self.executeCommand(self.selectCmd(ID + "=?"), (objId,))
         return self.cursor.fetchone()
 
-    def selectAll(self, iterate=True, orderBy=ID, direction='ASC', where='1'):
+    def _getRealCol(self, colName):
+        """ Transform the column name taking into account
+         special columns such as: id or RANDOM(), and
+         getting the mapping translation otherwise.
+        """
+        if colName in ['id', 'enabled', 'creation', 'RANDOM()']:
+            return colName
+        else:
+            return self._columnsMapping[colName]
+
+    def _getOrderByStr(self, orderBy, direction):
+        """ Return the ORDER BY clause with the mapped columns. """
         # Handle the specials orderBy values of 'id' and 'RANDOM()'
         # other columns names should be mapped to table column
         # such as: _micId -> c04
-
-        def _getRealCol(colName):
-            """ Transform the column name taking into account
-             special columns such as: id or RANDOM(), and
-             getting the mapping translation otherwise.
-            """
-            if colName in ['id', 'RANDOM()']:
-                return colName
-            else:
-                return self._columnsMapping[colName]
-
         if isinstance(orderBy, basestring):
-            orderByCol = _getRealCol(orderBy)
+            orderByCol = self._getRealCol(orderBy)
         elif isinstance(orderBy, list):
-            orderByCol = ','.join([_getRealCol(c) for c in orderBy])
+            orderByCol = ','.join([self._getRealCol(c) for c in orderBy])
         else:
             raise Exception('Invalid type for orderBy: %s' % type(orderBy))
 
-        # Parse the where string to replace the colunm name with
-        # the real table column name ( for example: _micId -> c01 )
-        # Right now we are asuming a simple where string in the form
-        # colName=VALUE
-        if '=' in where:
-            whereCol = where.split('=')[0]
-            whereRealCol = _getRealCol(whereCol)
-            whereStr = where.replace(whereCol, whereRealCol)
-        else:
-            whereStr = where
+        return ' ORDER BY %s %s' % (orderByCol, direction)
+
+    def _getWhereStr(self, where):
+        """ Parse the where string to replace the column names with
+        the real table column names ( for example: _micId -> c01 ),
+        for example: '_micId=3 AND enabled=1' -> 'c01=3 AND enabled=1'
+        """
+        def _mapColumn(match):
+            name = match.group(0)
+            if name.startswith("'"):
+                return name  # string literal
+            return self._columnsMapping.get(name, name)
+
+        return self.WHERE_NAMES.sub(_mapColumn, where)
 
-        cmd = self.selectCmd(whereStr,
-                             orderByStr=' ORDER BY %s %s' % (orderByCol, direction))
+    def selectAll(self, iterate=True, orderBy=ID, direction='ASC', where='1'):
+        cmd = self.selectCmd(self._getWhereStr(where),
+                             orderByStr=self._getOrderByStr(orderBy, direction))
         self.executeCommand(cmd)
         return self._results(iterate)
 
+    def selectColumns(self, labels, orderBy=ID, direction='ASC', where='1'):
+        """ Select only the columns mapped from the given attribute labels.
+        Return the list of rows, with values in the same order of labels.
+        """
+        columns = ', '.join(self._getRealCol(label) for label in labels)
+        cmd = 'SELECT %s %s WHERE %s%s' % (columns, self.FROM,
+                                           self._getWhereStr(where),
+                                           self._getOrderByStr(orderBy,
+                                                               direction))
+        self.executeCommand(cmd)
+        return self._results(iterate=False)
+
     def aggregate(self, operations, operationLabel, groupByLabels=None):
         #let us count for testing
         selectStr = 'SELECT '
@@ -1196,6 +1448,27 @@ class SqliteFlatDb(SqliteDb):
         self.executeCommand(sqlCommand)
         return self._results(iterate=False)
 
+    def createIndexes(self, labels):
+        """ Create an index for the column mapped to each attribute label,
+        if it does not exist yet. Labels that are not stored are ignored.
+        """
+        for label in labels:
+            colName = self._columnsMapping.get(label, None)
+            if colName is not None:
+                self.executeCommand("CREATE INDEX IF NOT EXISTS "
+                                    "%sObjects_%s_index ON %sObjects(%s)"
+                                    % (self.tablePrefix, colName,
+                                       self.tablePrefix, colName))
+
+    def getIndexedColumns(self):
+        """ Return the attribute labels of the indexed columns. """
+        self.executeCommand("SELECT sql FROM sqlite_master WHERE type='index' "
+                            "AND tbl_name='%sObjects'" % self.tablePrefix)
+        columns = set(r[0].split('(')[-1].strip(')') for r in self._iterResults()
+                      if r[0] is not None)
+        return [label for label, colName in self._columnsMapping.iteritems()
+                if colName in columns]
+
     def count(self):
         """ Return the number of element in the table. """
         self.executeCommand(self.selectCmd('1').replace('*', 'COUNT(id)'))
@@ -1232,3 +1505,152 @@ class SqliteFlatDb(SqliteDb):
         if not self.missingTables():
             self.executeCommand(self.DELETE + "1")
 
+    def _getClassesFrom(self, alias, tablePrefix):
+        """ Return a list of (label_property, column_name, class_name)
+        from the Classes table of an attached database.
+        """
+        self.executeCommand("SELECT label_property, column_name, class_name "
+                            "FROM %s.%sClasses ORDER BY id"
+                            % (alias, tablePrefix))
+        return [tuple(r) for r in self._iterResults()]
+
+    def _attach(self, dbName, alias):
+        """ Attach other database file, unless it is the same one. """
+        if dbName == self.getDbName():
+            return 'main'
+        self.executeCommand("ATTACH DATABASE ? AS %s" % alias, (dbName,))
+        return alias
+
+    def insertObjectsFrom(self, sources, ids=None, filterSource=None,
+                          exclude=False, newIds=False):
+        """ Insert the rows of other flat databases using ATTACH and
+        INSERT INTO ... SELECT, so no object is built.
+        The columns of each source are mapped to the ones of this table by
+        the attribute label (label_property), and all sources should store
+        the same attributes, with the same classes, as this table. If this
+        table does not exist yet, it is created with the layout of the
+        first source.
+        Params:
+            sources: list of (dbName, tablePrefix) with the rows to copy.
+            ids: if not None, only copy the rows with these ids.
+            filterSource: (dbName, tablePrefix), only copy the rows whose
+                id is (or is not if exclude=True) in this other table.
+            newIds: if True, the copied rows get new consecutive ids.
+        Returns:
+            the number of inserted rows or None if the columns of some
+            source do not match (nothing is inserted in that case).
+        """
+        # Databases can not be attached inside a transaction
+        self.commit()
+        aliases = []
+        try:
+            for i, (dbName, tablePrefix) in enumerate(sources):
+                aliases.append(self._attach(dbName, 'src%d' % i))
+            srcAliases = list(aliases)
+
+            if filterSource is not None:
+                filterDb, filterPrefix = filterSource
+                filterAlias = self._attach(filterDb, 'filter')
+                aliases.append(filterAlias)
+
+            def getLayout(classes):
+                return set((label, className)
+                           for label, _, className in classes)
+
+            srcClasses = [self._getClassesFrom(alias, prefix)
+                          for alias, (_, prefix) in zip(srcAliases, sources)]
+            missing = self.missingTables()
+            if missing:
+                dstClasses = srcClasses[0]
+            else:
+                dstClasses = self._getClassesFrom('main', self.tablePrefix)
+            layout = getLayout(dstClasses)
+
+            if any(getLayout(classes) != layout for classes in srcClasses):
+                return None
+
+            if missing:
+                self.createTables(OrderedDict((label, (className, None))
+                                              for label, _, className
+                                              in dstClasses))
+                dstClasses = self._getClassesFrom('main', self.tablePrefix)
+
+            whereList = []
+            if ids is not None:
+                self.executeCommand("CREATE TEMP TABLE IF NOT EXISTS "
+                                    "_insert_ids (id INTEGER PRIMARY KEY)")
+                self.executeCommand("DELETE FROM temp._insert_ids")
+                self.cursor.executemany("INSERT OR IGNORE INTO "
+                                        "temp._insert_ids (id) VALUES (?)",
+                                        ((int(i),) for i in ids))
+                whereList.append("id IN (SELECT id FROM temp._insert_ids)")
+
+            if filterSource is not None:
+                whereList.append("id %sIN (SELECT id FROM %s.%sObjects)"
+                                 % ('NOT ' if exclude else '', filterAlias,
+                                    filterPrefix))
+            whereStr = ' AND '.join(whereList) or '1'
+
+            labels = [label for label, _, _ in dstClasses if label != SELF]
+            dstColumns = dict((label, colName)
+                              for label, colName, _ in dstClasses)
+            insertCols = ['id', 'enabled', 'label', 'comment', 'creation']
+            insertCols += [dstColumns[label] for label in labels]
+            n = 0
+
+            for alias, (_, prefix), classes in zip(srcAliases, sources,
+                                                   srcClasses):
+                srcColumns = dict((label, colName)
+                                  for label, colName, _ in classes)
+                selectCols = ['NULL' if newIds else 'id', 'enabled', 'label',
+                              'comment', "datetime('now')"]
+                selectCols += [srcColumns[label] for label in labels]
+                self.executeCommand("INSERT INTO %sObjects (%s) SELECT %s "
+                                    "FROM %s.%sObjects WHERE %s ORDER BY id"
+                                    % (self.tablePrefix, ', '.join(insertCols),
+                                       ', '.join(selectCols), alias, prefix,
+                                       whereStr))
+                n += self.cursor.rowcount
+            self.commit()
+        finally:
+            self.connection.rollback()
+            for alias in set(aliases):
+                if alias != 'main':
+                    self.executeCommand("DETACH DATABASE %s" % alias)
+        return n
+
+
+def convertMatrixStorage(dbName, storage=MATRIX_FLOAT64):
+    """ Convert the values of the Matrix columns stored in all flat tables
+    of a database file (e.g. the alignment of a set of particles) to the
+    given storage (see pyworkflow.utils.matrixToValue).
+    Returns the number of values that were converted.
+    """
+    db = SqliteDb()
+    db._createConnection(dbName, 1000)
+    tables = db.getTables()
+    n = 0
+
+    try:
+        for table in tables:
+            prefix = table[:-len('Classes')]
+            if not (table.endswith('Classes') and
+                    prefix + 'Objects' in tables):
+                continue
+            db.executeCommand("SELECT column_name FROM %s "
+                              "WHERE class_name='Matrix'" % table)
+            for column in [r[0] for r in db.cursor.fetchall()]:
+                db.executeCommand("SELECT id, %s FROM %sObjects WHERE %s "
+                                  "IS NOT NULL" % (column, prefix, column))
+                rows = db.cursor.fetchall()
+                db.cursor.executemany("UPDATE %sObjects SET %s=? WHERE id=?"
+                                      % (prefix, column),
+                                      [(matrixToValue(matrixFromValue(v),
+                                                      storage), objId)
+                                       for objId, v in rows])
+                n += len(rows)
+        db.commit()
+    finally:
+        db.close()
+
+    return n
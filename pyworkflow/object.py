@@ -32,6 +32,7 @@ basic classes.
 from itertools import izip
 from collections import OrderedDict
 import datetime as dt
+import threading
 
 
 # Binary relations always involve two objects, we 
@@ -994,6 +995,13 @@ class Set(OrderedObject):
     # This will be used for stream Set where data is populated on the fly
     STREAM_OPEN = 1
     STREAM_CLOSED = 2
+
+    # Default number of rows inserted at once by appendMany
+    FLUSH_SIZE = 1000
+
+    # Attributes of the items that will be indexed in the database
+    # to speed up queries filtering or sorting by them (e.g. '_micId')
+    INDEXES = []
     
     def __init__(self, filename=None, prefix='', 
                  mapperClass=None, classesDict=None, **kwargs):
@@ -1048,6 +1056,18 @@ class Set(OrderedObject):
                                            direction=direction,
                                            where=where)#has flat mapper, iterate is true
 
+    def getColumns(self, labels, orderBy='id', direction='ASC', where='1'):
+        """ Return the values of some attributes of all items, read
+        directly from the database without building the items.
+        Params:
+            labels: list of attribute names, nested ones separated by dot,
+                for example: ['id', '_ctfModel._defocusU'].
+        Returns:
+            a numpy structured array with a field for each label.
+        """
+        return self._getMapper().getColumns(labels, orderBy=orderBy,
+                                            direction=direction, where=where)
+
     def getFirstItem(self):
         """ Return the first item in the Set. """
         # This function is used in many contexts where the mapper can be
@@ -1098,6 +1118,8 @@ class Set(OrderedObject):
             objDict = self.getObjDict()
             for key, value in objDict.iteritems():
                 self._getMapper().setProperty(key, value)
+        if self.INDEXES and hasattr(self._getMapper(), 'createIndexes'):
+            self._getMapper().createIndexes(self.INDEXES)
         self._getMapper().commit()
     
     def _loadClassesDict(self):
@@ -1152,6 +1174,72 @@ class Set(OrderedObject):
         self._insertItem(item)
         self._size.increment()
 
+    def appendMany(self, items, flushSize=None):
+        """ Add several items to the set.
+        Items are added through the append method, but the mapper
+        will buffer the rows and insert them in batches of flushSize
+        (FLUSH_SIZE by default). Pending rows are always flushed before
+        returning, the commit is still done when calling write().
+        """
+        mapper = self._getMapper()
+
+        if not hasattr(mapper, 'setInsertBufferSize'):
+            # The mapper does not support buffering
+            for item in items:
+                self.append(item)
+            return
+
+        bufferSize = mapper.getInsertBufferSize()
+        mapper.setInsertBufferSize(flushSize or self.FLUSH_SIZE)
+        try:
+            for item in items:
+                self.append(item)
+        finally:
+            mapper.setInsertBufferSize(bufferSize)
+            mapper.flush()
+
+    def appendFromSets(self, itemSets, ids=None, filterSet=None,
+                       exclude=False, renumber=False):
+        """ Append all items of other sets copying the rows directly
+        in the database, without building the items. This is only possible
+        when all sets store the same attributes and the items are not
+        sets (e.g. classes), otherwise nothing is done and False is
+        returned, so the items should be appended one by one.
+        Params:
+            itemSets: list of sets whose items will be appended.
+            ids: if not None, only append the items with these ids.
+            filterSet: only append items whose id is also in this set
+                (or those that are not in it if exclude=True).
+            renumber: if True, items will get new consecutive ids.
+        """
+        mapper = self._getMapper()
+
+        if (not hasattr(mapper, 'insertFrom') or
+            (self.ITEM_TYPE is not None and issubclass(self.ITEM_TYPE, Set)) or
+            not all(isinstance(s, Set) and s._MapperClass == self._MapperClass
+                    for s in itemSets + [filterSet or self])):
+            return False
+
+        # Empty sets do not have tables in the database
+        if filterSet is not None and filterSet.isEmpty():
+            if not exclude:
+                return True
+            filterSet = None
+        itemSets = [s for s in itemSets if not s.isEmpty()]
+        if not itemSets:
+            return True
+
+        filterMapper = filterSet._getMapper() if filterSet else None
+        n = mapper.insertFrom([s._getMapper() for s in itemSets], ids=ids,
+                              filterMapper=filterMapper, exclude=exclude,
+                              newIds=renumber)
+        if n is None:
+            return False
+
+        self._size.set(mapper.count())
+        self._idCount = mapper.maxId() or 0
+        return True
+
     def _insertItem(self, item):
         self._getMapper().insert(item)
         
@@ -1231,6 +1319,13 @@ class Set(OrderedObject):
     
     def isStreamClosed(self):
         return self.getStreamState() == self.STREAM_CLOSED 
+
+    def loadStreamState(self):
+        """ Read only the stream state from the Properties table,
+        instead of loading all properties of the set.
+        """
+        self.loadProperty('_streamState', self.getStreamState())
+        return self.getStreamState()
     
     def enableAppend(self):
         """ By default, when a Set is loaded, it is opened
@@ -1241,6 +1336,98 @@ class Set(OrderedObject):
         self._getMapper().enableAppend()
 
 
+class SetStreamReader():
+    """ Read the items of a Set that is being populated in streaming.
+    Each call to read() opens the set database, returns only the items
+    appended since the previous call and closes it again. So, checking
+    for new items costs time proportional to the new items and not to
+    the whole set.
+
+    Items ids are not always appended in increasing order (e.g. the
+    output micrographs keep the ids of the movies, that can finish in
+    any order), so the creation time of the rows is used to know which
+    items are new.
+    """
+    def __init__(self, SetClass, filename, prefix=''):
+        self._SetClass = SetClass
+        self._filename = filename
+        self._prefix = prefix
+        self._lastCreation = None
+        # Ids of the items read with the last creation time, the creation
+        # has a resolution of seconds, so we need to read again the rows
+        # with that creation to not miss items appended in the same second
+        self._lastIds = set()
+        # Protocol steps could read from different threads
+        self._lock = threading.Lock()
+
+    def getFileName(self):
+        return self._filename
+
+    def read(self):
+        """ Return a tuple (newItems, streamClosed), newItems is a list
+        with a clone of the items appended since the last read.
+        """
+        def readItems(itemSet, where):
+            for item in itemSet.iterItems(where=where):
+                yield item.getObjCreation(), item.getObjId(), item.clone()
+
+        with self._lock:
+            return self._read(readItems)
+
+    def readColumns(self, labels):
+        """ Same as read() but only some attribute columns are read, without
+        building the items (see Set.getColumns). Return a tuple
+        (newRows, streamClosed), newRows is a list of numpy records with
+        'id' and the given labels as fields.
+        """
+        def readRows(itemSet, where):
+            rows = itemSet.getColumns(['creation', 'id'] + list(labels),
+                                      where=where)
+            for row in rows:
+                yield row['creation'], int(row['id']), row
+
+        with self._lock:
+            return self._read(readRows)
+
+    def _read(self, readFunc):
+        """ Read the new items with readFunc(itemSet, where), that should
+        yield a tuple (creation, id, value) for each item.
+        """
+        itemSet = self._SetClass(filename=self._filename,
+                                 prefix=self._prefix)
+        # Read the state before the items, so if the stream is closed
+        # we are sure that all items will be read below
+        itemSet.loadStreamState()
+        streamClosed = itemSet.isStreamClosed()
+
+        if self._lastCreation is None:
+            where = '1'
+        else:
+            where = "creation >= '%s'" % self._lastCreation
+
+        newValues = []
+        lastCreation, lastIds = self._lastCreation, set()
+
+        for creation, itemId, value in readFunc(itemSet, where):
+            if creation == self._lastCreation and itemId in self._lastIds:
+                continue  # already read
+            newValues.append(value)
+
+            if lastCreation is None or creation > lastCreation:
+                lastCreation, lastIds = creation, set([itemId])
+            elif creation == lastCreation:
+                lastIds.add(itemId)
+
+        if lastCreation == self._lastCreation:
+            self._lastIds.update(lastIds)
+        else:
+            self._lastCreation, self._lastIds = lastCreation, lastIds
+
+        itemSet.close()
+
+        return newValues, streamClosed
+
+
 def ObjectWrap(value):
     """This function will act as a simple Factory
     to create objects from Python basic types"""
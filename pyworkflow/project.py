@@ -103,6 +103,15 @@ class Project(object):
         self._creationTime = None
         # Time stamp with the last run has been updated
         self._lastRunTime = None
+        # Modification times of project.sqlite and of the run.db of each
+        # protocol when they were last read, used to refresh only changes
+        self._dbMTime = None
+        self._runsDbMTime = {}
+        # Incremented when the runs are refreshed or modified from this
+        # project, to discard the runs snapshots loaded before
+        self._runsVersion = 0
+        # Classes dictionary shared by all mappers created by this project
+        self._classesDict = None
 
     def getObjId(self):
         """ Return the unique id assigned to this project. """
@@ -208,13 +217,15 @@ class Project(object):
         """ Create a new SqliteMapper object and pass as classes dict
         all globals and update with data and protocols from em.
         """
-        classesDict = pwobj.Dict(default=pwprot.LegacyProtocol)
-        classesDict.update(pwobj.__dict__)
-        classesDict.update(pwconfig.__dict__)
-        classesDict.update(pwhosts.__dict__)
-        classesDict.update(em.getProtocols())
-        classesDict.update(em.getObjects())
-        return SqliteMapper(sqliteFn, classesDict)
+        if self._classesDict is None:
+            classesDict = pwobj.Dict(default=pwprot.LegacyProtocol)
+            classesDict.update(pwobj.__dict__)
+            classesDict.update(pwconfig.__dict__)
+            classesDict.update(pwhosts.__dict__)
+            classesDict.update(em.getProtocols())
+            classesDict.update(em.getObjects())
+            self._classesDict = classesDict
+        return SqliteMapper(sqliteFn, self._classesDict)
 
     def load(self, dbPath=None, hostsConf=None, protocolsConf=None, chdir=True,
              loadAllConfig=True):
@@ -466,6 +477,7 @@ class Project(object):
         else:
             self.mapper.store(protocol)
         self.mapper.commit()
+        self._runsVersion += 1
 
     def scheduleProtocol(self, protocol, prerequisites=[]):
         """ Schedule a new protocol that will run when the input data
@@ -495,6 +507,7 @@ class Project(object):
         pwprot.schedule(protocol)
         self.mapper.store(protocol)
         self.mapper.commit()
+        self._runsVersion += 1
 
     def _updateProtocol(self, protocol, tries=0, checkPid=False,
                         skipUpdatedProtocols=True):
@@ -505,7 +518,10 @@ class Project(object):
 
         if skipUpdatedProtocols:
             # If we are already updated, comparing timestamps
-            if pwprot.isProtocolUpToDate(protocol): return
+            if pwprot.isProtocolUpToDate(protocol):
+                self._runsDbMTime[protocol.getObjId()] = \
+                    self._getRunDbMTime(protocol)
+                return
 
         try:
             # Backup the values of 'jobId', 'label' and 'comment'
@@ -515,6 +531,7 @@ class Project(object):
             comment = protocol.getObjComment()
 
             # Capture the db timestamp before loading.
+            dbMTime = self._getRunDbMTime(protocol)
             lastUpdateTime = pwutils.getFileLastModificationDate(
                                                         protocol.getDbPath())
 
@@ -523,9 +540,7 @@ class Project(object):
             # lastModificationDate of a protocol in the project.sqlite
             # TODO: when launching remote protocols, the db should be
             # TODO: retrieved in a different way.
-            prot2 = pwprot.getProtocolFromDb(self.path,
-                                             protocol.getDbPath(),
-                                             protocol.getObjId())
+            prot2 = self._loadRunProtocol(protocol)
 
             if checkPid:
                 self.checkPid(prot2)
@@ -533,20 +548,33 @@ class Project(object):
             # Copy is only working for db restored objects
             protocol.setMapper(self.mapper)
 
-            protocol.copy(prot2, copyId=False, excludeInputs=True)
-            # Restore backup values
-            protocol.setJobId(jobId)
-            protocol.setObjLabel(label)
-            protocol.setObjComment(comment)
-            # Use the run.db timestamp instead of the system TS to prevent
-            # possible inconsistencies
-            # protocol.lastUpdateTimeStamp.set(datetime.datetime.now())
-            protocol.lastUpdateTimeStamp.set(lastUpdateTime)
+            # Only store the attributes that have changed, unless the
+            # protocol has new outputs and a full copy is needed to
+            # also update the relations
+            changedAttrs = self._getChangedAttributes(protocol, prot2)
+
+            if changedAttrs is None:
+                protocol.copy(prot2, copyId=False, excludeInputs=True)
+                # Restore backup values
+                protocol.setJobId(jobId)
+                protocol.setObjLabel(label)
+                protocol.setObjComment(comment)
+                # Use the run.db timestamp instead of the system TS to prevent
+                # possible inconsistencies
+                # protocol.lastUpdateTimeStamp.set(datetime.datetime.now())
+                protocol.lastUpdateTimeStamp.set(lastUpdateTime)
+                self.mapper.store(protocol)
+            else:
+                for attr, attr2 in changedAttrs:
+                    attr.copy(attr2, copyId=False)
+                    self.mapper.store(attr)
+                protocol.lastUpdateTimeStamp.set(lastUpdateTime)
+                self.mapper.store(protocol.lastUpdateTimeStamp)
 
-            self.mapper.store(protocol)
+            self._runsDbMTime[protocol.getObjId()] = dbMTime
 
             # Close DB connections
-            prot2.getProject().closeMapper()
+            prot2.getMapper().close()
             prot2.closeMappers()
 
         except Exception as ex:
@@ -563,6 +591,68 @@ class Project(object):
                 time.sleep(0.5)
                 self._updateProtocol(protocol, tries + 1)
 
+    def _loadRunProtocol(self, protocol):
+        """ Load the protocol from its own run.db. This project is reused
+        and only a new mapper is created for the run database, instead of
+        creating and loading a new Project for every run.
+        """
+        mapper = self.createMapper(os.path.join(self.path,
+                                                protocol.getDbPath()))
+        prot2 = mapper.selectById(protocol.getObjId())
+
+        if not isinstance(prot2, pwprot.Protocol):
+            mapper.close()
+            raise Exception('>>> ERROR: Invalid protocol id: %d'
+                            % protocol.getObjId())
+
+        prot2.setProject(self)
+        prot2.setMapper(mapper)
+        return prot2
+
+    def _getChangedAttributes(self, protocol, prot2):
+        """ Compare the attributes of the protocol with the ones loaded
+        from its run.db (prot2), excluding the inputs and the jobId.
+        Return a list of (attr, attr2) pairs with the attributes whose
+        value have changed, or None if some attribute was added or removed
+        (e.g. a new output was produced) and a full copy is needed.
+        """
+        ignore = set(key for key, _ in protocol.iterInputAttributes())
+        ignore.update(['_jobId', 'lastUpdateTimeStamp'])
+        changed = []
+        names2 = set()
+
+        for attrName, attr2 in prot2.getAttributes():
+            names2.add(attrName)
+            if attrName in ignore:
+                continue
+            attr = getattr(protocol, attrName, None)
+            if attr is None or attr.getClass() != attr2.getClass():
+                return None
+            if not attr.equalAttributes(attr2):
+                if not attr.hasObjId():  # never stored in the project db
+                    return None
+                changed.append((attr, attr2))
+
+        for attrName, _ in protocol.getAttributes():
+            if attrName not in names2 and attrName not in ignore:
+                return None
+
+        return changed
+
+    def _getRunDbMTime(self, protocol, dbPath=None):
+        """ Return the modification time of the protocol run.db
+        or None if it does not exist.
+        """
+        dbPath = os.path.join(self.path, dbPath or protocol.getDbPath())
+        return os.path.getmtime(dbPath) if os.path.exists(dbPath) else None
+
+    def _isRunDbModified(self, protocol):
+        """ Return True if the protocol run.db has been modified since
+        the last time that it was read by this project.
+        """
+        lastMTime = self._runsDbMTime.get(protocol.getObjId(), None)
+        return lastMTime is None or lastMTime != self._getRunDbMTime(protocol)
+
     def stopProtocol(self, protocol):
         """ Stop a running protocol """
         try:
@@ -648,6 +738,7 @@ class Project(object):
                 print "Error path: ", wd
 
         self.mapper.commit()
+        self._runsVersion += 1
 
     def deleteProtocolOutput(self, protocol, output):
         """ Delete a given object from the project.
@@ -822,6 +913,7 @@ class Project(object):
                         self.mapper.store(newChildProt)
 
             self.mapper.commit()
+            self._runsVersion += 1
         else:
             raise Exception("Project.copyProtocol: invalid input protocol ' "
                             "'type '%s'." % type(protocol))
@@ -957,6 +1049,7 @@ class Project(object):
 
         f.close()
         self.mapper.commit()
+        self._runsVersion += 1
 
         return newDict
 
@@ -1011,6 +1104,7 @@ class Project(object):
         if not self.openedAsReadOnly():
             self.mapper.store(protocol)
             self.mapper.commit()
+            self._runsVersion += 1
 
     def _setProtocolMapper(self, protocol):
         """ Set the project and mapper to the protocol. """
@@ -1048,7 +1142,10 @@ class Project(object):
     def getRuns(self, iterate=False, refresh=True, checkPids=False):
         """ Return the existing protocol runs in the project. 
         """
-        if self.runs is None or refresh:
+        # Only reload all runs from the project db if it has been modified
+        # since the last time (e.g. protocols were saved or deleted), otherwise
+        # only the runs whose run.db have changed will be updated
+        if self.runs is None or (refresh and self._isDbModified()):
             # Close db open connections to db files
             if self.runs is not None:
                 for r in self.runs:
@@ -1058,6 +1155,11 @@ class Project(object):
             # self.runs = self.mapper.selectAll(iterate=False,
             #               objectFilter=lambda o: isinstance(o, pwprot.Protocol))
             self.runs = self.mapper.selectAllBatch(objectFilter=lambda o: isinstance(o, pwprot.Protocol))
+            runIds = set(r.getObjId() for r in self.runs)
+
+            for runId in self._runsDbMTime.keys():
+                if runId not in runIds:
+                    del self._runsDbMTime[runId]
 
             for r in self.runs:
 
@@ -1066,20 +1168,57 @@ class Project(object):
                 # Check for run warnings
                 r.checkSummaryWarnings()
 
+                self._annotateLastRunTime(r.endTime)
+
+            refresh = True
+
+        if refresh:
+            for r in self.runs:
                 # Update nodes that are running and were not invoked
                 # by other protocols
-                if r.isActive():
-                    if not r.isChild():
-                        self._updateProtocol(r, checkPid=checkPids)
-
-                self._annotateLastRunTime(r.endTime)
+                if r.isActive() and not r.isChild():
+                    self._refreshRun(r, checkPids)
 
             # cursor = self.mapper.db.executeCommand('SELECT * FROM Objects WHERE parent_Id IS NOT NULL ORDER BY parent_id, name')
 
             self.mapper.commit()
+            self._dbMTime = self._getDbMTime()
+            self._runsVersion += 1
 
         return self.runs
 
+    def _refreshRun(self, run, checkPids=False):
+        """ Update an active run if its run.db has changed and check if
+        its process is still alive if checkPids is True.
+        Return True if the run was updated.
+        """
+        if self._isRunDbModified(run):
+            self._updateProtocol(run, checkPid=checkPids)
+            run.checkSummaryWarnings()
+            self._annotateLastRunTime(run.endTime)
+            return True
+
+        if checkPids:
+            # A process that died does not write its run.db,
+            # so it should be also checked in that case
+            self.checkPid(run)
+            if run.isFailed():
+                self.mapper.store(run)
+                return True
+
+        return False
+
+    def _getDbMTime(self):
+        """ Return the modification time of the project db. """
+        dbPath = self.mapper.db.getDbName()
+        return os.path.getmtime(dbPath) if os.path.exists(dbPath) else None
+
+    def _isDbModified(self):
+        """ Return True if the project db has been modified since the
+        runs were loaded or refreshed for the last time.
+        """
+        return self._dbMTime is None or self._dbMTime != self._getDbMTime()
+
     def _annotateLastRunTime(self, protLastTS):
         """ Sets _lastRunTime for the project if it is after current _lastRunTime"""
         try:
@@ -1144,6 +1283,104 @@ class Project(object):
 
         return self._runsGraph
 
+    def newRunsSnapshot(self):
+        """ Create a new Project instance to load the runs (and their
+        graph) with its own connection to the project database. It should
+        be created from the thread using this project, but the runs can be
+        loaded later in a different thread with loadSnapshotRuns. Then, the
+        snapshot should be passed to useRunsSnapshot from the first thread.
+        """
+        snapshot = Project(self.path)
+        # Configuration is only read, so it can be shared
+        snapshot._hosts = self._hosts
+        snapshot._classesDict = self._classesDict
+        snapshot.settings = self.settings
+        snapshot._isInReadOnlyFolder = self._isInReadOnlyFolder
+        snapshot._snapshotVersion = self._runsVersion
+        # If the project db does not change, only the active runs whose
+        # run.db has changed will be loaded
+        snapshot._dbMTime = self._dbMTime
+        snapshot._runsDbMTime = dict(self._runsDbMTime)
+        snapshot._activeRuns = None
+        snapshot._partialRuns = False
+        if self.runs is not None:
+            snapshot._activeRuns = dict((r.getObjId(), r.getDbPath())
+                                        for r in self.runs
+                                        if r.isActive() and not r.isChild())
+        return snapshot
+
+    def loadSnapshotRuns(self, checkPids=False):
+        """ Load and refresh the runs of a project created with
+        newRunsSnapshot. The project used to create it is not modified.
+        All runs are loaded if the project db has changed, otherwise only
+        the active runs that have been updated.
+        """
+        self._loadDb(None)
+        try:
+            if self._activeRuns is None or self._isDbModified():
+                self.getRunsGraph(refresh=True, checkPids=checkPids)
+            else:
+                self._loadActiveRuns(checkPids)
+        finally:
+            self.closeMapper()
+
+    def _loadActiveRuns(self, checkPids):
+        """ Load in self.runs only the active runs of the snapshot that
+        have been updated. """
+        self.runs = []
+        self._partialRuns = True
+
+        for runId, dbPath in self._activeRuns.iteritems():
+            if (not checkPids and self._runsDbMTime.get(runId) ==
+                    self._getRunDbMTime(None, dbPath)):
+                continue  # not modified, no need to load it
+            run = self.mapper.selectById(runId)
+            if run is None:
+                continue
+            self._setProtocolMapper(run)
+            if self._refreshRun(run, checkPids):
+                self.runs.append(run)
+
+        self.mapper.commit()
+        self._dbMTime = self._getDbMTime()
+
+    def useRunsSnapshot(self, snapshot):
+        """ Replace the runs and the runs graph of this project with the
+        ones loaded in the snapshot (see newRunsSnapshot). Return the new
+        runs graph, or None if the snapshot was discarded because the runs
+        were refreshed or modified after it was created.
+        """
+        if snapshot._snapshotVersion != self._runsVersion:
+            return None
+
+        if snapshot._partialRuns:
+            # Only replace the updated runs and build the graph again
+            newRuns = dict((r.getObjId(), r) for r in snapshot.runs)
+            for i, r in enumerate(self.runs):
+                run = newRuns.get(r.getObjId(), None)
+                if run is not None:
+                    r.closeMappers()
+                    self._setProtocolMapper(run)
+                    self.runs[i] = run
+            if newRuns or self._runsGraph is None:
+                self._runsGraph = self.getGraphFromRuns(
+                    [r for r in self.runs if not r.isChild()])
+        else:
+            if self.runs is not None:
+                for r in self.runs:
+                    r.closeMappers()
+
+            self.runs = snapshot.runs
+            for r in self.runs:
+                self._setProtocolMapper(r)
+            self._runsGraph = snapshot._runsGraph
+
+        self._dbMTime = snapshot._dbMTime
+        self._runsDbMTime = snapshot._runsDbMTime
+        self._annotateLastRunTime(snapshot._lastRunTime)
+        self._runsVersion += 1
+        return self._runsGraph
+
     def getGraphFromRuns(self, runs):
         """ This function will build a dependencies graph from a set
          of given runs.
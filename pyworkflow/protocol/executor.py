@@ -27,18 +27,112 @@
 This module have the classes for execution of protocol steps.
 The basic one will run steps, one by one, after completion.
 There is one based on threads to execute steps in parallel
-using different threads and the last one with MPI processes.
+using different threads, another one that also runs some function
+steps in a pool of processes and the last one with MPI processes.
 """
 
 import time
+import pickle
 import datetime
 import traceback
 import threading
+import multiprocessing
+from collections import deque
 
 import pyworkflow.utils.process as process
 import constants as cts
 
 
+class StepsScheduler():
+    """ Keep track of the steps that are ready to run.
+    Instead of checking the prerequisites of all steps every time,
+    each step not launched yet keeps the set of prerequisites that
+    are not finished and it is moved to a ready queue when the
+    last of them finishes.
+    The steps list can be modified (new steps, new prerequisites or
+    waiting steps that become new) from the stepsCheckCallback,
+    so update() should be called after it.
+    """
+    def __init__(self, steps):
+        self._steps = steps
+        self._count = 0  # number of steps already registered
+        self._ready = deque()  # indexes of steps ready to run
+        self._blockedBy = {}  # step index -> unfinished prerequisites
+        self._nPrereqs = {}  # step index -> number of prerequisites seen
+        self._dependents = {}  # step index -> steps that depend on it
+        self.update()
+
+    def _getStep(self, index):
+        return self._steps[index - 1]
+
+    def _addPrerequisites(self, index, prerequisites):
+        """ Register the not finished prerequisites of a given step. """
+        blocked = self._blockedBy[index]
+        for p in prerequisites:
+            p = int(p)
+            if not self._getStep(p).isFinished():
+                blocked.add(p)
+                self._dependents.setdefault(p, set()).add(index)
+
+    def _checkReady(self, index):
+        """ Move the step to the ready queue if it is new
+        and all its prerequisites are finished. """
+        if (not self._blockedBy[index] and
+                self._getStep(index).getStatus() == cts.STATUS_NEW):
+            del self._blockedBy[index]
+            del self._nPrereqs[index]
+            self._ready.append(index)
+
+    def update(self):
+        """ Register the new steps and the changes made to the
+        steps that have not been launched yet.
+        """
+        for i in range(self._count, len(self._steps)):
+            index = i + 1
+            if self._getStep(index).getStatus() in [cts.STATUS_NEW,
+                                                    cts.STATUS_WAITING]:
+                self._blockedBy[index] = set()
+                self._nPrereqs[index] = 0
+        self._count = len(self._steps)
+
+        for index in self._blockedBy.keys():
+            prerequisites = self._getStep(index)._prerequisites
+            n = self._nPrereqs[index]
+            if len(prerequisites) != n:
+                self._addPrerequisites(index, prerequisites[n:])
+                self._nPrereqs[index] = len(prerequisites)
+            self._checkReady(index)
+
+    def stepFinished(self, step):
+        """ Notify that a step was done, if it finished properly, its
+        dependent steps may become ready. """
+        if step.isFinished():
+            for index in sorted(self._dependents.pop(step.getIndex(), [])):
+                if index in self._blockedBy:
+                    self._blockedBy[index].discard(step.getIndex())
+                    self._checkReady(index)
+
+    def hasRunnable(self):
+        return len(self._ready) > 0
+
+    def getRunnable(self, n=1):
+        """ Return up to n steps that are ready to run. """
+        rs = []
+        while self._ready and len(rs) < n:
+            step = self._getStep(self._ready.popleft())
+            if step.getStatus() == cts.STATUS_NEW:
+                rs.append(step)
+            elif step.isWaiting():  # it was set to wait again
+                self._blockedBy[step.getIndex()] = set()
+                self._nPrereqs[step.getIndex()] = len(step._prerequisites)
+        return rs
+
+    def hasWaiting(self):
+        """ Return True if there are steps waiting, that could be
+        released later from the stepsCheckCallback. """
+        return any(self._getStep(i).isWaiting() for i in self._blockedBy)
+
+
 class StepExecutor():
     """ Run a list of Protocol steps. """
     def __init__(self, hostConfig, **kwargs):
@@ -60,25 +154,10 @@ class StepExecutor():
                        self.hostConfig,
                        env=env, cwd=cwd, gpuList=self.getGpuList())
         
-    def _getRunnable(self, steps, n=1):
-        """ Return the n steps that are 'new' and all its
-        dependencies have been finished, or None if none ready.
-        """
-        rs = [] # return a list of runnable steps
-
-        for s in steps:
-            if (s.getStatus() == cts.STATUS_NEW and
-                    all(steps[i-1].isFinished() for i in s._prerequisites)):
-                rs.append(s)
-                if len(rs) == n:
-                    break
-        return rs
-    
-    def _arePending(self, steps):
-        """ Return True if there are pending steps (either running or waiting)
-        that can be done and thus enable other steps to be executed.
-        """
-        return any(s.isRunning() or s.isWaiting() for s in steps)
+    def _getTimeToCheck(self, lastCheck, delta):
+        """ Return the seconds until the next stepsCheckCallback call. """
+        remaining = lastCheck + delta - datetime.datetime.now()
+        return max(remaining.total_seconds(), 0)
     
     def runSteps(self, steps, 
                  stepStartedCallback, 
@@ -92,10 +171,11 @@ class StepExecutor():
 
         delta = datetime.timedelta(seconds=stepsCheckSecs)
         lastCheck = datetime.datetime.now()
+        scheduler = StepsScheduler(steps)
 
         while True:
             # Get an step to run, if there is one
-            runnableSteps = self._getRunnable(steps)
+            runnableSteps = scheduler.getRunnable()
 
             if runnableSteps:
                 step = runnableSteps[0]
@@ -105,23 +185,25 @@ class StepExecutor():
                 stepStartedCallback(step)
                 step.run()
                 doContinue = stepFinishedCallback(step)
+                scheduler.stepFinished(step)
             
                 if not doContinue:
                     break
 
-            elif self._arePending(steps):
+            elif scheduler.hasWaiting():
                 # We have not found any runnable step, but still there
-                # there are some running or waiting for dependencies
-                # So, let's wait a bit to check if something changes
-                time.sleep(0.5)
+                # there are some waiting, that only can be released
+                # from the steps check, so let's wait until then
+                time.sleep(self._getTimeToCheck(lastCheck, delta))
             else:
                 # No steps to run, neither running or waiting
                 # So, we are done, either failed or finished :)
                 break
 
             now = datetime.datetime.now()
-            if now - lastCheck > delta:
+            if now - lastCheck >= delta:
                 stepsCheckCallback()
+                scheduler.update()
                 lastCheck = now
 
 
@@ -136,10 +218,13 @@ class StepThread(threading.Thread):
         self.step = step
         self.lock = lock
 
+    def _runStep(self):
+        self.step._run()  # not self.step.run() , to avoid race conditions
+
     def run(self):
         error = None
         try:
-            self.step._run()  # not self.step.run() , to avoid race conditions
+            self._runStep()
         except Exception as e:
             error = str(e)
             traceback.print_exc()
@@ -150,6 +235,8 @@ class StepThread(threading.Thread):
                 else:
                     self.step.setFailed(error)
                 self.step.endTime.set(datetime.datetime.now())
+                # Wake up the executor waiting for finished steps
+                self.lock.notify()
 
 
 class ThreadStepExecutor(StepExecutor):
@@ -182,6 +269,10 @@ class ThreadStepExecutor(StepExecutor):
         """ Return the GPU list assigned to current thread
         or empty list if not using GPUs. """
         return self.gpuDict.get(threading.currentThread().thId, [])
+
+    def _createThread(self, node, step, lock):
+        """ Create the thread that will run the step in a given node. """
+        return StepThread(node, step, lock)
         
     def runSteps(self, steps, 
                  stepStartedCallback, 
@@ -196,10 +287,17 @@ class ThreadStepExecutor(StepExecutor):
         delta = datetime.timedelta(seconds=stepsCheckSecs)
         lastCheck = datetime.datetime.now()
 
-        sharedLock = threading.Lock()
+        # The threads will notify through this condition when
+        # their step is done, so we don't need to poll for it
+        sharedLock = threading.Condition()
+        scheduler = StepsScheduler(steps)
 
         runningSteps = {}  # currently running step in each node ({node: step})
         freeNodes = range(self.numberOfProcs)  # available nodes to send jobs
+        threads = []  # all threads launched to run steps
+
+        def anyFinished():
+            return any(not s.isRunning() for s in runningSteps.itervalues())
 
         while True:
             # See which of the runningSteps are not really running anymore.
@@ -213,49 +311,177 @@ class ThreadStepExecutor(StepExecutor):
                 freeNodes.append(node)  # the node is available now
                 # Notify steps termination and check if we should continue
                 doContinue = stepFinishedCallback(step)
+                scheduler.stepFinished(step)
                 if not doContinue:
                     break
 
             if not doContinue:
                 break
 
-            anyLaunched = False
             # If there are available nodes, send next runnable step.
             with sharedLock:
                 if freeNodes:
-                    runnableSteps = self._getRunnable(steps, len(freeNodes))
+                    runnableSteps = scheduler.getRunnable(len(freeNodes))
 
                     for step in runnableSteps:
                         # We found a step to work in, so let's start a new
                         # thread to do the job and book it.
-                        anyLaunched = True
                         step.setRunning()
                         stepStartedCallback(step)
                         node = freeNodes.pop()  # take an available node
                         runningSteps[node] = step
-                        t = StepThread(node, step, sharedLock)
+                        t = self._createThread(node, step, sharedLock)
                         # won't keep process up if main thread ends
                         t.daemon = True
                         t.start()
-                anyPending = self._arePending(steps)
+                        threads.append(t)
 
-            if not anyLaunched:
-                if anyPending:  # nothing running
-                    time.sleep(0.5)
-                else:
+            if not runningSteps and not scheduler.hasRunnable():
+                if not scheduler.hasWaiting():
                     break  # yeah, we are done, either failed or finished :)
 
             now = datetime.datetime.now()
-            if now - lastCheck > delta:
+            if now - lastCheck >= delta:
                 stepsCheckCallback()
+                scheduler.update()
                 lastCheck = now
 
+            # Sleep until a running step finishes or it is time
+            # for the next steps check
+            with sharedLock:
+                if not (anyFinished() or
+                        (freeNodes and scheduler.hasRunnable())):
+                    sharedLock.wait(self._getTimeToCheck(lastCheck, delta))
+
         stepsCheckCallback()
 
         # Wait for all threads now.
-        for t in threading.enumerate():
-            if t is not threading.current_thread():
-                t.join()
+        for t in threads:
+            t.join()
+
+
+# Protocol and node used by the worker processes of ProcessStepExecutor.
+# The workers are forked when the pool is created, so they get a copy
+# of the protocol and there is no need to pickle it.
+_processProtocol = None
+_processNode = None
+
+
+def _closeSetMappers(obj, visited):
+    """ Remove the mappers of the sets reachable from obj (attributes,
+    pointed objects or nested sets), they will be loaded again on use.
+    """
+    from pyworkflow.object import Object, Set
+    if id(obj) in visited:
+        return
+    visited.add(id(obj))
+    if isinstance(obj, Set):
+        obj._mapper = None
+    for value in obj.__dict__.values():
+        if isinstance(value, Object):
+            _closeSetMappers(value, visited)
+
+
+def _initProcessWorker():
+    """ Prepare a pool worker process: the connections to the databases
+    opened by the parent process can not be used after the fork, so new
+    ones will be opened when needed. The protocol is only stored by the
+    parent, so its mapper is not available in the workers.
+    """
+    from pyworkflow.mapper.sqlite_db import SqliteDb
+    SqliteDb.OPEN_CONNECTIONS = {}
+    _processProtocol.mapper = None
+    _closeSetMappers(_processProtocol, set())
+
+
+def _runProcessStep(node, funcName, argsStr):
+    """ Run a protocol function step inside a pool worker process.
+    Return a tuple (result, error), where error is None if the function
+    finished properly or the error message otherwise.
+    """
+    global _processNode
+    _processNode = node
+    try:
+        func = getattr(_processProtocol, funcName)
+        return func(*pickle.loads(argsStr)), None
+    except Exception as e:
+        traceback.print_exc()
+        return None, str(e)
+
+
+class ProcessStepThread(StepThread):
+    """ Thread that sends its step to a pool of processes and waits
+    for the result. The step status is updated in the parent process.
+    """
+    def __init__(self, thId, step, lock, pool):
+        StepThread.__init__(self, thId, step, lock)
+        self.pool = pool
+
+    def _runStep(self):
+        result, error = self.pool.apply(_runProcessStep,
+                                        (self.thId, self.step.funcName.get(),
+                                         self.step.argsStr.get()))
+        if error is not None:
+            raise Exception(error)
+        self.step._storeResultFiles(result)
+
+
+class ProcessStepExecutor(ThreadStepExecutor):
+    """ Run steps in parallel using threads, as ThreadStepExecutor,
+    but the function steps inserted with processStep=True are executed
+    in a pool of processes, so Python code is not serialized by the GIL.
+    The workers are forked before the steps start, so those steps should
+    only use their arguments and the protocol parameters, and write their
+    own files. The steps creating outputs or storing objects must run in
+    this process, which is the only one storing the protocol and the steps.
+    """
+    def __init__(self, hostConfig, nThreads, protocol, **kwargs):
+        ThreadStepExecutor.__init__(self, hostConfig, nThreads, **kwargs)
+        self.protocol = protocol
+        self.pool = None
+
+    def getGpuList(self):
+        """ Return the GPU list assigned to the current worker process
+        or thread, or empty list if not using GPUs. """
+        if _processNode is not None:
+            return self.gpuDict.get(_processNode, [])
+        return ThreadStepExecutor.getGpuList(self)
+
+    def _isProcessStep(self, step):
+        """ Only steps explicitly marked with processStep=True. """
+        return getattr(step, '_processStep', False)
+
+    def _createThread(self, node, step, lock):
+        if self.pool is not None and self._isProcessStep(step):
+            return ProcessStepThread(node, step, lock, self.pool)
+        return ThreadStepExecutor._createThread(self, node, step, lock)
+
+    def runSteps(self, steps,
+                 stepStartedCallback,
+                 stepFinishedCallback,
+                 stepsCheckCallback,
+                 stepsCheckSecs=3):
+        global _processProtocol
+        # The pool is created before the steps threads are started, so
+        # the workers are not forked from a multithreaded process. It is
+        # not needed if no step is marked (e.g. steps added in streaming
+        # will run in threads)
+        if any(self._isProcessStep(step) for step in steps):
+            _processProtocol = self.protocol
+            self.pool = multiprocessing.Pool(self.numberOfProcs,
+                                             _initProcessWorker)
+        try:
+            ThreadStepExecutor.runSteps(self, steps,
+                                        stepStartedCallback,
+                                        stepFinishedCallback,
+                                        stepsCheckCallback,
+                                        stepsCheckSecs=stepsCheckSecs)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+            _processProtocol = None
 
 
 class MPIStepExecutor(ThreadStepExecutor):
@@ -41,6 +41,7 @@ B. Remote execution:
 """
 import os
 import re
+import time
 from subprocess import Popen, PIPE
 import pyworkflow as pw
 from pyworkflow.utils import (redStr, greenStr, makeFilePath, join, process,
@@ -80,20 +81,52 @@ def stop(protocol):
 def schedule(protocol, wait=False):
     """ Use this function to schedule protocols that are not ready to
     run yet. Right now it only make sense to schedule jobs locally.
+    A single scheduler process is used for all the scheduled runs of
+    a project, so it is only started if it is not already running.
     """
-    protStrId = protocol.strId()
-    python = pw.SCIPION_PYTHON
-    scipion = pw.getScipionScript()
-    cmd = '%s %s runprotocol pw_schedule_run.py' % (python, scipion)
-    cmd += ' "%s" "%s" %s' % (protocol.getProject().path,
-                              protocol.getDbPath(),
-                              protStrId)
-    jobId = _run(cmd, wait)
-    protocol.setJobId(jobId)
+    # Scheduled runs do not have a process of their own
+    protocol.setPid(0)
+    protocol.setJobId(None)
+    projectPath = protocol.getProject().path
+    jobId = getSchedulerPid(projectPath)
+
+    if jobId is None:
+        cmd = '%s %s python %s "%s"' % (pw.SCIPION_PYTHON,
+                                         pw.getScipionScript(),
+                                         pw.join('apps',
+                                                 'pw_schedule_project.py'),
+                                         projectPath)
+        jobId = _run(cmd, wait)
 
     return jobId
 
 
+def getSchedulerPidFile(projectPath):
+    """ Return the file where the scheduler of the project
+    stores its pid.
+    """
+    from pyworkflow.project import PROJECT_LOGS
+    return os.path.join(projectPath, PROJECT_LOGS, 'scheduler.pid')
+
+
+def getSchedulerPid(projectPath):
+    """ Return the pid of the scheduler running for this project
+    or None if there is no scheduler running.
+    """
+    pidFile = getSchedulerPidFile(projectPath)
+
+    if os.path.exists(pidFile):
+        with open(pidFile) as f:
+            pid = f.read().strip()
+        # An empty file means the scheduler is just starting
+        if not pid:
+            recent = time.time() - os.path.getmtime(pidFile) < 10
+            return 0 if recent else None
+        if process.isProcessAlive(int(pid)):
+            return int(pid)
+
+    return None
+
 
 # ******************************************************************
 # *         Internal utility functions
@@ -261,6 +294,8 @@ def _stopLocal(protocol):
         host = protocol.getHostConfig()
         cancelCmd = host.getCancelCommand() % {'JOB_ID': jobId}
         _run(cancelCmd, wait=True)
+    elif protocol.isScheduled() and not protocol.getPid():
+        pass  # Waiting in the project scheduler, there is nothing to kill
     else:
         process.killWithChilds(protocol.getPid())
 
@@ -44,7 +44,8 @@ import pyworkflow as pw
 from pyworkflow.object import *
 import pyworkflow.utils as pwutils
 from pyworkflow.utils.log import ScipionLogger
-from executor import StepExecutor, ThreadStepExecutor, MPIStepExecutor
+from executor import (StepExecutor, ThreadStepExecutor, ProcessStepExecutor,
+                      MPIStepExecutor)
 from constants import *
 from params import Form
 import scipion
@@ -225,6 +226,8 @@ class FunctionStep(Step):
         self.funcName = String(funcName)
         self.argsStr = String(pickle.dumps(funcArgs))
         self.setInteractive(kwargs.get('interactive', False))
+        # Steps that can be executed in a child process (not stored)
+        self._processStep = kwargs.get('processStep', False)
         if kwargs.get('wait', False):
             self.setStatus(STATUS_WAITING)
 
@@ -234,7 +237,11 @@ class FunctionStep(Step):
 
     def _run(self):
         """ Run the function and check the result files if any. """
-        resultFiles = self._runFunc()
+        self._storeResultFiles(self._runFunc())
+
+    def _storeResultFiles(self, resultFiles):
+        """ Check that the result files returned by the function exist
+        and store them. """
         if isinstance(resultFiles, basestring):
             resultFiles = [resultFiles]
         if resultFiles and len(resultFiles):
@@ -311,6 +318,11 @@ class Protocol(Step):
     # Version where protocol appeared first time
     _lastUpdateVersion = pw.VERSION_1
 
+    # Changes in the steps status are written to the steps.sqlite file
+    # in batches, after this number of changed steps or seconds
+    STEPS_JOURNAL_SIZE = 50
+    STEPS_JOURNAL_INTERVAL = 5
+
     def __init__(self, **kwargs):
         Step.__init__(self, **kwargs)
         self._steps = []  # List of steps that will be executed
@@ -378,6 +390,13 @@ class Protocol(Step):
         self._stepsExecutor = None
         self._stepsDone = Integer(0)
         self._numberOfSteps = Integer(0)
+        self._stepsSet = None
+        # Steps changed and not yet written to the steps.sqlite file
+        # (by step index) and state of the steps when last written
+        self._stepsJournal = {}
+        self._stepsStates = {}
+        self._stepsJournalTime = 0
+        self._stepsDoneChanged = False
         # For visualization
         self.allowHeader = Boolean(True)
         # Create an String variable to allow some protocol to precompute
@@ -808,7 +827,13 @@ class Protocol(Step):
          Params:
            funcName: the string name of the function to be run in the Step.
            *funcArgs: the variable list of arguments to pass to the function.
-           **kwargs: see __insertStep
+           **kwargs: see __insertStep, and also:
+             processStep: if True, when running steps in parallel with
+               threads and SCIPION_STEPS_PROCESSES is set, the step is
+               executed in a pool of processes. Only for steps that
+               depend on their arguments and the protocol parameters and
+               write their own files, but do not create outputs or
+               store objects.
         """
         # Get the function give its name
         func = getattr(self, funcName, None)
@@ -887,6 +912,7 @@ class Protocol(Step):
         """ Load the Steps stored in the steps.sqlite file.
         """
         prevSteps = []
+        self._flushSteps()
 
         if os.path.exists(self.getStepsFile()):
             stepsSet = StepSet(filename=self.getStepsFile())
@@ -941,21 +967,93 @@ class Protocol(Step):
         """
         stepsFn = self.getStepsFile()
 
+        if self._stepsSet is not None:
+            self._stepsSet.close()
+
         self._stepsSet = StepSet(filename=stepsFn)
         self._stepsSet.setStore(False)
         self._stepsSet.clear()
+        self._stepsStates.clear()
 
         for step in self._steps:
             step.cleanObjId()
             self.setInteractive(self.isInteractive() or step.isInteractive())
             self._stepsSet.append(step)
+            self._stepsStates[step.getObjId()] = self.__getStepState(step)
 
         self._stepsSet.write()
+        # All steps were just written, so nothing is pending in the journal
+        self._stepsJournal.clear()
+        self._stepsJournalTime = time.time()
+
+    def _storeNewSteps(self):
+        """ Store the changes in the steps list since the last time it
+        was written, without rewriting the whole steps.sqlite file.
+        New steps are appended and only the steps whose prerequisites
+        or status have changed are updated.
+        """
+        if self._stepsSet is None:
+            self._storeSteps()
+            return
 
-    def __updateStep(self, step):
-        """ Store a given step and write changes. """
-        self._stepsSet.update(step)
-        self._stepsSet.write()
+        for step in self._steps:
+            if not step.hasObjId():
+                self.setInteractive(self.isInteractive() or
+                                    step.isInteractive())
+                self._stepsJournal[step.getIndex()] = step
+            elif (self._stepsStates.get(step.getObjId()) !=
+                  self.__getStepState(step)):
+                self._stepsJournal[step.getIndex()] = step
+
+        self._flushSteps()
+
+    def __getStepState(self, step):
+        """ Return the values of a step that can change after stored. """
+        return step._prerequisites.get(), step.getStatus()
+
+    def __updateStep(self, step, force=False):
+        """ Register the changes of a given step. The changes are written
+        in batches, when there are enough pending steps, some time has
+        passed since the last write or if force=True.
+        If the process is killed before writing, the steps will be
+        executed again when resuming, but never skipped.
+        """
+        self._stepsJournal[step.getIndex()] = step
+
+        if force or len(self._stepsJournal) >= self.STEPS_JOURNAL_SIZE:
+            self._flushSteps()
+        else:
+            self.__checkFlushSteps()
+
+    def __checkFlushSteps(self):
+        """ Write the pending steps changes if enough time has passed
+        since the last write.
+        """
+        if (time.time() - self._stepsJournalTime >=
+                self.STEPS_JOURNAL_INTERVAL):
+            self._flushSteps()
+
+    def _flushSteps(self):
+        """ Write all pending steps changes to the steps.sqlite file and
+        the number of steps done to the run database.
+        New steps are appended in the order of their index.
+        """
+        if self._stepsJournal:
+            for index in sorted(self._stepsJournal):
+                step = self._stepsJournal[index]
+                if step.hasObjId():
+                    self._stepsSet.update(step)
+                else:
+                    self._stepsSet.append(step)
+                self._stepsStates[step.getObjId()] = self.__getStepState(step)
+            self._stepsSet.write()
+            self._stepsJournal.clear()
+
+        if self._stepsDoneChanged:
+            self._store(self._stepsDone)
+            self._stepsDoneChanged = False
+
+        self._stepsJournalTime = time.time()
 
     def _stepStarted(self, step):
         """This function will be called whenever an step
@@ -964,7 +1062,11 @@ class Protocol(Step):
         self.info(pwutils.magentaStr("STARTED") + ": %s, step %d" %
                   (step.funcName.get(), step._index))
         self.info("  %s" % step.initTime.datetime())
-        self.__updateStep(step)
+        # The serial executor runs the step in this same thread, so
+        # there will not be periodic checks (and writes) until it
+        # finishes. Write now the steps that finished before this one.
+        serial = not isinstance(self._stepsExecutor, ThreadStepExecutor)
+        self.__updateStep(step, force=serial)
 
     def _stepFinished(self, step):
         """This function will be called whenever an step
@@ -981,9 +1083,10 @@ class Protocol(Step):
             self.error(errorMsg)
         self.lastStatus = step.getStatus()
 
-        self.__updateStep(step)
         self._stepsDone.increment()
-        self._store(self._stepsDone)
+        self._stepsDoneChanged = True
+        # Always write when the protocol is not going to continue
+        self.__updateStep(step, force=not doContinue)
 
         self.info(pwutils.magentaStr(step.getStatus().upper()) + ": %s, step %d"
                   % (step.funcName.get(), step._index))
@@ -994,6 +1097,14 @@ class Protocol(Step):
             self._endRun()
         return doContinue
 
+    def __stepsCheck(self):
+        """ Called periodically by the steps executor, also while
+        steps are running in parallel. Pending steps changes are written
+        here, so subclasses overriding _stepsCheck can not skip it.
+        """
+        self.__checkFlushSteps()
+        self._stepsCheck()
+
     def _stepsCheck(self):
         pass
 
@@ -1016,7 +1127,8 @@ class Protocol(Step):
             self._stepsExecutor.runSteps(self._steps,
                                          self._stepStarted,
                                          self._stepFinished,
-                                         self._stepsCheck)
+                                         self.__stepsCheck)
+        self._flushSteps()
         self.setStatus(self.lastStatus)
         self._store(self.status)
 
@@ -1203,6 +1315,7 @@ class Protocol(Step):
 
     def _endRun(self):
         """ Print some ending message and close some files. """
+        self._flushSteps()
         # self._store()
         self._store(self.summaryVar)
         self._store(self.methodsVar)
@@ -1514,8 +1627,9 @@ class Protocol(Step):
     def updateSteps(self):
         """ After the steps list is modified, this methods will update steps
         information. It will save the steps list and also the number of steps.
+        Only new or modified steps are written, see _storeNewSteps.
         """
-        self._storeSteps()
+        self._storeNewSteps()
         self._numberOfSteps.set(len(self._steps))
         self._store(self._numberOfSteps)
 
@@ -1919,9 +2033,14 @@ def runProtocolMain(projectPath, protDbPath, protId):
             sys.exit(retcode)
 
         elif protocol.numberOfThreads > 1:
-            executor = ThreadStepExecutor(hostConfig,
-                                          protocol.numberOfThreads.get()-1,
-                                          gpuList=protocol.getGpuList())
+            nThreads = protocol.numberOfThreads.get() - 1
+            # Run the steps marked as processStep in a pool of processes
+            if pwutils.envVarOn('SCIPION_STEPS_PROCESSES'):
+                executor = ProcessStepExecutor(hostConfig, nThreads, protocol,
+                                               gpuList=protocol.getGpuList())
+            else:
+                executor = ThreadStepExecutor(hostConfig, nThreads,
+                                              gpuList=protocol.getGpuList())
     if executor is None:
         executor = StepExecutor(hostConfig,
                                 gpuList=protocol.getGpuList())
@@ -1986,6 +2105,27 @@ def getUpdatedProtocol(protocol):
     return prot2
 
 
+def getProtocolStatus(protocol):
+    """ Read the current status of the protocol directly from its run.db.
+    This is much cheaper than getUpdatedProtocol, since neither the
+    project nor the protocol are loaded.
+    """
+    from sqlite3 import dbapi2 as sqlite
+
+    dbPath = protocol.getDbPath()
+    if not os.path.exists(dbPath):
+        return protocol.getStatus()
+
+    conn = sqlite.Connection(dbPath, timeout=30)
+    try:
+        row = conn.execute("SELECT value FROM Objects WHERE name = ?",
+                           ('%d.status' % protocol.getObjId(),)).fetchone()
+    finally:
+        conn.close()
+
+    return protocol.getStatus() if row is None else row[0]
+
+
 def isProtocolUpToDate(protocol):
     """ Check timestamps between protocol lastModificationDate and the
     corresponding runs.db timestamp"""
@@ -0,0 +1,62 @@
+# **************************************************************************
+# *
+# * Authors:     Roberto Marabini (roberto@cnb.csic.es)
+# *              J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+
+from pyworkflow.tests import *
+from pyworkflow.benchmark import (BENCHMARKS, SyntheticData, runBenchmarks,
+                                  writeResults, readResults, compareResults)
+
+
+class TestBenchmark(BaseTest):
+    """ Run the benchmarks with very small synthetic sets. """
+    @classmethod
+    def setUpClass(cls):
+        setupTestOutput(cls)
+
+    def test_synthetic(self):
+        data = SyntheticData(self.getOutputPath(), 250)
+        partSet = data.getParticles()
+        self.assertEqual(250, partSet.getSize())
+        self.assertEqual(3, len(set(p.getMicId() for p in partSet)))
+        classes = data.getClasses2D()
+        self.assertEqual(250, sum(cls.getSize() for cls in classes))
+        # The same content should be generated with the same seed
+        other = SyntheticData(self.getOutputPath('other'), 250)
+        makePath(other.path)
+        for p1, p2 in izip(partSet, other.getParticles()):
+            self.assertEqual(p1.getClassId(), p2.getClassId())
+            self.assertEqual(p1.getCTF().getDefocusU(),
+                             p2.getCTF().getDefocusU())
+
+    def test_runBenchmarks(self):
+        results = runBenchmarks(BENCHMARKS, [50], self.getOutputPath(),
+                                repeat=1, verbose=False)
+        self.assertEqual(len(BENCHMARKS), len(results['results']))
+        fn = self.getOutputPath('results.json')
+        writeResults(results, fn)
+        comparison = compareResults(results, readResults(fn))
+        self.assertEqual(len(BENCHMARKS), len(comparison))
+        self.assertTrue(all(c[-1] == 1 for c in comparison))
@@ -194,6 +194,57 @@ class TestImageHandler(unittest.TestCase):
         else:
             pwutils.cleanPath(outFn)
 
+    def test_numpyBackend(self):
+        """ Check the numpy memory-mapped reader/writer
+        for MRC and SPIDER stacks.
+        """
+        import numpy as np
+        from pyworkflow.em.image_numpy import NumpyImageBackend
+
+        ih = ImageHandler()
+        data = np.random.rand(5, 1, 32, 48).astype(np.float32)
+
+        for ext in ['mrcs', 'stk']:
+            stackFn = join('/tmp', 'numpy_stack.%s' % ext)
+            NumpyImageBackend.write(data, stackFn)
+
+            self.assertEqual(ih.getDimensions(stackFn), (48, 32, 1, 5))
+            self.assertEqual(ih.getDimensions((3, stackFn)), (48, 32, 1, 1))
+            self.assertEqual(ih.getDataType(stackFn), ImageHandler.DT_FLOAT)
+            self.assertTrue(np.allclose(ih.getData((3, stackFn)), data[2, 0]))
+
+            outFn = join('/tmp', 'numpy_stack_converted.mrcs')
+            ih.convertStack(stackFn, outFn, 2, 4)
+            self.assertEqual(ih.getDimensions(outFn), (48, 32, 1, 3))
+            self.assertTrue(np.allclose(ih.getData(outFn), data[1:4]))
+
+            pwutils.cleanPath(stackFn, outFn)
+
+        volFn = join('/tmp', 'numpy_volume.mrc')
+        NumpyImageBackend.write(data[:, 0], volFn)
+        self.assertEqual(ih.getDimensions(volFn), (48, 32, 5, 1))
+        self.assertEqual(ih.getDimensions(volFn + ':mrcs'), (48, 32, 1, 5))
+        pwutils.cleanPath(volFn)
+
+    def test_computeThumbnail(self):
+        """ Check the thumbnails computed without calling e2proc2d.py. """
+        import numpy as np
+        from PIL import Image
+        from pyworkflow.em.image_numpy import NumpyImageBackend, fourierShrink
+
+        # A smooth image should keep its values after the Fourier shrink
+        y, x = np.mgrid[0:64, 0:96]
+        data = np.cos(2 * np.pi * x / 96.).astype(np.float32)
+        shrunk = fourierShrink(data, 4)
+        self.assertEqual(shrunk.shape, (16, 24))
+        self.assertTrue(np.allclose(shrunk, data[::4, ::4], atol=1e-4))
+
+        micFn = join(self.outputPath, 'numpy_mic.mrc')
+        thumbFn = join(self.outputPath, 'numpy_mic.png')
+        NumpyImageBackend.write(data, micFn)
+        ImageHandler().computeThumbnail(micFn, thumbFn, scaleFactor=4)
+        self.assertEqual(Image.open(thumbFn).size, (24, 16))
+
     def test_truncateMask(self):
         ih = ImageHandler()
 
@@ -577,9 +628,32 @@ class TestTransform(BaseTest):
         
         p2 = p.clone()
         m3 = p2.getTransform().getMatrix()
-        self.assertTrue(np.allclose(m, m3, rtol=1e-2)) 
-        
-    
+        self.assertTrue(np.allclose(m, m3, rtol=1e-2))
+
+    def test_batchGeometry(self):
+        """ Check that the batch conversions between geometry and
+        matrices give the same results than the one by one ones.
+        """
+        from pyworkflow.em.transformations import (matrices_from_geometry,
+                                                   geometry_from_matrices)
+        shifts = 10 * np.random.random((50, 3))
+        angles = 360 * np.random.random((50, 3)) - 180
+        angles[::5, 1] = 0  # check also the singular case (tilt = 0)
+
+        for inverse in [False, True]:
+            matrices = matrices_from_geometry(shifts, angles, inverse)
+            self.assertEqual(matrices.shape, (50, 4, 4))
+            for s, a, m in zip(shifts, angles, matrices):
+                self.assertTrue(np.allclose(m, matrixFromGeometry(s, a, inverse)))
+
+            shifts2, angles2 = geometry_from_matrices(matrices, inverse)
+            self.assertTrue(np.allclose(shifts, shifts2))
+            for m, s, a in zip(matrices, shifts2, angles2):
+                s1, a1 = geometryFromMatrix(m, inverse)
+                self.assertTrue(np.allclose(s, s1))
+                self.assertTrue(np.allclose(a, a1))
+
+
 class TestCopyItems(BaseTest):
 
     _labels = [SMALL, WEEKLY]
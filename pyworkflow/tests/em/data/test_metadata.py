@@ -93,3 +93,44 @@ class TestMetaData(unittest.TestCase):
         self.assertEqual(md0, md1)
 
 
+
+    def test_starRows(self):
+        """ Compare the native STAR reader/writer with MetaData. """
+        starFn = '/tmp/test_starRows.star'
+        md0 = self._newMd()
+        md0.write('images@%s' % starFn)
+
+        rows = list(row.clone() for row in md.iterStarRows(starFn))
+        self.assertEqual(len(rows), md0.size())
+
+        for row, objId in zip(rows, md0):
+            for label in md0.getActiveLabels():
+                self.assertEqual(row.getValue(label),
+                                 md0.getValue(label, objId))
+
+        # Write again the rows with the native writer and read with Xmipp
+        md.writeStarRows('images@%s' % starFn, rows)
+        self.assertEqual(md0, md.MetaData('images@%s' % starFn))
+
+        with md.StarReader(starFn, 'images') as reader:
+            columns = reader.readColumns('image')
+            self.assertEqual(list(columns['image']),
+                             ['%02d@proj.stk' % i for i in range(5)])
+
+    def test_starRowsLabelsUnion(self):
+        """ Labels not present in the first row should not be dropped. """
+        starFn = '/tmp/test_starRowsUnion.star'
+        rows = []
+        for i in range(3):
+            row = md.Row()
+            row.setValue(md.MDL_IMAGE, '%02d@proj.stk' % i)
+            if i > 0:
+                row.setValue(md.MDL_ANGLE_PSI, 10. * i)
+            rows.append(row)
+
+        md.writeStarRows('images@%s' % starFn, iter(rows))
+        md1 = md.MetaData('images@%s' % starFn)
+        self.assertEqual(set(md1.getActiveLabels()),
+                         set([md.MDL_IMAGE, md.MDL_ANGLE_PSI]))
+        self.assertEqual(md1.getColumnValues(md.MDL_ANGLE_PSI),
+                         [0., 10., 20.])
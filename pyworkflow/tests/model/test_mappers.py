@@ -130,7 +130,7 @@ class TestSqliteMapper(BaseTest):
         
         # Save changes to file
         mapper.commit()
-        self.assertEqual(1, mapper.db.getVersion())
+        self.assertEqual(2, mapper.db.getVersion())
 
         # Intentionally keep gold.sqlite as version 0 to check
         # backward compatibility
@@ -146,12 +146,19 @@ class TestSqliteMapper(BaseTest):
         
         # Reading test
         mapper2 = SqliteMapper(fnGoldCopy, globals())
-        print "Checking that Relations table is updated and version to 1"
-        self.assertEqual(1, mapper2.db.getVersion())
+        print "Checking that Relations table is updated and version to 2"
+        self.assertEqual(2, mapper2.db.getVersion())
         # Check that the new column is properly added after updated to version 1
         colNamesGold += [u'object_parent_extended', u'object_child_extended']
         colNames = [col[1] for col in mapper2.db.getTableColumns('Relations')]
         self.assertEqual(colNamesGold, colNames)
+        # Check that the indexes were created when updated to version 2
+        mapper2.db.executeCommand("SELECT name FROM sqlite_master "
+                                  "WHERE type='index' AND name NOT LIKE "
+                                  "'sqlite_%'")
+        self.assertEqual(['Objects_name_index', 'Objects_parent_id_index',
+                          'Relations_parent_id_index'],
+                         sorted(r[0] for r in mapper2.db.cursor.fetchall()))
         
         l = mapper2.selectByClass('Integer')[0]
         self.assertEqual(l.get(), 1)
@@ -272,6 +279,73 @@ class TestSqliteMapper(BaseTest):
         self.assertTrue(Integer(3) in iList3)
 
         
+    def test_selectByAncestor(self):
+        """ Check that the childs are selected with the name index. """
+        fn = self.getOutputPath("ancestors.sqlite")
+        mapper = SqliteMapper(fn, globals())
+        complexList = [Complex.createComplex() for _ in range(12)]
+        for c in complexList:
+            mapper.insert(c)
+        mapper.commit()
+
+        db = mapper.db
+        prefix = complexList[0].getObjId()
+        whereStr, params = db._getPrefixWhere(str(prefix))
+        db.executeCommand('EXPLAIN QUERY PLAN ' + db.selectCmd(whereStr),
+                          params)
+        plan = [tuple(r) for r in db.cursor.fetchall()]
+        self.assertTrue('Objects_name_index' in str(plan))
+        # Only the childs of the first object and not the ones
+        # whose name starts with the same digit (i.e. 10, 11, 12)
+        rows = db.selectObjectsByAncestor(str(prefix))
+        self.assertEqual(['%s.imag' % prefix, '%s.real' % prefix],
+                         sorted(r['name'] for r in rows))
+
+        mapper.delete(complexList[0])
+        mapper.commit()
+        self.assertEqual([], db.selectObjectsByAncestor(str(prefix)))
+        self.assertEqual(2, len(db.selectObjectsByAncestor(
+            str(complexList[-1].getObjId()))))
+        mapper.close()
+
+
+    def test_storeOnlyChanges(self):
+        """ Check that only the modified rows are written when storing. """
+        fn = self.getOutputPath("changes.sqlite")
+        mapper = SqliteMapper(fn, globals())
+        iList = List()
+        for i in range(5):
+            iList.append(Integer(i))
+        c = Complex.createComplex()
+        mapper.insert(iList)
+        mapper.insert(c)
+        mapper.commit()
+
+        def countChanges(obj, mapper=mapper):
+            changes = mapper.db.connection.total_changes
+            mapper.store(obj)
+            mapper.commit()
+            return mapper.db.connection.total_changes - changes
+
+        self.assertEqual(0, countChanges(c))
+        c.imag.set(5.)
+        self.assertEqual(1, countChanges(c))
+        self.assertEqual(0, countChanges(iList))
+        iList.remove(Integer(3))
+        self.assertEqual(1, countChanges(iList))
+        mapper.close()
+
+        # Objects loaded from the db should not be written either
+        mapper2 = SqliteMapper(fn, globals())
+        c2 = mapper2.selectById(c.getObjId())
+        iList2 = mapper2.selectByClass('List')[0]
+        self.assertEqual(5., c2.imag.get())
+        self.assertEqual(4, len(iList2))
+        self.assertEqual(0, countChanges(c2, mapper2))
+        self.assertEqual(0, countChanges(iList2, mapper2))
+        mapper2.close()
+
+
 class TestSqliteFlatMapper(BaseTest):
     """ Some tests for DataSet implementation. """
     _labels = [SMALL]
@@ -377,6 +451,193 @@ class TestSqliteFlatMapper(BaseTest):
         items = [obj.clone() for obj in objSet]
         self.assertEqual(len(items), 0)
 
+    def test_appendMany(self):
+        dbName = self.getOutputPath('appendMany.sqlite')
+        print ">>> test appendMany: dbName = '%s'" % dbName
+        n = 2500
+        objSet = Set(filename=dbName, classesDict=globals())
+        objSet.appendMany((Complex(imag=i, real=2*i) for i in range(n)),
+                          flushSize=1000)
+        # All rows should be flushed when appendMany returns
+        self.assertEqual(n, objSet.getSize())
+        self.assertEqual(n, objSet._getMapper().count())
+        self.assertEqual(0, objSet._getMapper().getInsertBufferSize())
+        objSet.write()
+        objSet.close()
+
+        objSet = Set(filename=dbName, classesDict=globals())
+        self.assertEqual(n, objSet.getSize())
+        for i, c in enumerate(objSet):
+            self.assertEqual(i + 1, c.getObjId())
+            self.assertAlmostEqual(2 * i, c.real.get())
+        objSet.close()
+
+    def test_getColumns(self):
+        dbName = self.getOutputPath('columns.sqlite')
+        print ">>> test getColumns: dbName = '%s'" % dbName
+        objSet = Set(filename=dbName, classesDict=globals())
+        for i in range(10):
+            objSet.append(Complex(imag=i, real=2*i))
+        objSet.write()
+
+        columns = objSet.getColumns(['id', 'real'])
+        self.assertEqual(10, len(columns))
+        self.assertEqual(range(1, 11), columns['id'].tolist())
+        self.assertAlmostEqual(18., columns['real'][-1])
+
+        columns = objSet.getColumns(['id', 'imag'], where='real=4',
+                                    orderBy='imag', direction='DESC')
+        self.assertEqual([3], columns['id'].tolist())
+        self.assertAlmostEqual(2., columns['imag'][0])
+        objSet.close()
+
+    def test_indexes(self):
+        dbName = self.getOutputPath('indexes.sqlite')
+        print ">>> test indexes: dbName = '%s'" % dbName
+
+        class IndexedSet(Set):
+            INDEXES = ['imag', 'missing']
+
+        objSet = IndexedSet(filename=dbName, classesDict=globals())
+        for i in range(100):
+            objSet.append(Complex(imag=i % 10, real=i))
+        objSet.write()
+
+        db = objSet._getMapper().db
+        self.assertEqual(['imag'], db.getIndexedColumns())
+        # Check that the index is used when filtering by that column
+        db.executeCommand('EXPLAIN QUERY PLAN SELECT * FROM Objects WHERE %s'
+                          % db._getWhereStr('imag=3'))
+        self.assertTrue('INDEX' in str(tuple(db.cursor.fetchone())))
+
+        reals = [int(c.real.get())
+                 for c in objSet.iterItems(where='imag=3 AND real > 50')]
+        self.assertEqual([53, 63, 73, 83, 93], reals)
+        # Names inside string literals are not replaced by the columns
+        self.assertEqual("c01=3 AND c02 LIKE '%imag%' AND ''''='imag'",
+                         db._getWhereStr("imag=3 AND real LIKE '%imag%' "
+                                         "AND ''''='imag'"))
+        objSet.close()
+
+    def test_streamReader(self):
+        dbName = self.getOutputPath('stream.sqlite')
+        print ">>> test stream reader: dbName = '%s'" % dbName
+
+        class ComplexSet(Set):
+            def _loadClassesDict(self):
+                return globals()
+
+        def _append(*ids):
+            for i in ids:
+                objSet.append(Complex(objId=i, imag=i, real=i))
+            objSet.write()
+
+        def _read(expectedIds, expectedClosed=False):
+            items, closed = reader.read()
+            self.assertEqual(expectedIds, [c.getObjId() for c in items])
+            self.assertEqual(expectedClosed, closed)
+
+        objSet = ComplexSet(filename=dbName)
+        objSet.setStreamState(Set.STREAM_OPEN)
+        _append(1, 2, 4)
+
+        reader = SetStreamReader(ComplexSet, dbName)
+        _read([1, 2, 4])
+        _read([])
+        # Items with lower ids than the last read should not be missed
+        _append(3, 6)
+        _read([3, 6])
+        # Move the creation of the last items forward, as if they were
+        # appended in a later second
+        _append(5, 8)
+        objSet._getMapper().db.executeCommand(
+            "UPDATE Objects SET creation=datetime(creation, '+1 second') "
+            "WHERE id IN (5, 8)")
+        objSet.write()
+        _read([5, 8])
+        objSet.setStreamState(Set.STREAM_CLOSED)
+        objSet.write()
+        _read([], expectedClosed=True)
+
+        # Read only some columns of the new items, without building them
+        colReader = SetStreamReader(ComplexSet, dbName)
+        rows, closed = colReader.readColumns(['imag'])
+        self.assertEqual([1, 2, 3, 4, 5, 6, 8], [r['id'] for r in rows])
+        self.assertEqual([1, 2, 3, 4, 5, 6, 8], [r['imag'] for r in rows])
+        self.assertTrue(closed)
+        _append(9)
+        objSet._getMapper().db.executeCommand(
+            "UPDATE Objects SET creation=datetime(creation, '+2 second') "
+            "WHERE id=9")
+        objSet.write()
+        rows, _ = colReader.readColumns(['imag'])
+        self.assertEqual([9], [r['id'] for r in rows])
+        objSet.close()
+
+        # Check that the creation index is used to filter the new items
+        db = SqliteDb()
+        db._createConnection(dbName, 30)
+        db.executeCommand("EXPLAIN QUERY PLAN SELECT * FROM Objects "
+                          "WHERE creation >= '2000-01-01'")
+        self.assertTrue('Objects_creation_index' in
+                        str(tuple(db.cursor.fetchone())))
+        db.close()
+
+    def test_appendFromSets(self):
+        """ Check set operations done directly in the database. """
+        class ComplexSet(Set):
+            def _loadClassesDict(self):
+                return globals()
+
+        def _createSet(name, ids):
+            fn = self.getOutputPath(name)
+            pwutils.cleanPath(fn)
+            s = ComplexSet(filename=fn)
+            for i in ids:
+                s.append(Complex(objId=i, imag=i, real=-i))
+            s.write()
+            return s
+
+        def _checkSet(s, ids, real=None):
+            s.write()
+            self.assertEqual(len(ids), s.getSize())
+            self.assertEqual(ids, [c.getObjId() for c in s])
+            self.assertEqual(real or [-i for i in ids],
+                             [c.real.get() for c in s])
+
+        set1 = _createSet('ops1.sqlite', [1, 2, 3, 4])
+        set2 = _createSet('ops2.sqlite', [3, 4, 5])
+
+        union = _createSet('union.sqlite', [])
+        self.assertTrue(union.appendFromSets([set1, set2], renumber=True))
+        _checkSet(union, range(1, 8), [-1, -2, -3, -4, -3, -4, -5])
+
+        inter = _createSet('inter.sqlite', [])
+        self.assertTrue(inter.appendFromSets([set1], filterSet=set2))
+        _checkSet(inter, [3, 4])
+
+        diff = _createSet('diff.sqlite', [])
+        self.assertTrue(diff.appendFromSets([set1], filterSet=set2,
+                                            exclude=True))
+        _checkSet(diff, [1, 2])
+        # Items can be appended as usual after that
+        diff.enableAppend()
+        diff.append(Complex(imag=10., real=-10.))
+        _checkSet(diff, [1, 2, 3], [-1, -2, -10])
+
+        subset = _createSet('subset.sqlite', [])
+        self.assertTrue(subset.appendFromSets([set1, set2], ids=[2, 5]))
+        _checkSet(subset, [2, 5])
+
+        # Sets storing different attributes can not be copied
+        other = _createSet('ops3.sqlite', [])
+        c = Complex(objId=1)
+        c.extra = Integer(1)
+        other.append(c)
+        other.write()
+        self.assertFalse(subset.appendFromSets([other]))
+        _checkSet(subset, [2, 5])
+
 
 class TestXmlMapper(BaseTest):
     
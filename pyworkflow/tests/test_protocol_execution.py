@@ -29,8 +29,12 @@ from pyworkflow.em import *
 from tests import *
 from pyworkflow.mapper import SqliteMapper
 from pyworkflow.utils import dateStr
-from pyworkflow.protocol.constants import MODE_RESUME, STATUS_FINISHED
-from pyworkflow.protocol.executor import StepExecutor
+import pyworkflow.utils as pwutils
+from pyworkflow.protocol.constants import (MODE_RESUME, STATUS_FINISHED,
+                                           STATUS_NEW)
+from pyworkflow.protocol.executor import (StepExecutor, ThreadStepExecutor,
+                                          ProcessStepExecutor)
+from pyworkflow.protocol.protocol import FunctionStep, StepSet
 
     
 #Protocol for tests, runs in resume mode, and sleeps for??
@@ -57,6 +61,107 @@ class MyProtocol(Protocol):
             self._insertFunctionStep('sleepStep', i+1, 'sleeping %d'%i)
             
             
+class MyManyStepsProtocol(MyProtocol):
+    def countStep(self, i):
+        pass
+
+    def _insertAllSteps(self):
+        for i in range(self.numberOfSleeps.get()):
+            self._insertFunctionStep('countStep', i)
+
+
+class MyStoredStepsProtocol(MyManyStepsProtocol):
+    """ Check from its steps how many steps are already written
+    as finished in the steps.sqlite file. """
+    def countStoredStep(self, wait):
+        time.sleep(wait)
+        stepsSet = StepSet(filename=self.getStepsFile())
+        self.storedFinished.append(len([s for s in stepsSet
+                                        if s.isFinished()]))
+        stepsSet.close()
+
+    def _insertAllSteps(self):
+        self.storedFinished = []
+        n = self.numberOfSleeps.get()
+        for i in range(n):
+            self._insertFunctionStep('countStep', i)
+        self._insertFunctionStep('countStoredStep', self.wait,
+                                 prerequisites=range(1, n + 1))
+
+    def _stepsCheck(self):
+        pass  # overriding it should not skip the steps writing
+
+
+class MyProcessStepsProtocol(MyProtocol):
+    """ Compute some values in child processes and create the
+    output from the parent process. """
+    def setupStep(self):
+        # The workers are forked before this step, so the value
+        # is passed through a file instead of a protocol attribute
+        f = open(self._getExtraPath('factor.txt'), 'w')
+        f.write('3')
+        f.close()
+
+    def computeStep(self, i):
+        fn = self._getExtraPath('value_%02d.txt' % i)
+        if i < 0:
+            raise Exception('Negative value %d' % i)
+        factor = int(open(self._getExtraPath('factor.txt')).read())
+        f = open(fn, 'w')
+        f.write('%d %d' % (i * factor, os.getpid()))
+        f.close()
+        return [fn]
+
+    def createOutputStep(self):
+        self.values = []
+        self.pids = set()
+        for i in range(self.numberOfSleeps.get()):
+            f = open(self._getExtraPath('value_%02d.txt' % i))
+            value, pid = map(int, f.read().split())
+            f.close()
+            self.values.append(value)
+            self.pids.add(pid)
+        self.outputPid = os.getpid()
+
+    def _insertAllSteps(self):
+        setupId = self._insertFunctionStep('setupStep')
+        n = self.numberOfSleeps.get()
+        for i in range(n):
+            self._insertFunctionStep('computeStep', i, processStep=True,
+                                     prerequisites=[setupId])
+        self._insertFunctionStep('createOutputStep',
+                                 prerequisites=range(2, n + 2))
+
+
+class MyCTFProtocol(ProtCTFMicrographs):
+    """ Estimate the CTF of some fake micrographs, only writing the
+    done marker of each one. """
+    def __init__(self, **args):
+        ProtCTFMicrographs.__init__(self, **args)
+        self.numberOfMics = args.get('n', 1)
+
+    def _estimateCTF(self, micFn, micDir, micName):
+        pwutils.makePath(micDir)
+        self._writeMicrographDone(micDir)
+
+    def _insertAllSteps(self):
+        self.micDict = OrderedDict()
+        for i in range(self.numberOfMics):
+            mic = Micrograph(location='mic%02d.mrc' % (i + 1))
+            mic.setObjId(i + 1)
+            micKey = mic.getMicName()
+            self._insertFunctionStep('_estimateCTF', mic.getFileName(),
+                                     self._getMicrographDir(mic), micKey,
+                                     prerequisites=[])
+            self.micDict[micKey] = mic
+
+    def _stepsCheck(self):
+        pass
+
+    def validate(self):
+        return []  # there are no input micrographs
+
+
 class MyParallelProtocol(MyProtocol):
     def _insertAllSteps(self):
         step1 = self._insertFunctionStep('sleepStep', 1, '1')
@@ -87,3 +192,270 @@ class TestProtocolExecution(BaseTest):
         prot2 = mapper2.selectById(prot.getObjId())
         
         self.assertEqual(prot.endTime.get(), prot2.endTime.get())
+
+    def test_StepsJournal(self):
+        """ Check that all steps changes are written at the end, even
+        if they are written in batches while running. """
+        fn = self.getOutputPath("protocol_journal.sqlite")
+        mapper = SqliteMapper(fn, globals())
+        prot = MyManyStepsProtocol(mapper=mapper, n=25,
+                                   workingDir=self.getOutputPath('journal'))
+        prot.STEPS_JOURNAL_SIZE = 10
+        prot.STEPS_JOURNAL_INTERVAL = 60
+        prot.makePathsAndClean()
+        prot._stepsExecutor = StepExecutor(hostConfig=None)
+        prot.run()
+
+        steps = prot.loadSteps()
+        self.assertEqual(25, len(steps))
+        self.assertTrue(all(step.isFinished() for step in steps))
+
+        mapper2 = SqliteMapper(fn, globals())
+        prot2 = mapper2.selectById(prot.getObjId())
+        self.assertEqual(25, prot2.stepsDone)
+
+    def test_StepsJournalFlush(self):
+        """ Check that finished steps are written while a long step is
+        running, even with a big steps journal. """
+        for parallel in [False, True]:
+            fn = self.getOutputPath("protocol_flush%d.sqlite" % parallel)
+            mapper = SqliteMapper(fn, globals())
+            prot = MyStoredStepsProtocol(
+                mapper=mapper, n=5,
+                workingDir=self.getOutputPath('flush%d' % parallel))
+            prot.STEPS_JOURNAL_SIZE = 100
+            prot.STEPS_JOURNAL_INTERVAL = 2
+            prot.makePathsAndClean()
+            if parallel:
+                # written from the periodic steps check (every 3 secs)
+                prot.wait = 4
+                prot._stepsExecutor = ThreadStepExecutor(hostConfig=None,
+                                                         nThreads=2)
+            else:
+                # written when the step starts
+                prot.wait = 0
+                prot._stepsExecutor = StepExecutor(hostConfig=None)
+            prot.run()
+            self.assertEqual([5], prot.storedFinished)
+
+    def test_updateSteps(self):
+        """ Check that steps added later (as in streaming) are stored
+        together with the changes in the prerequisites. """
+        prot = MyManyStepsProtocol(n=5,
+                                   workingDir=self.getOutputPath('update'))
+        prot.makePathsAndClean()
+        prot._insertAllSteps()
+        prot._storeSteps()
+        stepsSet = prot._stepsSet
+
+        finalStep = prot._steps[-1]
+        for i in range(3):
+            prot._insertFunctionStep('countStep', 5 + i)
+            finalStep.addPrerequisites(len(prot._steps))
+            prot.updateSteps()
+
+        self.assertIs(stepsSet, prot._stepsSet)
+        steps = prot.loadSteps()
+        self.assertEqual(8, len(steps))
+        self.assertEqual(range(1, 9), [step.getObjId() for step in steps])
+        self.assertEqual(['4', '6', '7', '8'], list(steps[4]._prerequisites))
+        self.assertEqual(8, prot.numberOfSteps)
+
+    def test_ThreadStepExecutor(self):
+        """ Check that steps added or released from the stepsCheck
+        callback are also executed. """
+        steps = []
+        done = []
+
+        def addStep(name, prerequisites, wait=False):
+            step = FunctionStep(lambda: done.append(name), name, wait=wait)
+            step.addPrerequisites(*prerequisites)
+            steps.append(step)
+            step.setIndex(len(steps))
+            return step
+
+        addStep('first', [])
+        for i in range(10):
+            addStep('step%02d' % i, [1])
+        finalStep = addStep('final', range(2, 12), wait=True)
+        checks = []
+
+        def stepsCheck():
+            checks.append(len(checks))
+            if len(checks) == 1:  # insert some new steps, as in streaming
+                for i in range(5):
+                    newStep = addStep('new%02d' % i, [1])
+                    finalStep.addPrerequisites(newStep.getIndex())
+            elif len(checks) == 2:  # release the waiting step
+                finalStep.setStatus(STATUS_NEW)
+
+        executor = ThreadStepExecutor(hostConfig=None, nThreads=3)
+        executor.runSteps(steps, lambda step: None, lambda step: True,
+                          stepsCheck, stepsCheckSecs=0.1)
+
+        self.assertTrue(all(step.isFinished() for step in steps))
+        self.assertEqual(len(steps), len(done))
+        self.assertEqual('first', done[0])
+        self.assertEqual('final', done[-1])
+
+    def test_ProcessStepExecutor(self):
+        """ Check that only the steps marked as processStep are run
+        in the pool of processes and that the outputs are kept. """
+        fn = self.getOutputPath("protocol_process.sqlite")
+        mapper = SqliteMapper(fn, globals())
+        prot = MyProcessStepsProtocol(mapper=mapper, n=4,
+                                      workingDir=self.getOutputPath('process'))
+        prot.makePathsAndClean()
+        prot._stepsExecutor = ProcessStepExecutor(hostConfig=None,
+                                                  nThreads=2, protocol=prot)
+        prot.run()
+
+        steps = prot.loadSteps()
+        self.assertTrue(all(step.isFinished() for step in steps))
+        self.assertEqual([0, 3, 6, 9], prot.values)
+        self.assertEqual(os.getpid(), prot.outputPid)
+        self.assertFalse(os.getpid() in prot.pids)
+        # Result files returned by the worker processes are stored
+        self.assertTrue(steps[1]._resultFiles.hasValue())
+        self.assertTrue(steps[1]._postconditions())
+
+        # Errors in the worker process are reported in the step
+        prot2 = MyProcessStepsProtocol(mapper=mapper, n=1,
+                                       workingDir=self.getOutputPath('process2'))
+        prot2.makePathsAndClean()
+        prot2._stepsExecutor = ProcessStepExecutor(hostConfig=None,
+                                                   nThreads=2, protocol=prot2)
+        prot2._insertAllSteps = lambda: prot2._insertFunctionStep(
+            'computeStep', -1, processStep=True)
+        prot2.run()
+        step = prot2.loadSteps()[0]
+        self.assertTrue(step.isFailed())
+        self.assertEqual('Negative value -1', step.getErrorMessage())
+
+    def test_CTFSteps(self):
+        """ Check that all CTF estimation steps are executed and the
+        micrographs are found as done. """
+        for parallel in [False, True]:
+            fn = self.getOutputPath("protocol_ctf%d.sqlite" % parallel)
+            mapper = SqliteMapper(fn, globals())
+            prot = MyCTFProtocol(mapper=mapper, n=3,
+                                 workingDir=self.getOutputPath('ctf%d'
+                                                               % parallel))
+            prot.makePathsAndClean()
+            if parallel:
+                prot._stepsExecutor = ThreadStepExecutor(hostConfig=None,
+                                                         nThreads=2)
+            else:
+                prot._stepsExecutor = StepExecutor(hostConfig=None)
+            prot.run()
+
+            steps = prot.loadSteps()
+            self.assertEqual(3, len(steps))
+            self.assertTrue(all(step.isFinished() for step in steps))
+            prot._readDoneList()
+            self.assertTrue(all(prot._isMicDone(mic)
+                                for mic in prot.micDict.values()))
+
+        # A micrograph done by other steps is found from its marker file,
+        # also after it was checked before being done
+        mic = Micrograph(location='mic99.mrc')
+        mic.setObjId(99)
+        micDir = prot._getMicrographDir(mic)
+        self.assertFalse(prot._isMicDone(mic))
+        pwutils.makePath(micDir)
+        prot._writeMicrographDone(micDir)
+        self.assertFalse(prot._isMicDone(mic))  # not checked again yet
+        prot.MARKER_CHECK_SECS = 0
+        self.assertTrue(prot._isMicDone(mic))
+
+
+class TestProjectScheduler(BaseTest):
+    """ Check the selection of the scheduled runs and the pid file
+    used to have a single scheduler per project. """
+
+    @classmethod
+    def setUpClass(cls):
+        setupTestOutput(cls)
+
+    def test_scheduledRuns(self):
+        from pyworkflow.protocol.constants import (STATUS_SCHEDULED,
+                                                   STATUS_RUNNING)
+        from pyworkflow.apps.pw_schedule_project import (getScheduledRuns,
+                                                         isRunScheduled)
+        fn = self.getOutputPath("scheduled.sqlite")
+        pwutils.cleanPath(fn)
+        self.assertEqual({}, getScheduledRuns(fn))
+        self.assertFalse(isRunScheduled(fn, 1))
+
+        mapper = SqliteMapper(fn, globals())
+        prots = []
+        for i, status in enumerate([STATUS_SCHEDULED, STATUS_RUNNING,
+                                    STATUS_SCHEDULED, STATUS_FINISHED]):
+            prot = MyProtocol(workingDir='Runs/%06d_MyProtocol' % i)
+            prot.setStatus(status)
+            mapper.insert(prot)
+            prots.append(prot)
+        mapper.commit()
+
+        scheduled = [prots[0], prots[2]]
+        self.assertEqual(dict((p.getObjId(), p.getWorkingDir())
+                              for p in scheduled), getScheduledRuns(fn))
+
+        for prot in prots:
+            self.assertEqual(prot in scheduled,
+                             isRunScheduled(fn, prot.getObjId()))
+
+    def test_schedulerPid(self):
+        import subprocess
+        from pyworkflow.protocol.launch import (getSchedulerPidFile,
+                                                getSchedulerPid)
+        from pyworkflow.apps.pw_schedule_project import ProjectScheduler
+
+        projPath = self.getOutputPath('scheduler_project')
+        pidFile = getSchedulerPidFile(projPath)
+        pwutils.cleanPath(projPath)
+        pwutils.makeFilePath(pidFile)
+
+        def writePid(pid):
+            with open(pidFile, 'w') as f:
+                f.write(str(pid))
+
+        # Without pid file there is no scheduler running
+        self.assertIsNone(getSchedulerPid(projPath))
+
+        # Live process
+        writePid(os.getpid())
+        self.assertEqual(os.getpid(), getSchedulerPid(projPath))
+
+        # Stale pid file from a process that is not running anymore
+        p = subprocess.Popen(['true'])
+        p.wait()
+        writePid(p.pid)
+        self.assertIsNone(getSchedulerPid(projPath))
+
+        # Empty file: the scheduler is starting, unless it is old
+        writePid('')
+        self.assertEqual(0, getSchedulerPid(projPath))
+        old = time.time() - 60
+        os.utime(pidFile, (old, old))
+        self.assertIsNone(getSchedulerPid(projPath))
+
+        # A new scheduler replaces a stale pid file...
+        scheduler = ProjectScheduler()
+        scheduler.projPath = projPath
+        writePid(p.pid)
+        self.assertTrue(scheduler._acquirePidFile())
+        self.assertEqual(os.getpid(), getSchedulerPid(projPath))
+        scheduler._releasePidFile()
+        self.assertFalse(os.path.exists(pidFile))
+
+        # ...but not the one of a running scheduler
+        other = subprocess.Popen(['sleep', '10'])
+        try:
+            writePid(other.pid)
+            self.assertFalse(scheduler._acquirePidFile())
+            scheduler._releasePidFile()  # not owned, should be kept
+            self.assertEqual(other.pid, getSchedulerPid(projPath))
+        finally:
+            other.kill()
+            other.wait()
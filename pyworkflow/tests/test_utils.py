@@ -97,5 +97,205 @@ class TestGetListFromRangeString(BaseTest):
             self.assertEqual(o, pwutils.getListFromRangeString(s2))
 
 
+class TestMpiWait(BaseTest):
+    """ Check the polling of non-blocking requests in utils.mpi module. """
+
+    class FakeRequest():
+        """ Request that is completed after some time. """
+        def __init__(self, delay, result=0):
+            self.t0 = time.time()
+            self.delay = delay
+            self.result = result
+
+        def test(self):
+            if time.time() - self.t0 >= self.delay:
+                return True, self.result
+            return False, None
+
+    def test_wait(self):
+        from pyworkflow.utils.mpi import wait
+
+        t0 = time.time()
+        self.assertEqual((True, 'done'), wait(self.FakeRequest(0.01, 'done')))
+        # Short requests should not wait the whole MAX_SLEEP
+        self.assertTrue(time.time() - t0 < 0.1)
+
+        done, result = wait(self.FakeRequest(5), timeout=0.2)
+        self.assertFalse(done)
+
+
+class TestIdJournal(BaseTest):
+    """ Check the incremental reading of ids in utils.journal module. """
+
+    @classmethod
+    def setUpClass(cls):
+        setupTestOutput(cls)
+
+    def test_journal(self):
+        from pyworkflow.utils.journal import IdJournal
+
+        fn = self.getOutputPath('journal', 'done.TXT')
+        pwutils.cleanPath(fn)
+        journal = IdJournal(fn)
+        self.assertEqual([], journal.update())
+
+        journal.append(1, 2, 3)
+        self.assertEqual(0, len(journal))  # not read until update
+        self.assertEqual([1, 2, 3], journal.update())
+        self.assertTrue(2 in journal)
+
+        # Incomplete lines (still being written) are read later
+        with open(fn, 'a') as f:
+            f.write('4\n5')
+        self.assertEqual([4], journal.update())
+        with open(fn, 'a') as f:
+            f.write('0\n3\n')
+        self.assertEqual([50], journal.update())
+        self.assertEqual(5, len(journal))
+
+        # Other journal on the same file reads all ids at once
+        self.assertEqual([1, 2, 3, 4, 50], IdJournal(fn).update())
+
+
+class TestFileWatcher(BaseTest):
+    """ Check that utils.watcher finds the same files as glob. """
+
+    @classmethod
+    def setUpClass(cls):
+        setupTestOutput(cls)
+
+    def test_watcher(self):
+        from glob import glob
+        from pyworkflow.utils.watcher import FileWatcher
+
+        root = self.getOutputPath('watcher')
+        pwutils.cleanPath(root)
+
+        def touch(*paths):
+            for p in paths:
+                fn = join(root, p)
+                pwutils.makePath(os.path.dirname(fn))
+                open(fn, 'w').close()
+
+        touch('a/s1/m1.tif', 'a/s1/m2.tif', 'a/s1/.m.tif', 'a/s2/m.txt',
+              'b/s1/m3.tif')
+        pattern = join(root, '*', 's?', '*.tif')
+        watcher = FileWatcher(pattern)
+        watcher.MTIME_RESOLUTION = 0
+
+        def checkFiles(scanned, new):
+            self.assertEqual(sorted(glob(pattern)), watcher.update())
+            self.assertEqual((scanned, new),
+                             (watcher.lastScanned, watcher.lastNew))
+
+        checkFiles(6, 3)
+        checkFiles(0, 0)  # nothing changed, nothing listed
+        time.sleep(1.1)  # let the folder modification time change
+        touch('a/s2/m4.tif', 'c/s3/m5.tif')
+        checkFiles(2, 2)
+        time.sleep(1.1)
+        pwutils.cleanPath(join(root, 'b'))
+        checkFiles(1, 0)
+
+
+class TestMatrixValue(BaseTest):
+    """ Check the storage of matrices as JSON text or binary values. """
+
+    def test_matrixValue(self):
+        import numpy as np
+        m = np.arange(16, dtype=float).reshape(4, 4) / 4.
+
+        for storage in [pwutils.MATRIX_JSON, pwutils.MATRIX_FLOAT64,
+                        pwutils.MATRIX_FLOAT32]:
+            value = pwutils.matrixToValue(m, storage)
+            m2 = pwutils.matrixFromValue(value)
+            self.assertEqual(np.float64, m2.dtype)
+            self.assertTrue(np.allclose(m, m2))
+
+        self.assertEqual(64, len(pwutils.matrixToValue(m, 'float32')))
+        self.assertEqual(128, len(pwutils.matrixToValue(m, 'float64')))
+
+
+class TestCloneFile(BaseTest):
+    """ Check cloneFile and the ordered import of files with a pool. """
+
+    @classmethod
+    def setUpClass(cls):
+        setupTestOutput(cls)
+
+    def _createFile(self, fn, size):
+        with open(fn, 'wb') as f:
+            f.write(os.urandom(size))
+
+    def _readFile(self, fn):
+        with open(fn, 'rb') as f:
+            return f.read()
+
+    def test_cloneFile(self):
+        import subprocess
+
+        src = self.getOutputPath('clone_src.bin')
+        self._createFile(src, 100000)
+
+        dst = self.getOutputPath('clone_dst.bin')
+        pwutils.cleanPath(dst)
+        pwutils.cloneFile(src, dst)
+        self.assertEqual(self._readFile(src), self._readFile(dst))
+
+        # Check the fallback to a normal copy when the reflink copy
+        # fails or 'cp' is not available
+        def failedCall(*args, **kwargs):
+            return 1
+
+        def missingCall(*args, **kwargs):
+            raise OSError("No such file or directory")
+
+        call = subprocess.call
+        try:
+            for fakeCall in [failedCall, missingCall]:
+                subprocess.call = fakeCall
+                pwutils.cleanPath(dst)
+                pwutils.cloneFile(src, dst)
+                self.assertEqual(self._readFile(src), self._readFile(dst))
+        finally:
+            subprocess.call = call
+
+    def test_importFilesOrder(self):
+        """ Files should be returned in the input order, even
+        when the pool workers finish in a different order.
+        """
+        from multiprocessing.pool import ThreadPool
+        from pyworkflow.em.protocol.protocol_import.images import \
+            _iterImportFiles
+
+        n = 8
+        newFiles = []
+        for i in range(n):
+            src = self.getOutputPath('import_src_%02d.bin' % i)
+            self._createFile(src, 1000 * (i + 1))
+            dst = self.getOutputPath('import_dst_%02d.bin' % i)
+            pwutils.cleanPath(dst)
+            newFiles.append((src, os.path.basename(src), i + 1, dst))
+
+        finished = []
+
+        def slowCopy(src, dst):
+            # first files are the slowest ones
+            i = int(src[-6:-4])
+            time.sleep(0.05 * (n - i))
+            pwutils.copyFile(src, dst)
+            finished.append(i)
+
+        pool = ThreadPool(n)
+        result = list(_iterImportFiles(pool, slowCopy, newFiles, False))
+        pool.close()
+        pool.join()
+
+        self.assertNotEqual(range(n), finished)
+        self.assertEqual(newFiles, [newFile for newFile, _ in result])
+        self.assertEqual([(1, 1000 * (i + 1)) for i in range(n)],
+                         [info for _, info in result])
+
+
 if __name__ == '__main__':
     unittest.main()        
@@ -0,0 +1,96 @@
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+Journal files to keep track of the items (e.g. micrographs or movies)
+that are done or failed while processing in streaming.
+"""
+
+import os
+import threading
+
+
+class IdJournal():
+    """ Keep a set with the ids written (one per line) to a text file.
+    Ids are appended to the file as the items are processed and
+    update() only reads the lines added since the previous call, so
+    there is no need to re-read the whole file or to check a marker
+    file for each item.
+    """
+    def __init__(self, filename):
+        self._filename = filename
+        self._offset = 0  # position of the file already read
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def getFileName(self):
+        return self._filename
+
+    def update(self):
+        """ Read the ids appended to the file since the last update.
+        Returns the list of new ids.
+        """
+        with self._lock:
+            if not os.path.exists(self._filename):
+                return []
+
+            with open(self._filename) as f:
+                f.seek(self._offset)
+                data = f.read()
+
+            # Only read complete lines, the last one could be in the
+            # middle of being written by other process
+            end = data.rfind('\n') + 1
+            self._offset += end
+            newIds = []
+
+            for line in data[:end].split():
+                itemId = int(line)
+                if itemId not in self._ids:
+                    self._ids.add(itemId)
+                    newIds.append(itemId)
+
+            return newIds
+
+    def append(self, *ids):
+        """ Write the given ids to the file. They will be read (also by
+        this journal) in the next call to update().
+        """
+        if ids:
+            with self._lock:
+                dirname = os.path.dirname(self._filename)
+                if dirname and not os.path.exists(dirname):
+                    os.makedirs(dirname)
+                with open(self._filename, 'a') as f:
+                    f.write(''.join('%d\n' % i for i in ids))
+
+    def __contains__(self, itemId):
+        return itemId in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
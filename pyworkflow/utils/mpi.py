@@ -37,11 +37,40 @@ from pyworkflow.utils.utils import envVarOn, getLocalHostName, formatExceptionIn
 
 TIMEOUT = 60  # seconds trying to send/receive data through a socket
 
+# Polling of the non-blocking requests starts sleeping MIN_SLEEP seconds
+# and doubles the time in each try, up to MAX_SLEEP seconds
+MIN_SLEEP = 0.001
+MAX_SLEEP = 0.1
+
 TAG_RUN_JOB = 1000
 
 
+def wait(request, timeout=None):
+    """ Wait for a non-blocking request (from isend or irecv) to complete,
+    without using the cpu while waiting. The time between checks grows
+    exponentially, so requests that are completed quickly (the usual case)
+    are not delayed by a long sleep.
+    Returns:
+        (done, result), done will be False if the timeout is reached.
+    """
+    t0 = time()
+    delay = MIN_SLEEP
+
+    while True:
+        done, result = request.test()
+        if done:
+            return done, result
+        if timeout is not None and time() - t0 > timeout:
+            return False, None
+        sleep(delay)
+        delay = min(delay * 2, MAX_SLEEP)
+
+
 def send(command, comm, dest, tag):
-    """ Send command in a non-blocking way and raise exception on error. """
+    """ Send command in a non-blocking way and raise exception on error.
+    Returns the time (in seconds) until the command was sent (the isend
+    request completed), the wait for the slave result is not included.
+    """
 
     # This function blocks, but it uses the isend() function (which is
     # nonblocking) and sleeps without using the cpu while we try to send.
@@ -53,39 +82,45 @@ def send(command, comm, dest, tag):
         print "Sending command to %d: %s" % (dest, command)
 
     # Send command with isend()
-    req_send = comm.isend(command, dest=dest, tag=tag)
     t0 = time()
-    while not req_send.test()[0]:
-        sleep(1)
-        if time() - t0 > TIMEOUT:
-            raise Exception("Timeout in process %d, cannot send command "
-                            "to slave." % os.getpid())
+    req_send = comm.isend(command, dest=dest, tag=tag)
+    if not wait(req_send, TIMEOUT)[0]:
+        raise Exception("Timeout in process %d, cannot send command "
+                        "to slave." % os.getpid())
+    sendTime = time() - t0
 
     # Receive the result in a non-blocking way too (with irecv())
     req_recv = comm.irecv(source=dest, tag=tag)
-    while True:
-        done, result = req_recv.test()
-        if done:
-            break
-        sleep(1)
+    result = wait(req_recv)[1]
 
     if result != 0:  # result will then be a string with the error
         raise Exception(str(result))
 
+    return sendTime
+
 
 def runJobMPI(programname, params, mpiComm, mpiDest,
               numberOfMpi=1, hostConfig=None,
               env=None, cwd=None, gpuList=None):
-    """ Send the command to the MPI node in which it will be executed. """
+    """ Send the command to the MPI node in which it will be executed.
+    Returns the time (in seconds) spent sending the job to the node: the
+    cwd and env messages (until the slave replies to them) plus the time
+    to send the command. The job execution is not included.
+    """
 
     command = buildRunCommand(programname, params, numberOfMpi, hostConfig,
                               env, gpuList=gpuList)
+    t0 = time()
     if cwd is not None:
         send("cwd=%s" % cwd, mpiComm, mpiDest, TAG_RUN_JOB+mpiDest)
     if env is not None:
         send("env=%s" % dumps(env), mpiComm, mpiDest, TAG_RUN_JOB+mpiDest)
+    # The send time of the command does not include its execution
+    sendTime = time() - t0
+    sendTime += send(command, mpiComm, mpiDest, TAG_RUN_JOB+mpiDest)
+    print "Job sent to %d in %0.3f seconds" % (mpiDest, sendTime)
 
-    send(command, mpiComm, mpiDest, TAG_RUN_JOB+mpiDest)
+    return sendTime
 
 
 def runJobMPISlave(mpiComm):
@@ -106,11 +141,7 @@ def runJobMPISlave(mpiComm):
     while True:
         # Receive command in a non-blocking way
         req_recv = mpiComm.irecv(source=0, tag=TAG_RUN_JOB+rank)
-        while True:
-            done, command = req_recv.test()
-            if done:
-                break
-            sleep(1)
+        command = wait(req_recv)[1]
 
         print "Slave %s(rank %d) received command." % (hostname, rank)
         if command == 'None':
@@ -139,9 +170,5 @@ def runJobMPISlave(mpiComm):
 
         # Communicate to master, either error os success
         req_send = mpiComm.isend(exitResult, dest=0, tag=TAG_RUN_JOB+rank)
-        t0 = time()
-        while not req_send.test()[0]:
-            sleep(1)
-            if time() - t0 > TIMEOUT:
-                print (msg % os.getpid())
-                break
+        if not wait(req_send, TIMEOUT)[0]:
+            print (msg % os.getpid())
@@ -725,4 +725,34 @@ def getEnvVariable(variableName, default=None, exceptionMsg=None):
         else:
             return  default
     else:
-        return value
\ No newline at end of file
+        return value
+
+
+# Storage formats of 4x4 matrices in the databases (see matrixToValue)
+MATRIX_JSON = 'json'
+MATRIX_FLOAT64 = 'float64'
+MATRIX_FLOAT32 = 'float32'
+
+
+def matrixToValue(matrix, storage=MATRIX_JSON):
+    """ Return the value to store a numpy matrix in the database.
+    With MATRIX_JSON the matrix is stored as a JSON text list, otherwise
+    as a binary buffer (sqlite BLOB) with the raw values of the given
+    float type, which is smaller and much faster to write and read.
+    """
+    if storage == MATRIX_JSON:
+        import json
+        return json.dumps(matrix.tolist())
+    return buffer(np.ascontiguousarray(matrix, dtype=storage).tostring())
+
+
+def matrixFromValue(value, shape=(4, 4)):
+    """ Build a numpy matrix from a value stored in the database, either a
+    JSON text or a binary buffer with float64 or float32 values.
+    """
+    if isinstance(value, basestring):
+        import json
+        return np.array(json.loads(value))
+    n = shape[0] * shape[1]
+    dtype = np.float64 if len(value) == n * 8 else np.float32
+    return np.frombuffer(value, dtype=dtype).reshape(shape).astype(np.float64)
@@ -0,0 +1,238 @@
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+"""
+Incremental discovery of the files matching a glob pattern, used when
+importing data in streaming. Instead of listing the whole tree in every
+check, the content of each directory is kept between checks and only
+the directories that have been modified are listed again.
+"""
+
+import os
+import time
+from fnmatch import fnmatch
+from glob import has_magic
+
+
+class FileWatcher():
+    """ Keep the list of files matching a glob pattern up to date.
+    Each call to update() only lists again the directories whose
+    modification time has changed since they were listed (or those
+    notified by inotify if pyinotify is available). The result is the
+    same as a sorted glob(pattern).
+    """
+    # Number of update() calls between full checks of the directories
+    # modification times when using inotify (inotify does not notify
+    # changes done in other hosts of network file systems)
+    SCAN_EVERY = 10
+    # Directories modified less than these seconds before being listed
+    # will be listed again, since more files could be added in the
+    # same second and the modification time will not change.
+    MTIME_RESOLUTION = 2
+
+    def __init__(self, pattern, useInotify=True):
+        self._pattern = pattern
+        parts = pattern.split(os.sep)
+        # Leading path without wildcards is the root of the search
+        i = 0
+        while i < len(parts) - 1 and not has_magic(parts[i]):
+            i += 1
+        self._rootDir = os.sep.join(parts[:i])
+        if pattern.startswith(os.sep) and not self._rootDir:
+            self._rootDir = os.sep
+        self._parts = parts[i:]
+        # Keep for each directory its depth, the modification time when
+        # it was listed and the matching files and sub-directories
+        self._dirs = {}
+        self._files = []
+        self._counter = 0
+        self._notifier = None
+        self._changedDirs = set()
+        self.lastTime = 0  # duration of the last update in seconds
+        self.lastScanned = 0  # directories listed in the last update
+        self.lastNew = 0  # number of new files in the last update
+
+        if useInotify:
+            self._initInotify()
+
+    def getPattern(self):
+        return self._pattern
+
+    def _initInotify(self):
+        """ Use inotify to get which directories changed, if available. """
+        try:
+            import pyinotify
+        except ImportError:
+            return
+
+        changedDirs = self._changedDirs
+
+        class Handler(pyinotify.ProcessEvent):
+            def process_default(self, event):
+                changedDirs.add(event.path)
+
+        self._inotifyMask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE |
+                             pyinotify.IN_MOVED_TO | pyinotify.IN_MOVED_FROM |
+                             pyinotify.IN_CLOSE_WRITE)
+        self._wm = pyinotify.WatchManager()
+        self._notifier = pyinotify.Notifier(self._wm, Handler(), timeout=0)
+
+    def _watch(self, dirPath):
+        if self._notifier is not None:
+            self._wm.add_watch(dirPath, self._inotifyMask, quiet=True)
+
+    def _unwatch(self, dirPath):
+        if self._notifier is not None:
+            wd = self._wm.get_wd(dirPath)
+            if wd is not None:
+                self._wm.rm_watch(wd, quiet=True)
+
+    def _readEvents(self):
+        """ Collect the directories notified by inotify. """
+        notifier = self._notifier
+        while notifier.check_events(timeout=0):
+            notifier.read_events()
+            notifier.process_events()
+        changed = self._changedDirs.copy()
+        self._changedDirs.clear()
+        return changed
+
+    def _match(self, name, part):
+        """ Match a file name as glob does (hidden files only match
+        if the pattern also starts with dot). """
+        if name.startswith('.') and not part.startswith('.'):
+            return False
+        return fnmatch(name, part)
+
+    def _listDir(self, dirPath, depth):
+        """ List the directory and update its entries.
+        Return the new matching files.
+        """
+        try:
+            mtime = os.stat(dirPath or '.').st_mtime
+            names = os.listdir(dirPath or '.')
+        except OSError:
+            self._removeDir(dirPath)
+            return []
+
+        # Force listing it again if it could be changed in the same second
+        if time.time() - mtime < self.MTIME_RESOLUTION:
+            mtime = None
+
+        part = self._parts[depth]
+        isLast = depth == len(self._parts) - 1
+        _, oldFiles, oldDirs = self._dirs.get(dirPath, (None, set(), set()))
+        files, dirs = set(), set()
+
+        for name in names:
+            if self._match(name, part):
+                path = os.path.join(dirPath, name)
+                if isLast:
+                    files.add(path)
+                elif os.path.isdir(path):
+                    dirs.add(path)
+
+        for d in oldDirs - dirs:
+            self._removeDir(d)
+
+        if dirPath not in self._dirs:
+            self._watch(dirPath or '.')
+
+        self._dirs[dirPath] = (mtime, files, dirs)
+        newFiles = list(files - oldFiles)
+
+        for d in dirs - oldDirs:
+            newFiles += self._listDir(d, depth + 1)
+
+        return newFiles
+
+    def _removeDir(self, dirPath):
+        """ Forget a directory (and its sub-directories) that does not
+        exist anymore. """
+        if dirPath in self._dirs:
+            _, _, dirs = self._dirs.pop(dirPath)
+            self._unwatch(dirPath or '.')
+            for d in dirs:
+                self._removeDir(d)
+
+    def _getDepth(self, dirPath):
+        if dirPath == self._rootDir:
+            return 0
+        rel = os.path.relpath(dirPath, self._rootDir or '.')
+        return len(rel.split(os.sep))
+
+    def update(self):
+        """ Check for changes in the directories and return the sorted
+        list of all files matching the pattern.
+        """
+        t0 = time.time()
+        self._counter += 1
+        newFiles = []
+        scanned = 0
+
+        if not self._dirs:
+            # First time, list all directories from the root
+            newFiles = self._listDir(self._rootDir, 0)
+            scanned = len(self._dirs)
+        else:
+            if self._notifier is None or self._counter % self.SCAN_EVERY == 0:
+                changed = None  # check all modification times
+            else:
+                changed = self._readEvents()
+                changed = set(d.rstrip(os.sep) if d != os.sep else d
+                              for d in changed)
+                if '.' in changed and self._rootDir == '':
+                    changed.add('')
+
+            # Parent directories should be listed first, so removed and
+            # new sub-directories are known before they are checked
+            for dirPath in sorted(self._dirs.keys()):
+                entry = self._dirs.get(dirPath)
+                if entry is None:  # removed when listing its parent
+                    continue
+
+                mtime = entry[0]
+                if changed is not None:
+                    listIt = mtime is None or dirPath in changed
+                else:
+                    try:
+                        listIt = (mtime is None or
+                                  os.stat(dirPath or '.').st_mtime != mtime)
+                    except OSError:
+                        listIt = True
+
+                if listIt:
+                    newFiles += self._listDir(dirPath, self._getDepth(dirPath))
+                    scanned += 1
+
+        if scanned:
+            self._files = sorted(f for _, files, _ in self._dirs.values()
+                                 for f in files)
+
+        self.lastTime = time.time() - t0
+        self.lastScanned = scanned
+        self.lastNew = len(newFiles)
+
+        return self._files
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de Bioinformatica of Centro Nacional de Biotecnologia, CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+
+import sys, os
+
+from pyworkflow.mapper.sqlite import convertMatrixStorage
+import pyworkflow.utils as pwutils
+
+
+STORAGES = [pwutils.MATRIX_FLOAT64, pwutils.MATRIX_FLOAT32,
+            pwutils.MATRIX_JSON]
+
+
+def usage(error):
+    print """
+    ERROR: %s
+    
+    Usage: scipion python scripts/convert_matrix_storage.py [--STORAGE] PATH...
+        Convert the matrices (e.g. alignment of particles) stored in the
+        sqlite files of sets to a different storage:
+          --float64 (default) or --float32: binary values (BLOBs).
+          --json: JSON text, as stored by default.
+        PATH can be a .sqlite file or a folder (e.g. a project), that will
+        be searched for .sqlite files.
+        Set SCIPION_MATRIX_STORAGE to store new matrices in the same way.
+    """ % error
+    sys.exit(1)
+
+
+def iterDbFiles(path):
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            for f in sorted(files):
+                if f.endswith('.sqlite'):
+                    yield os.path.join(root, f)
+    else:
+        yield path
+
+
+storage = pwutils.MATRIX_FLOAT64
+paths = []
+
+for arg in sys.argv[1:]:
+    if arg.startswith('--'):
+        storage = arg[2:]
+        if storage not in STORAGES:
+            usage("Unknown storage: %s" % arg)
+    else:
+        paths.append(arg)
+
+if not paths:
+    usage("Missing input PATH")
+
+for path in paths:
+    if not os.path.exists(path):
+        usage("Unexistent PATH: %s" % pwutils.redStr(path))
+
+    for dbName in iterDbFiles(path):
+        n = convertMatrixStorage(dbName, storage)
+        if n:
+            print "Converted %d matrices to %s in %s" % (n, storage, dbName)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# **************************************************************************
+# *
+# * Authors:     J.M. De la Rosa Trevin (jmdelarosa@cnb.csic.es)
+# *
+# * Unidad de  Bioinformatica of Centro Nacional de Biotecnologia , CSIC
+# *
+# * This program is free software; you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License as published by
+# * the Free Software Foundation; either version 2 of the License, or
+# * (at your option) any later version.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# * GNU General Public License for more details.
+# *
+# * You should have received a copy of the GNU General Public License
+# * along with this program; if not, write to the Free Software
+# * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+# * 02111-1307  USA
+# *
+# *  All comments concerning this program package may be sent to the
+# *  e-mail address 'scipion@cnb.csic.es'
+# *
+# **************************************************************************
+
+"""
+Run the benchmarks of the object/mapper layers and write the results
+to a JSON file, or compare the results of two previous runs.
+"""
+
+import sys
+import argparse
+import tempfile
+
+import pyworkflow.utils as pwutils
+from pyworkflow.benchmark import (BENCHMARKS, SEED, runBenchmarks,
+                                  writeResults, readResults, compareResults)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add = parser.add_argument
+    add('--sizes', type=int, nargs='+', default=[1000, 10000],
+        help='Number of items of the synthetic sets.')
+    add('--repeat', type=int, default=3,
+        help='Number of times that each benchmark is run.')
+    add('--seed', type=int, default=SEED,
+        help='Seed used to generate the synthetic sets.')
+    add('--run', nargs='+', metavar='NAME',
+        help='Names of the benchmarks to run (all by default).')
+    add('--workdir',
+        help='Folder for the synthetic sets, they will be reused if they '
+             'exist. By default a temporary folder is used and deleted.')
+    add('-o', '--output', help='JSON file to write the results.')
+    add('--list', action='store_true', help='List the benchmarks.')
+    add('--compare', nargs=2, metavar=('OLD', 'NEW'),
+        help='Compare the results of two JSON files.')
+    args = parser.parse_args()
+
+    if args.list:
+        for bench in BENCHMARKS:
+            print "%-30s %s" % (bench.getName(), bench.__doc__.strip())
+        return
+
+    if args.compare:
+        print "%-30s %10s %10s %10s %8s" % ('benchmark', 'size', 'old (s)',
+                                            'new (s)', 'ratio')
+        for name, size, old, new, ratio in compareResults(
+                *[readResults(fn) for fn in args.compare]):
+            line = "%-30s %10d %10.3f %10.3f %8.2f" % (name, size, old, new,
+                                                       ratio)
+            if ratio > 1.1:
+                line = pwutils.redStr(line)
+            elif ratio < 0.9:
+                line = pwutils.greenStr(line)
+            print line
+        return
+
+    benchmarks = BENCHMARKS
+    if args.run:
+        benchmarks = [b for b in BENCHMARKS if b.getName() in args.run]
+        if len(benchmarks) != len(args.run):
+            sys.exit("Unknown benchmarks, use --list to see the names.")
+
+    workDir = args.workdir or tempfile.mkdtemp(prefix='scipion_benchmark_')
+    pwutils.makePath(workDir)
+
+    try:
+        results = runBenchmarks(benchmarks, args.sizes, workDir,
+                                repeat=args.repeat, seed=args.seed)
+    finally:
+        if not args.workdir:
+            pwutils.cleanPath(workDir)
+
+    if args.output:
+        writeResults(results, args.output)
+        print "Results written to %s" % args.output
+
+
+if __name__ == '__main__':
+    main()